@@ -1,6 +1,6 @@
 class Event:
 
-    def __init__(self, name, start_date, end_date, priority, event_type, description,location="None"):
+    def __init__(self, name, start_date, end_date, priority, event_type, description,location="None", recurrence=""):
         """
         Function:
             __init__
@@ -14,6 +14,8 @@ class Event:
             priority - priority value of an event
             event_type - String representing the type of event
             description - Optional text field that contains any additional notes about an event (can be blank)
+            location - Optional location of the event
+            recurrence - Optional recurrence rule (RFC 5545 RRULE lines), blank for a single event
         Output:
             - A new Event object instance
         """
@@ -24,6 +26,7 @@ class Event:
         self.event_type = event_type
         self.description = description
         self.location=location
+        self.recurrence = recurrence
 
     def __str__(self):
         """
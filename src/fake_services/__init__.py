@@ -0,0 +1,4 @@
+# Stand-ins for the web APIs the bot calls, so tests and benchmarks run offline (see server.py)
+from src.fake_services.server import FakeServices, ServiceConfig
+
+__all__ = ["FakeServices", "ServiceConfig"]
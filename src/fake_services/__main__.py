@@ -0,0 +1,34 @@
+# Runs the fake services until interrupted: python -m src.fake_services --latency 0.1
+import argparse
+import time
+
+from src.fake_services.server import FakeServices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves stand-ins for the web APIs ScheduleBot calls")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request waits")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 503")
+    parser.add_argument("--quota", type=int, default=None, help="requests per second before answering 429")
+    parser.add_argument("--page-size", type=int, default=250, help="most events per page of a list")
+    args = parser.parse_args()
+
+    fakes = FakeServices(args.host, args.port, args.seed, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, quota=args.quota, page_size=args.page_size)
+    with fakes:
+        print(f"Fake services listening on {fakes.url}, point the bot at them with:")
+        for name, value in fakes.environ().items():
+            print(f"export {name}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# fake_services/calendar.py
+
+import email.parser
+import itertools
+import json
+import threading
+import urllib.parse
+from datetime import datetime
+from http import HTTPStatus
+
+from src.fake_services.responses import error_body
+
+EVENTS_PATH = "calendar/v3/calendars/primary/events"
+
+# Boundary of batch responses, never found in the JSON bodies
+BATCH_BOUNDARY = "batch_fake_services_boundary"
+
+
+def _error(status, message, reason=None):
+    return status, error_body(status, message, reason)
+
+
+def _start_key(event):
+    start = event.get("start", {})
+    return start.get("dateTime") or start.get("date") or "", event["id"]
+
+
+def _starts_after(event, time_min):
+    # Compares the wall clock of the event's start with timeMin, both as the calendar stores them
+    start = _start_key(event)[0]
+    try:
+        return datetime.fromisoformat(start[:19]) >= datetime.fromisoformat(time_min.rstrip("Z")[:19])
+    except ValueError:
+        return True
+
+
+class FakeCalendar:
+    """
+    Class:
+        FakeCalendar
+    Description:
+        The primary calendar of Google Calendar's events API: list with pages and sync tokens, get, insert,
+        update, patch, delete and batch requests. Every change is numbered, and a sync token is the number of
+        the last change the client has seen, so a list with a sync token returns what changed after it,
+        deleted events included. Tokens older than expired_before are answered with 410 Gone.
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.version = 0
+        self.changed = {}
+        self.expired_before = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        """Stores an event as if it had been created in Google Calendar, returning it with its ID."""
+        with self._lock:
+            return self._store({**event, "id": event.get("id") or f"fake{next(self._ids)}"})
+
+    def expire_sync_tokens(self):
+        """Makes every sync token handed out so far expire, like Google does now and then."""
+        with self._lock:
+            self.expired_before = self.version + 1
+
+    def _store(self, event):
+        event.setdefault("status", "confirmed")
+        event["htmlLink"] = f"https://calendar.google.com/event?eid={event['id']}"
+        self.version += 1
+        self.events[event["id"]] = event
+        self.changed[event["id"]] = self.version
+        return event
+
+    def handle(self, method, path, query, body, page_size):
+        """
+        Function:
+            handle
+        Description:
+            Answers a request to the events API
+        Input:
+            method - HTTP method
+            path - Request path without the leading slash
+            query - Dictionary of the query parameters
+            body - Parsed JSON body, or None
+            page_size - Most events on one page
+        Output:
+            - The status and response dictionary, None for an empty response
+        """
+        if not path.startswith(EVENTS_PATH):
+            return _error(404, "Not Found", "notFound")
+        event_id = urllib.parse.unquote(path[len(EVENTS_PATH):].strip("/"))
+        with self._lock:
+            if not event_id:
+                if method == "GET":
+                    return self._list(query, page_size)
+                if method == "POST":
+                    return 200, self._store({**(body or {}), "id": f"fake{next(self._ids)}"})
+                return _error(405, "Method Not Allowed")
+            event = self.events.get(event_id)
+            if event is None:
+                return _error(404, "Not Found", "notFound")
+            if event["status"] == "cancelled":
+                return _error(410, "Resource has been deleted", "deleted")
+            if method == "GET":
+                return 200, event
+            if method == "PUT":
+                return 200, self._store({**(body or {}), "id": event_id})
+            if method == "PATCH":
+                return 200, self._store({**event, **(body or {}), "id": event_id})
+            if method == "DELETE":
+                self._store({"id": event_id, "status": "cancelled"})
+                return 204, None
+            return _error(405, "Method Not Allowed")
+
+    def _list(self, query, page_size):
+        size = min(int(query.get("maxResults", 250)), page_size)
+        offset = int(query.get("pageToken", 0))
+        sync_token = query.get("syncToken")
+        if sync_token is not None:
+            if not sync_token.isdigit() or int(sync_token) < self.expired_before:
+                return _error(410, "Sync token is no longer valid, a full sync is required.", "fullSyncRequired")
+            since = int(sync_token)
+            events = [event for event in self.events.values() if self.changed[event["id"]] > since]
+        else:
+            show_deleted = query.get("showDeleted", "false") == "true"
+            events = [event for event in self.events.values() if show_deleted or event["status"] != "cancelled"]
+            if query.get("timeMin"):
+                events = [event for event in events if _starts_after(event, query["timeMin"])]
+        events.sort(key=_start_key)
+        response = {"kind": "calendar#events", "items": events[offset:offset + size]}
+        if offset + size < len(events):
+            response["nextPageToken"] = str(offset + size)
+        else:
+            response["nextSyncToken"] = str(self.version)
+        return 200, response
+
+    def batch(self, fakes, body):
+        """
+        Function:
+            batch
+        Description:
+            Answers a multipart/mixed batch request, running every part as its own request. Parts can fail on
+            their own with the configured error rate and quota, as they do at Google.
+        Input:
+            fakes - The FakeServices, whose dispatch runs the parts
+            body - The batch request, starting with its Content-Type header
+        Output:
+            - Status, response headers and the multipart response body
+        """
+        message = email.parser.BytesParser().parsebytes(body)
+        if not message.is_multipart():
+            return 400, {"Content-Type": "application/json"}, json.dumps(
+                _error(400, "Batch request is not multipart")[1]).encode("utf-8")
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition("\n")
+            method, target, _ = request_line.strip().split(" ", 2)
+            inner = email.parser.Parser().parsestr(rest)
+            content = (inner.get_payload() or "").encode("utf-8")
+            status, headers, answer = fakes.dispatch(method, target, content, wait=False)
+            content_id = part["Content-ID"]
+            lines = [f"--{BATCH_BOUNDARY}", "Content-Type: application/http",
+                     f"Content-ID: <response-{content_id[1:]}", "",
+                     f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+            lines.extend(f"{name}: {value}" for name, value in headers.items())
+            lines.extend([f"Content-Length: {len(answer)}", "", answer.decode("utf-8")])
+            parts.append("\r\n".join(lines))
+        response = "\r\n".join(parts) + f"\r\n--{BATCH_BOUNDARY}--\r\n"
+        return 200, {"Content-Type": f"multipart/mixed; boundary={BATCH_BOUNDARY}"}, response.encode("utf-8")
+
+
+class FakeOAuth:
+    """
+    Class:
+        FakeOAuth
+    Description:
+        Google's OAuth token endpoint, handing out an access token for every refresh token
+    """
+
+    def __init__(self):
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def token(self, body):
+        """Answers a token refresh, returning its status and response dictionary."""
+        form = urllib.parse.parse_qs(body.decode("utf-8"))
+        if "refresh_token" not in form:
+            return 400, {"error": "invalid_request"}
+        with self._lock:
+            self.refreshes += 1
+            return 200, {"access_token": f"fake-access-{self.refreshes}", "expires_in": 3600,
+                         "token_type": "Bearer", "scope": "https://www.googleapis.com/auth/calendar"}
@@ -0,0 +1,26 @@
+# fake_services/gemini.py
+
+
+class FakeGemini:
+    """
+    Class:
+        FakeGemini
+    Description:
+        Gemini's generateContent endpoint, answering every prompt with answer(prompt)
+    """
+
+    def __init__(self, answer=None):
+        self.answer = answer or (lambda prompt: f"Fake answer to: {prompt}")
+        self.prompts = []
+
+    def handle(self, method, path, query, body, page_size):
+        """Answers a generateContent request, returning its status and response dictionary."""
+        if method != "POST" or not path.endswith(":generateContent"):
+            return 404, {"error": {"code": 404, "message": "Not Found", "status": "NOT_FOUND"}}
+        try:
+            prompt = body["contents"][0]["parts"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            return 400, {"error": {"code": 400, "message": "Invalid JSON payload", "status": "INVALID_ARGUMENT"}}
+        self.prompts.append(prompt)
+        return 200, {"candidates": [{"content": {"role": "model", "parts": [{"text": self.answer(prompt)}]},
+                                     "finishReason": "STOP"}]}
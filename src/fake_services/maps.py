@@ -0,0 +1,77 @@
+# fake_services/maps.py
+
+import hashlib
+import math
+
+# Average speeds in km/h the fake Distance Matrix travels at
+SPEEDS = {"driving": 50, "walking": 5, "bicycling": 15, "transit": 30}
+
+
+def place_of(address):
+    """Returns made up but stable coordinates of an address."""
+    digest = hashlib.sha256(address.strip().lower().encode("utf-8")).digest()
+    latitude = int.from_bytes(digest[:4], "big") / 2 ** 32 * 120 - 60
+    longitude = int.from_bytes(digest[4:8], "big") / 2 ** 32 * 360 - 180
+    return round(latitude, 6), round(longitude, 6)
+
+
+def kilometers(origin, destination):
+    """Great circle distance between two (lat, lng) pairs."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (*origin, *destination))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+class FakeGeocoding:
+    """
+    Class:
+        FakeGeocoding
+    Description:
+        The Geocoding API. Addresses in places get their coordinates, those in missing have no result, and any
+        other address gets coordinates derived from its text.
+    """
+
+    def __init__(self):
+        self.places = {}
+        self.missing = set()
+
+    def handle(self, method, path, query, body, page_size):
+        """Answers a geocode request, returning its status and response dictionary."""
+        address = query.get("address", "").replace("+", " ")
+        if not address.strip() or address in self.missing:
+            return 200, {"results": [], "status": "ZERO_RESULTS"}
+        latitude, longitude = self.places.get(address) or place_of(address)
+        return 200, {"status": "OK", "results": [{
+            "formatted_address": address,
+            "geometry": {"location": {"lat": latitude, "lng": longitude}},
+        }]}
+
+
+class FakeDistanceMatrix:
+    """
+    Class:
+        FakeDistanceMatrix
+    Description:
+        The Distance Matrix API, travelling in a straight line at the average speed of the mode
+    """
+
+    def handle(self, method, path, query, body, page_size):
+        """Answers a distance matrix request, returning its status and response dictionary."""
+        speed = SPEEDS.get(query.get("mode", "driving").lower(), SPEEDS["driving"])
+        rows = []
+        try:
+            origins = [tuple(map(float, origin.split(","))) for origin in query["origins"].split("|")]
+            destinations = [tuple(map(float, place.split(","))) for place in query["destinations"].split("|")]
+        except (KeyError, ValueError):
+            return 200, {"status": "INVALID_REQUEST", "rows": []}
+        for origin in origins:
+            elements = []
+            for destination in destinations:
+                distance = kilometers(origin, destination)
+                elements.append({
+                    "status": "OK",
+                    "distance": {"value": int(distance * 1000), "text": f"{distance:.1f} km"},
+                    "duration": {"value": int(distance / speed * 3600), "text": f"{distance / speed * 60:.0f} mins"},
+                })
+            rows.append({"elements": elements})
+        return 200, {"status": "OK", "rows": rows}
@@ -0,0 +1,40 @@
+# fake_services/responses.py
+
+import json
+from http import HTTPStatus
+
+
+def error_body(status, message, reason=None):
+    """
+    Function: error_body
+    Description: Builds an error response the way Google APIs report them, which googleapiclient turns into an
+    HttpError carrying the reason.
+
+    Input:
+        status - HTTP status code
+        message - Error message
+        reason - Optional reason, e.g. "rateLimitExceeded"
+    Output:
+        The response dictionary
+    """
+    error = {"code": status, "message": message, "status": HTTPStatus(status).name}
+    if reason:
+        error["errors"] = [{"reason": reason, "message": message}]
+    return {"error": error}
+
+
+def parse_json(body):
+    """Returns the JSON body of a request, None if it has none."""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def encode(status, payload):
+    """Turns a status and response dictionary into the status, headers and body sent back."""
+    if payload is None:
+        return status, {}, b""
+    return status, {"Content-Type": "application/json; charset=UTF-8"}, json.dumps(payload).encode("utf-8")
@@ -0,0 +1,264 @@
+# fake_services/server.py
+
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.fake_services.calendar import FakeCalendar, FakeOAuth
+from src.fake_services.gemini import FakeGemini
+from src.fake_services.maps import FakeDistanceMatrix, FakeGeocoding
+from src.fake_services.responses import encode, error_body, parse_json
+from src.fake_services.weather import FakeWeather
+
+# Path prefixes of every fake API, most specific first, as the real services lay them out below their base URL
+ROUTES = [
+    ("batch/calendar/v3", "calendar"),
+    ("calendar/v3/", "calendar"),
+    ("token", "oauth"),
+    ("maps/api/geocode/", "geocoding"),
+    ("maps/api/distancematrix/", "distance"),
+    ("data/2.5/", "weather"),
+    ("v1beta/", "gemini"),
+]
+
+
+class ServiceConfig:
+    """
+    Class:
+        ServiceConfig
+    Description:
+        How one fake service misbehaves. Every request waits latency seconds plus up to jitter more, then fails
+        with a 503 with probability error_rate. Once quota requests were served within quota_window seconds,
+        the rest of the window is answered with 429 rateLimitExceeded. Lists return at most page_size items
+        per page.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota=None, quota_window=1.0, page_size=250):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new ServiceConfig
+        Input:
+            latency - Seconds every request waits
+            jitter - Up to this many more seconds, picked at random per request
+            error_rate - Share of requests failing with 503, from 0 to 1
+            quota - Requests served per quota window, None for no limit
+            quota_window - Seconds of a quota window
+            page_size - Most items on one page of a list
+        Output:
+            - A new ServiceConfig instance
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota = quota
+        self.quota_window = quota_window
+        self.page_size = page_size
+        self._window_start = 0.0
+        self._window_requests = 0
+
+    def copy(self, **changes):
+        """Returns a new ServiceConfig with some settings changed."""
+        settings = {name: getattr(self, name) for name in
+                    ("latency", "jitter", "error_rate", "quota", "quota_window", "page_size")}
+        settings.update(changes)
+        return ServiceConfig(**settings)
+
+    def over_quota(self, now):
+        """Counts a request against the quota and returns True if it exceeds it."""
+        if self.quota is None:
+            return False
+        if now - self._window_start >= self.quota_window:
+            self._window_start = now
+            self._window_requests = 0
+        self._window_requests += 1
+        return self._window_requests > self.quota
+
+
+class FakeServices:
+    """
+    Class:
+        FakeServices
+    Description:
+        Stand-ins for Google Calendar (with batch requests and token refreshes), Geocoding, Distance Matrix,
+        OpenWeather and Gemini, served over HTTP on localhost by one threaded server. The bot talks to it
+        through its usual HTTP clients once their base URLs point at url (see environ()), so the whole request
+        path can be measured offline. Use it as a context manager, or call start() and stop().
+
+        requests counts the requests each service answered, and the fakes' state (calendar, geocoding, ...) can
+        be filled or inspected directly.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, seed=None, **settings):
+        """
+        Function:
+            __init__
+        Description:
+            Creates the fake services, not listening yet
+        Input:
+            host, port - Address to listen on, port 0 picks a free one
+            seed - Seed of the random latency jitter and errors, for repeatable runs
+            settings - ServiceConfig settings applied to every service, e.g. latency=0.05
+        Output:
+            - A new FakeServices instance
+        """
+        self.host = host
+        self.port = port
+        self.random = random.Random(seed)
+        self.config = {name: ServiceConfig(**settings) for _, name in ROUTES}
+        self.calendar = FakeCalendar()
+        self.oauth = FakeOAuth()
+        self.geocoding = FakeGeocoding()
+        self.distance = FakeDistanceMatrix()
+        self.weather = FakeWeather()
+        self.gemini = FakeGemini()
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the fakes, ending with a slash."""
+        return f"http://{self.host}:{self.port}/"
+
+    def configure(self, service, **settings):
+        """
+        Function:
+            configure
+        Description:
+            Changes how one service misbehaves
+        Input:
+            service - "calendar", "oauth", "geocoding", "distance", "weather" or "gemini"
+            settings - ServiceConfig settings to change
+        Output: None
+        """
+        with self._lock:
+            self.config[service] = self.config[service].copy(**settings)
+
+    def environ(self):
+        """Returns the environment variables pointing the bot at the fakes."""
+        return {
+            "SCHEDULEBOT_GOOGLE_API_URL": self.url,
+            "SCHEDULEBOT_MAPS_API_URL": self.url + "maps/api/",
+            "SCHEDULEBOT_WEATHER_API_URL": self.url + "data/2.5/",
+            "SCHEDULEBOT_GEMINI_API_URL": self.url,
+        }
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), FakeRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fakes = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def service_of(self, path):
+        """Returns the name of the service answering a path, None if no fake does."""
+        for prefix, name in ROUTES:
+            if path.startswith(prefix):
+                return name
+        return None
+
+    def fault(self, service, wait=True):
+        """
+        Function:
+            fault
+        Description:
+            Applies a service's latency and decides if the request fails
+        Input:
+            service - Name of the service
+            wait - False for the parts of a batch, which share the batch's latency
+        Output:
+            - None, or the (status, body) of the error to answer with
+        """
+        with self._lock:
+            config = self.config[service]
+            self.requests[service] += 1
+            delay = config.latency + self.random.uniform(0, config.jitter) if wait else 0
+            over_quota = config.over_quota(time.monotonic())
+            failed = self.random.random() < config.error_rate
+        if delay:
+            time.sleep(delay)
+        if over_quota:
+            return 429, error_body(429, "Rate Limit Exceeded", "rateLimitExceeded")
+        if failed:
+            return 503, error_body(503, "The service is currently unavailable.", "backendError")
+        return None
+
+    def dispatch(self, method, target, body, wait=True):
+        """
+        Function:
+            dispatch
+        Description:
+            Answers one request, including the requests inside a Calendar batch
+        Input:
+            method - HTTP method
+            target - Path and query of the request
+            body - Request body as bytes
+            wait - False for the parts of a batch
+        Output:
+            - Status, response headers and response body as bytes
+        """
+        parsed = urllib.parse.urlsplit(target)
+        path = parsed.path.lstrip("/")
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(parsed.query).items()}
+        service = self.service_of(path)
+        if service is None:
+            return encode(404, error_body(404, f"No fake service at /{path}"))
+        error = self.fault(service, wait)
+        if error is not None:
+            return encode(*error)
+        if service == "calendar" and path.startswith("batch/"):
+            return self.calendar.batch(self, body)
+        if service == "oauth":
+            return encode(*self.oauth.token(body))
+        page_size = self.config[service].page_size
+        handler = getattr(self, service)
+        return encode(*handler.handle(method, path, query, parse_json(body), page_size))
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    """Hands every request to the FakeServices of the server, keeping connections alive."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.path.lstrip("/").startswith("batch/"):
+            # The parts are parsed with the boundary named in the batch's content type
+            body = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body
+        status, headers, content = self.server.fakes.dispatch(self.command, self.path, body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _answer
+
+    def log_message(self, format, *args):
+        # Benchmarks send thousands of requests, they are counted in FakeServices.requests instead
+        pass
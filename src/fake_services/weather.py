@@ -0,0 +1,41 @@
+# fake_services/weather.py
+
+import time
+
+# The 5 day forecast comes in steps of 3 hours
+FORECAST_STEP = 3 * 60 * 60
+FORECAST_STEPS = 40
+
+
+class FakeWeather:
+    """
+    Class:
+        FakeWeather
+    Description:
+        OpenWeather's 5 day forecast, starting at the current 3 hour step. Temperatures are in Kelvin, as the
+        real API sends them without units=metric.
+    """
+
+    def __init__(self, temperature=293.15, humidity=60, description="clear sky"):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.description = description
+
+    def handle(self, method, path, query, body, page_size):
+        """Answers a forecast request, returning its status and response dictionary."""
+        if not path.endswith("forecast"):
+            return 404, {"cod": "404", "message": "Internal error"}
+        try:
+            latitude = float(query["lat"])
+            float(query["lon"])
+        except (KeyError, ValueError):
+            return 400, {"cod": "400", "message": "wrong latitude or longitude"}
+        first = int(time.time()) // FORECAST_STEP * FORECAST_STEP
+        # Colder away from the equator, so different places get different forecasts
+        temperature = self.temperature - abs(latitude) / 5
+        forecasts = [{
+            "dt": first + step * FORECAST_STEP,
+            "main": {"temp": temperature, "feels_like": temperature - 1, "humidity": self.humidity},
+            "weather": [{"description": self.description}],
+        } for step in range(FORECAST_STEPS)]
+        return 200, {"cod": "200", "cnt": len(forecasts), "list": forecasts}
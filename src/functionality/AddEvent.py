@@ -3,15 +3,16 @@ import sys
 import traceback
 import logging
 from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 import asyncio
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
 from src.parse.match import parse_period, parse_period24
 from src.functionality.shared_functions import create_event_tree, create_type_tree, add_event_to_file, turn_types_to_string
+from src.functionality.storage_access import run_locked, run_storage, user_lock
 from src.functionality.create_event_type import create_event_type
 from src.functionality.distance import get_distance
+from src.functionality.Google import google_service
+from src.functionality.google_access import execute
 from src.Event import Event
 
 
@@ -115,8 +116,8 @@ async def add_event(ctx, client):
             return
 
     # Event Type
-    create_type_tree(str(ctx.author.id))
-    event_types = turn_types_to_string(str(ctx.author.id))
+    await run_locked(str(ctx.author.id), create_type_tree, str(ctx.author.id))
+    event_types = await run_storage(turn_types_to_string, str(ctx.author.id))
     await channel.send(
         "Tell me what type of event this is. Here is a list of event types I currently know:\n" + event_types
     )
@@ -167,8 +168,9 @@ async def add_event(ctx, client):
                 )
                 await channel.send("Your travel event was successfully created!")
                 await channel.send(f"Here is your Google Maps link for navigation: {maps_link}")
-                create_event_tree(str(ctx.author.id))
-                add_event_to_file(str(ctx.author.id), travel_event, "local_travel_event_id")
+                async with user_lock(str(ctx.author.id)):
+                    await run_storage(create_event_tree, str(ctx.author.id))
+                    await run_storage(add_event_to_file, str(ctx.author.id), travel_event, "local_travel_event_id")
         except asyncio.TimeoutError:
             await channel.send("You took too long to respond. Skipping travel time.")
         except Exception as e:
@@ -185,23 +187,14 @@ async def add_event(ctx, client):
         event_array.append(description)
 
     # Adding to Google Calendar
+    user_id = str(ctx.author.id)
     try:
-        SCOPES = ['https://www.googleapis.com/auth/calendar']
-        base_dir = os.path.dirname(os.path.abspath(__file__))      # ...\src
-        parent_dir = os.path.dirname(base_dir)                     # ...\SEProj-ScheduleBot-main
-        json_dir = os.path.join(parent_dir, "json")               # ...\json
-        
-        user_id = str(ctx.author.id)
-        user_token_file = os.path.join(json_dir, "tokens", f"{user_id}_token.json")  # user-specific token path
-
-
-        if os.path.exists(user_token_file):
-            creds = Credentials.from_authorized_user_file(user_token_file, SCOPES)
-        else:
+        # The user's service is built once and reused by every command
+        service = await google_service(user_id)
+        if service is None:
             await channel.send("You are not logged into Google. Please login using the !ConnectGoogle command.")
             return
 
-        service = build('calendar', 'v3', credentials=creds)
         new_event = {
             'summary': event_array[0],
             'location': event_array[5],
@@ -222,10 +215,14 @@ async def add_event(ctx, client):
                 ]
             }
         }
-        event = service.events().insert(calendarId='primary', body=new_event).execute()
+        event = await execute(user_id, service.events().insert(calendarId='primary', body=new_event))
         event_id = event.get('id')
         event_link = event.get('htmlLink')
         logger.info(f"Event created: {event_link}")
+    except asyncio.TimeoutError:
+        logger.error("Google Calendar did not answer in time while creating the event.")
+        await channel.send("Google Calendar took too long to respond. Please try adding the event again.")
+        return
     except Exception as e:
         logger.error("An error occurred while creating the event in Google Calendar.")
         await channel.send("An error occurred while creating the event in Google Calendar.")
@@ -242,8 +239,9 @@ async def add_event(ctx, client):
             event_array[6],  # description
             event_array[5]   # location
         )
-        create_event_tree(user_id)
-        add_event_to_file(user_id, current_event, event_id)
+        async with user_lock(user_id):
+            await run_storage(create_event_tree, user_id)
+            await run_storage(add_event_to_file, user_id, current_event, event_id)
         await channel.send("Your event was successfully created!")
         await channel.send(f'Event link: {event_link}')
     except Exception as e:
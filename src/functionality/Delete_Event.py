@@ -9,13 +9,15 @@ import logging
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
 
-from functionality.highlights import convert_to_12
-from functionality.shared_functions import (
+from src.functionality.highlights import convert_to_12
+from src.functionality.shared_functions import (
     read_event_file,
     create_event_tree,
     delete_event_from_file
 )
-from functionality.Google import connect_google  # Ensure correct import path
+from src.functionality.Google import connect_google  # Ensure correct import path
+from src.functionality.google_access import execute
+from src.functionality.storage_access import run_locked, run_storage
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -42,8 +44,8 @@ async def delete_event(ctx, bot_instance):
         return m.content is not None and m.channel == channel and m.author == ctx.author
 
     # Open and read user's calendar file
-    create_event_tree(user_id)
-    rows = read_event_file(user_id)
+    await run_locked(user_id, create_event_tree, user_id)
+    rows = await run_storage(read_event_file, user_id)
     logger.debug(f"User ID: {user_id}")
 
     # Initialize variables
@@ -121,9 +123,13 @@ async def delete_event(ctx, bot_instance):
 
     # Delete the event from Google Calendar
     try:
-        service.events().delete(calendarId='primary', eventId=event_to_delete['id']).execute()
+        await execute(user_id, service.events().delete(calendarId='primary', eventId=event_to_delete['id']))
         logger.info(f"Event '{event_to_delete['name']}' deleted from Google Calendar.")
         await channel.send(f"The event '{event_to_delete['name']}' has been deleted from your Google Calendar.")
+    except asyncio.TimeoutError:
+        logger.error(f"Google Calendar did not answer in time while deleting event {event_to_delete['id']}")
+        await channel.send("Google Calendar took too long to respond. Please try deleting the event again.")
+        return
     except HttpError as e:
         if e.resp.status == 404:
             logger.error(f"Event not found in Google Calendar: {e}")
@@ -139,7 +145,7 @@ async def delete_event(ctx, bot_instance):
 
     # Delete the event from local storage
     try:
-        delete_event_from_file(user_id, event_to_delete)
+        await run_locked(user_id, delete_event_from_file, user_id, event_to_delete)
         logger.info(f"Event '{event_to_delete['name']}' deleted from local schedule.")
         await channel.send(f"The event '{event_to_delete['name']}' has been deleted from your schedule.")
     except Exception as e:
@@ -9,9 +9,12 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../"))
 from src.functionality.shared_functions import (
     read_event_file,
     create_event_tree,
-    write_event_file
+    update_event_in_file
 )
 from src.functionality.Google import connect_google
+from src.functionality.google_access import execute
+from src.functionality.storage import RECURRENCE
+from src.functionality.storage_access import run_locked, run_storage
 from googleapiclient.errors import HttpError
 import logging
 
@@ -39,8 +42,8 @@ async def edit_event(ctx, bot_instance):
         return m.author == ctx.author and m.channel == channel
 
     # Open and read user's calendar file
-    create_event_tree(user_id)
-    rows = read_event_file(user_id)
+    await run_locked(user_id, create_event_tree, user_id)
+    rows = await run_storage(read_event_file, user_id)
     logger.debug(f"User ID: {user_id}")
 
     # Initialize variables
@@ -60,6 +63,7 @@ async def edit_event(ctx, bot_instance):
                 'type': row[5],
                 'desc': row[6],
                 'location': row[7] if len(row) > 7 else 'None',
+                'recurrence': row[RECURRENCE] if len(row) > RECURRENCE else '',
             }
             events.append(event)
 
@@ -190,7 +194,7 @@ async def edit_event(ctx, bot_instance):
     try:
         # Fetch the event from Google Calendar
         logger.debug(f"Event to edit ID: {event_to_edit['id']}")
-        google_event = service.events().get(calendarId='primary', eventId=event_to_edit['id']).execute()
+        google_event = await execute(user_id, service.events().get(calendarId='primary', eventId=event_to_edit['id']))
         logger.debug(f"Fetched google_event: {google_event}")
 
         # Ensure 'start' and 'end' keys exist
@@ -225,9 +229,14 @@ async def edit_event(ctx, bot_instance):
             google_event['end']['timeZone'] = 'UTC'
 
         # Update the event in Google Calendar
-        updated_event = service.events().update(calendarId='primary', eventId=event_to_edit['id'], body=google_event).execute()
+        updated_event = await execute(user_id, service.events().update(calendarId='primary', eventId=event_to_edit['id'],
+                                                                        body=google_event))
         logger.info(f"Event '{event_to_edit['name']}' updated in Google Calendar.")
         await channel.send(f"The event '{new_name}' has been updated in your Google Calendar.")
+    except asyncio.TimeoutError:
+        logger.error(f"Google Calendar did not answer in time while updating event {event_to_edit['id']}")
+        await channel.send("Google Calendar took too long to respond. Please try editing the event again.")
+        return
     except HttpError as e:
         logger.error(f"An error occurred while updating the event in Google Calendar: {e}")
         await channel.send("An error occurred while updating the event in Google Calendar.")
@@ -251,25 +260,22 @@ async def edit_event(ctx, bot_instance):
             'location': new_location,
         }
 
-        # Replace the event in the events list
-        events[selection] = updated_event
-
-        # Reconstruct rows
-        updated_rows = [rows[0]]  # Header row
-        for e in events:
-            updated_rows.append([
-                e['id'],
-                e['name'],
-                e['startDateTime'],
-                e['endDateTime'],
-                e['priority'],
-                e['type'],
-                e['desc'],
-                e['location'],
-            ])
+        new_row = [
+            updated_event['id'],
+            updated_event['name'],
+            updated_event['startDateTime'],
+            updated_event['endDateTime'],
+            updated_event['priority'],
+            updated_event['type'],
+            updated_event['desc'],
+            updated_event['location'],
+        ]
+        # A recurring event keeps its rule, as its Google Calendar copy does
+        if event_to_edit['recurrence']:
+            new_row.append(event_to_edit['recurrence'])
 
-        # Write the updated rows back to the CSV file
-        write_event_file(user_id, updated_rows)
+        # Write only the edited event back to the user's calendar
+        await run_locked(user_id, update_event_in_file, user_id, event_to_edit['id'], new_row)
         logger.info(f"Event '{new_name}' updated in local schedule.")
         await channel.send(f"The event '{new_name}' has been updated in your schedule.")
     except Exception as e:
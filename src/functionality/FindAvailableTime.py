@@ -1,13 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-import csv
 import re
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
 from src.Event import Event
 from src.functionality.create_event_type import create_event_type
-from src.functionality.export_file import load_key, encrypt_file, decrypt_file
+from src.functionality.DisplayFreeTime import send_lines
+from src.functionality.free_time import intersect_slots, preferred_windows, subtract_busy
+from src.functionality.shared_functions import (
+    read_events_between,
+    read_free_slots,
+    read_records_by_day,
+    read_type_file,
+)
+from src.functionality.storage import parse_date
+from src.functionality.storage_access import run_storage
 
 
 async def find_avaialbleTime(ctx, client):
@@ -34,35 +42,21 @@ async def find_avaialbleTime(ctx, client):
     event_msg = await client.wait_for("message", check=check)  # Waits for user input
     event = event_msg.content  # Strips message to just the text the user entered
 
+    flag = False
+    range1 = ''
+    range2 = ''
     try:
+        # For every row in the event type file
+        for row in await run_storage(read_type_file, str(ctx.author.id)):
+            # Get event details
+            if row[0] == event:
+                flag = True
+                range1 = row[1]
+                range2 = row[2]
+                await channel.send(
+                    "You have a time range from " + row[1] + ' to ' + row[2] + ' for events of type ' + row[0])
+                break
 
-        key = load_key(str(ctx.author.id))
-        decrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-            ctx.author.id) + "event_types" + ".csv")
-        de_type = True
-        # Open the calendar file for user
-        with open(
-                os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(ctx.author.id) + "event_types" + ".csv",
-                "r") as event_file:
-            # Read the calendar file
-            csv_reader = csv.reader(event_file, delimiter=',')
-            # For every row in calendar file
-            flag = False
-            range1 = ''
-            range2 = ''
-            for row in csv_reader:
-                # Get event details
-                if row[0] == event:
-                    flag = True
-                    range1 = row[1]
-                    range2 = row[2]
-                    await channel.send(
-                        "You have a time range from " + row[1] + ' to ' + row[2] + ' for events of type ' + row[0])
-                    break
-
-        encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-            ctx.author.id) + "event_types" + ".csv")
-        de_type = False
         event_created = False
         if flag == False:
             await channel.send("Looks like you currently don't have this event type." +
@@ -75,49 +69,37 @@ async def find_avaialbleTime(ctx, client):
                 await channel.send("Event type creation is canceled")
 
             if event_created:
-                decrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-                    ctx.author.id) + "event_types" + ".csv")
-                de_type = True
-                with open(os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-                        ctx.author.id) + "event_types" + ".csv", "r") as event_file:
-                    # Read the calendar file
-                    csv_reader = csv.reader(event_file, delimiter=',')
-
-                    for row in csv_reader:
-                        # Get event details
-                        if row[0] == event:
-                            range1 = row[1]
-                            range2 = row[2]
-                            flag = True
-                            await channel.send(
-                                "You have a time range from " + row[1] + ' to ' + row[2] + ' for events of type ' + row[
-                                    0])
-
-                            de_type = False
-                            break
-                encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-                    ctx.author.id) + "event_types" + ".csv")
+                for row in await run_storage(read_type_file, str(ctx.author.id)):
+                    # Get event details
+                    if row[0] == event:
+                        range1 = row[1]
+                        range2 = row[2]
+                        flag = True
+                        await channel.send(
+                            "You have a time range from " + row[1] + ' to ' + row[2] + ' for events of type ' + row[
+                                0])
+                        break
 
         # matchedrows = getEventsOnDate(ctx,event.start_date)
 
     except FileNotFoundError as err:
         await channel.send(
             "Looks like I cannot find your event types. Try adding event types using the '!typecreate' command!")
-        if de_type:
-            encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(
-                ctx.author.id) + "event_types" + ".csv")
 
-    # Ask for the date
+    if not flag:
+        # Without a preferred time range there is nothing to look for
+        return
+
+    # Ask for the dates
     await channel.send(
-        "Now give me the date for you event. "
+        "Now give me the date for you event, or the first and last day to look at. "
         + "Here is the format you should follow:\n"
-        + "mm/dd/yy"
+        + "mm/dd/yy or mm/dd/yy mm/dd/yy"
     )
 
-    event_date = False
-    date = ''
-    # A loop that keeps running until a user enters correct start and end dates for their event following the required format
-    while not event_date:
+    days = None
+    # A loop that keeps running until a user enters dates following the required format
+    while days is None:
         msg_content = ""
         if ctx.message.author != client.user:
             # Waits for user input
@@ -126,43 +108,84 @@ async def find_avaialbleTime(ctx, client):
             msg_content = date_msg.content
 
         try:
-            date_ms = msg_content
-            date = datetime.strptime(date_ms, "%m/%d/%y")
+            days = parse_days(msg_content)
         except Exception as e:
             await channel.send(
                 "Looks like "
                 + str(e)
                 + ". Please re-enter your dates.\n"
                 + "Here is the format you should follow:\n"
-                + "mm/dd/yy"
+                + "mm/dd/yy or mm/dd/yy mm/dd/yy"
             )
-            event_date = False
-            continue
 
-        event_date = True
+    first_day, last_day = days
+    start_time = datetime.strptime(range1, "%I:%M %p").time()
+    end_time = datetime.strptime(range2, "%I:%M %p").time()
+    days, inte = await run_storage(find_available_time, str(ctx.author.id), first_day, last_day,
+                                      start_time, end_time)
+    avai_msg = ""
+    if len(inte) == 0:
+        avai_msg += "There is no available time for the event."
+    else:
+        avai_msg += "There are some available time slots for your event: \n"
+        for start, end in inte:
+            avai_msg += start.strftime("%Y-%m-%d %H:%M:%S") + " - " + end.strftime("%Y-%m-%d %H:%M:%S") + "\n"
+    msg = ""
+    for day, records in days.items():
+        msg += day.strftime("%Y-%m-%d") + ":\n"
+        for e in records:
+            msg += ("  " + e.name + ", from " + e.start_date.strftime("%Y-%m-%d %H:%M:%S") + " to "
+                    + e.end_date.strftime("%Y-%m-%d %H:%M:%S") + "\n")
+    if first_day == last_day:
+        period = "On " + first_day.strftime("%Y-%m-%d")
+    else:
+        period = "From " + first_day.strftime("%Y-%m-%d") + " to " + last_day.strftime("%Y-%m-%d")
+    await send_lines(channel, period + ", you have scheduled: \n" + msg + "\n" + avai_msg)
 
-    if date_ms != '':
-        date_str = date.strftime("%Y-%m-%d")
-        events = getEventsOnDate(ctx, date_str)
-        msg = ''
-        inte = findIntersection(date_ms, datetime.strptime(date_ms + " " + range1, "%m/%d/%y %I:%M %p"),
-                                datetime.strptime(date_ms + " " + range2, "%m/%d/%y %I:%M %p"), events)
-        avai_msg = ""
-        if len(inte) == 0:
-            avai_msg += "There is no available time for the event."
-        else:
-            avai_msg += "There are some available time slots for your event: \n"
-            for t in inte:
-                avai_msg += t.get('start').strftime("%Y-%m-%d %H:%M:%S") + " - " + t.get('end').strftime(
-                    "%Y-%m-%d %H:%M:%S") + "\n"
-        for e in events:
-            msg += e.name + ", from " + e.start_date + " to " + e.end_date + "\n"
-        await channel.send(
-            "On " + date_str + ", you have scheduled: \n"
-            + msg
-            + "\n"
-            + avai_msg
-        )
+
+def parse_days(text):
+    """
+    Function:
+        parse_days
+    Description:
+        Reads the days !find looks at, one mm/dd/yy date or the first and last day of a range
+    Input:
+        text - The message the user entered
+    Output:
+        - The first and last day as date objects
+    Raises:
+        ValueError if the message is not one or two dates
+    """
+    days = [datetime.strptime(part, "%m/%d/%y").date() for part in text.split()]
+    if not 1 <= len(days) <= 2:
+        raise ValueError("one or two dates are needed")
+    return min(days), max(days)
+
+
+def find_available_time(user_id, first_day, last_day, start_time, end_time):
+    """
+    Function:
+        find_available_time
+    Description:
+        Finds the free parts of an event type's preferred time on every day of a range, from the minute bitmaps
+        of the user's calendar (see occupancy.py). Events crossing midnight and preferred times running past
+        midnight are clipped correctly.
+    Input:
+        user_id - String representing the Discord ID of the user
+        first_day, last_day - date objects, both included
+        start_time, end_time - time objects of the preferred time, an end not after the start runs into the next day
+    Output:
+        - The events touching the preferred windows grouped by the day they start on, and the free (start, end)
+          pairs ordered by start
+    """
+    windows = preferred_windows(first_day, last_day, start_time, end_time)
+    # Events between the windows, e.g. in the middle of the day, are left out
+    return read_records_by_day(user_id, windows), [slot for start, end in windows for slot in read_free_slots(user_id, start, end)]
+
+
+def _as_datetime(value):
+    # Events built by getEventsOnDate hold their dates as strings
+    return value if isinstance(value, datetime) else parse_date(value)
 
 
 def findIntersection(date, range1, range2, events):
@@ -170,80 +193,22 @@ def findIntersection(date, range1, range2, events):
     Function:
         findIntersection
     Description:
-        Find the intersection of the preferred time of event type and the scheduled events
+        Find the intersection of the preferred time of event type and the scheduled events, by subtracting the
+        merged events from the preferred time in a single pass
     Input:
         date - String of date, the date that user is looking for available time
         range1 - The start time of the preferred time of event type
         range2 - The end time of the preferred time of event type
-        events - A list of events which scheduled on the date
+        events - A list of events which scheduled on the date, with string or datetime dates
     Output:
         - A list of available time for the date
     """
-    etime = []
-    event_atime = []
-    available_time = []
+    busy = []
     for e in events:
-        start_date = re.split("\s", e.start_date)
-        end_date = re.split("\s", e.end_date)
-        start = datetime.strptime(date + " " + start_date[1], "%m/%d/%y %H:%M:%S")
-        end = ''
-        if datetime.strptime(end_date[0], "%Y-%m-%d") > datetime.strptime(date, "%m/%d/%y"):
-            end = datetime.strptime(date + " 24:00:00", "%m/%d/%y %H:%M:%S")
-        else:
-            end = datetime.strptime(date + " " + end_date[1], "%m/%d/%y %H:%M:%S")
-        etime.append({'start': start, 'end': end})
-    print(etime)
-    # Find available time
-    a_time = []
-    if len(etime) == 0:
-        pass
-    else:
-        for t in etime:
-            aetime = []
-            # If no intersection between event and favored time
-            if range1 >= t.get('end'):
-                free_start = range1
-                free_end = range2
-                aetime.append({'start': free_start, 'end': free_end})
-            if range2 <= t.get('start'):
-                free_start = range1
-                free_end = range2
-                aetime.append({'start': free_start, 'end': free_end})
-
-            # If favored time in between the event
-            if t.get('start') <= range1 < range2 <= t.get('end'):
-                # do nothing
-                pass
-
-            # If favored time overlap the event
-            if t.get('start') < range1 < t.get('end') < range2:
-                free_start = t.get('end')
-                free_end = range2
-                aetime.append({'start': free_start, 'end': free_end})
-            if range1 < t.get('start') < range2 < t.get('end'):
-                free_start = range1
-                free_end = t.get('start')
-                aetime.append({'start': free_start, 'end': free_end})
-
-            # If event in between the favored time
-            if range1 <= t.get('start') < t.get('end') <= range2:
-                free_start = range1
-                free_end = t.get('start')
-                aetime.append({'start': free_start, 'end': free_end})
-                free_start = t.get('end')
-                free_end = range2
-                aetime.append({'start': free_start, 'end': free_end})
-
-            event_atime.append(aetime)
-        print(event_atime)
-        if len(event_atime) == 1:
-            available_time = event_atime[0]
-        if len(event_atime) > 1:
-            # Find intersection, if no intersection, then no available time
-            next_event = event_atime[1]
-            available_time = findInter(next_event, event_atime, 0, len(event_atime) - 1)
-
-    return available_time
+        start, end = _as_datetime(e.start_date), _as_datetime(e.end_date)
+        if start is not None and end is not None:
+            busy.append((start, end))
+    return [{'start': start, 'end': end} for start, end in subtract_busy(range1, range2, busy)]
 
 
 def findInter(next_event, event_atime, idx, end):
@@ -251,7 +216,7 @@ def findInter(next_event, event_atime, idx, end):
     Function:
         findInter
     Description:
-        The helper iterator function to find the intersection
+        Intersects lists of available time, walking each pair of lists once
     Input:
         next_event - available time based on the next event
         event_atime - a list of available time based on events on date
@@ -260,46 +225,10 @@ def findInter(next_event, event_atime, idx, end):
     Output:
         - A list of available time for the date
     """
-    if idx == end:
-        return next_event
-    available_time = []
-    for at in event_atime[idx]:
-        for nt in next_event:
-            # If no intersection between event and favored time
-            if at.get('start') >= nt.get('end'):
-                pass
-            if at.get('end') <= nt.get('start'):
-                pass
-
-            # If in between
-            if nt.get('start') <= at.get('start') < at.get('end') <= nt.get('end'):
-                free_start = at.get('start')
-                free_end = at.get('end')
-                f_time = {'start': free_start, 'end': free_end}
-                if f_time not in available_time:
-                    available_time.append({'start': free_start, 'end': free_end})
-
-            if at.get('start') < nt.get('start') < nt.get('end') < at.get('end'):
-                free_start = nt.get('start')
-                free_end = nt.get('end')
-                f_time = {'start': free_start, 'end': free_end}
-                if f_time not in available_time:
-                    available_time.append({'start': free_start, 'end': free_end})
-
-            # If overlap
-            if nt.get('start') <= at.get('start') < nt.get('end') <= at.get('end'):
-                free_start = at.get('start')
-                free_end = nt.get('end')
-                f_time = {'start': free_start, 'end': free_end}
-                if f_time not in available_time:
-                    available_time.append({'start': free_start, 'end': free_end})
-            if at.get('start') <= nt.get('start') < at.get('end') <= nt.get('end'):
-                free_start = nt.get('start')
-                free_end = at.get('end')
-                f_time = {'start': free_start, 'end': free_end}
-                if f_time not in available_time:
-                    available_time.append({'start': free_start, 'end': free_end})
-    return findInter(available_time, event_atime, idx + 1, end)
+    available_time = sorted((t.get('start'), t.get('end')) for t in next_event)
+    for slots in event_atime[idx:end]:
+        available_time = intersect_slots(sorted((t.get('start'), t.get('end')) for t in slots), available_time)
+    return [{'start': start, 'end': end} for start, end in available_time]
 
 
 def getEventsOnDate(ctx, stdate):
@@ -314,24 +243,16 @@ def getEventsOnDate(ctx, stdate):
     Output:
         - Provides a list of events associated with that day
     """
-    key = load_key(str(ctx.author.id))
-    decrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + str(ctx.author.id) + ".csv")
-    with open(os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + str(ctx.author.id) + ".csv",
-              "r") as calendar_lines:
-        calendar_lines = csv.reader(calendar_lines, delimiter=",")
-        fields = next(calendar_lines)  # The column headers will always be the first line of the csv file
-        rows = []
-        line = []
-        line_number = 0
-        for line in calendar_lines:
-            if len(line) > 0:
-                temp = re.split("\s", line[2])
-                if str(temp[0]).__contains__(str(stdate)):
-                    rows.append(line)
-
-        Events = []
-        for line in rows:
-            eve = Event(line[1], line[2], line[3], line[4], line[5], line[6])
-            Events.append(eve)
-    encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + str(ctx.author.id) + ".csv")
+    rows = []
+    day = datetime.strptime(str(stdate), "%Y-%m-%d")
+    # Only the events touching that day are fetched from storage
+    for line in read_events_between(str(ctx.author.id), day, day + timedelta(days=1)):
+        temp = re.split(r"\s", line[2])
+        if str(temp[0]).__contains__(str(stdate)):
+            rows.append(line)
+
+    Events = []
+    for line in rows:
+        eve = Event(line[1], line[2], line[3], line[4], line[5], line[6])
+        Events.append(eve)
     return Events
@@ -2,9 +2,9 @@
 
 import datetime
 import discord
-import os
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+
+from src.functionality.Google import google_service
+from src.functionality.google_access import execute
 
 
 async def get_events(ctx, arg):
@@ -23,23 +23,17 @@ async def get_events(ctx, arg):
     '''
     print("in events")
     channel = await ctx.author.create_dm()
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
-    
-    token_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
-        os.path.abspath(__file__)))), "json", "token.json")
-	# If the user has already logged in, the details are extractecd from token.js
-    if os.path.exists(token_file):
-        creds = Credentials.from_authorized_user_file(
-            token_file, SCOPES)
-    else:
+
+    # If the user has already logged in, their cached service is reused
+    service = await google_service(str(ctx.author.id))
+    if service is None:
         await channel.send("You are not logged into Google. PLease login using the !ConnectGoogle command")
-    print("token found")
-    service = build('calendar', 'v3', credentials=creds)
+        return
     now = datetime.datetime.utcnow().isoformat() + 'Z'
     print('Getting the upcoming 10 events')
-    events_result = service.events().list(calendarId='primary', timeMin=now,
-                                               maxResults=10, singleEvents=True, 
-                                               orderBy='startTime').execute()
+    events_result = await execute(str(ctx.author.id), service.events().list(calendarId='primary', timeMin=now,
+                                                                          maxResults=10, singleEvents=True,
+                                                                          orderBy='startTime'))
     events = events_result.get('items', [])
 
     if not events:
@@ -1,12 +1,12 @@
 import os
 import re
 import sys
-import csv
 from pathlib import Path
 from types import TracebackType
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
-from src.functionality.export_file import load_key, encrypt_file, decrypt_file
+from src.functionality.shared_functions import read_type_file, write_type_file
+from src.functionality.storage_access import run_locked, run_storage
 
 def delete_type(rows, msg_content):
     """
@@ -71,75 +71,58 @@ async def delete_event_type(ctx, client):
     line_number = 0
     channel = await ctx.author.create_dm()
     print(ctx.author.id)
-    key = load_key(str(ctx.author.id))
     def check(m):
         return m.content is not None and m.channel == channel and m.author == ctx.author
 
-    filename =str(ctx.author.id) + "event_types"
     try:
 
-        # Checks if the calendar csv file exists
-        if not os.path.exists(os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(filename) + ".csv"):
+        # Checks if the event type file exists
+        try:
+            type_rows = await run_storage(read_type_file, str(ctx.author.id))
+        except FileNotFoundError:
+            await channel.send("You have not created any events type yet!!")
+            return
+
+        fields = type_rows[0]  # The column headers will always be the first line of the csv file
+
+        new_row=[]
+        #printing the list of event type
+        temp1=print_type(type_rows[1:])
+        rows = temp1[0]
+        list_types=temp1[1]
+
+        if list_types=='':
             await channel.send("You have not created any events type yet!!")
         else:
-            # Decrypt the file
-            decrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(ctx.author.id) + "event_types" + ".csv")
-            dec = True
-            # Opens the current user's csv calendar file
-            with open(
-                os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(filename) + ".csv", "r"
-            ) as calendar_lines:
-                calendar_lines = csv.reader(calendar_lines, delimiter=",")
-                fields = next(calendar_lines)  # The column headers will always be the first line of the csv file
-                
-                new_row=[]
-                #printing the list of event type
-                temp1=print_type(calendar_lines)
-                rows = temp1[0]
-                list_types=temp1[1]
+            await channel.send("List of your available events types are:" + list_types)
 
-                if list_types=='':
-                    await channel.send("You have not created any events type yet!!")
-                else:
-                    await channel.send("List of your available events types are:" + list_types)
+            await channel.send("Please enter the event type to be deleted")
+            # Waits for user input
+            event_msg = await client.wait_for("message", check=check)
+            # Strips message to just the text the user entered
+            msg_content = str(event_msg.content)
 
-                    await channel.send("Please enter the event type to be deleted")
-                    # Waits for user input
-                    event_msg = await client.wait_for("message", check=check)
-                    # Strips message to just the text the user entered
-                    msg_content = str(event_msg.content)
+            # Searching and deleting the event type
+            temp= delete_type(rows, msg_content)
+            new_row=temp[0]
+            flag= temp[1]
+            line_number = temp[2]
 
-                    # Searching and deleting the event type
-                    temp= delete_type(rows, msg_content)
-                    new_row=temp[0]
-                    flag= temp[1]
-                    line_number = temp[2]
-                
-                    if flag==0:
-                        await channel.send("Event type does not exist")
-                    if flag==1:
-                        await channel.send("Event type " + msg_content +" has been deleted.")
+            if flag==0:
+                await channel.send("Event type does not exist")
+            if flag==1:
+                await channel.send("Event type " + msg_content +" has been deleted.")
 
-                 # Open current user's calendar file for writing
-                with open(
-                    os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(filename) + ".csv", "w", newline=""
-                ) as calendar_file:
-                    # Write to column headers and array of rows back to the calendar file
-                    csvwriter = csv.writer(calendar_file)
-               # print (str(fields))
-               # print (str(new_row))
-                    csvwriter.writerow(fields)
-                    if line_number > 1:
-                        csvwriter.writerows(new_row)
-                    elif line_number == 1:
-                        csvwriter.writerow(new_row[0])
-            encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(ctx.author.id) + "event_types" + ".csv")
+        # Write the column headers and array of rows back to the event type file
+        updated_rows = [fields]
+        if line_number > 1:
+            updated_rows.extend(new_row)
+        elif line_number == 1:
+            updated_rows.append(new_row[0])
+        await run_locked(str(ctx.author.id), write_type_file, str(ctx.author.id), updated_rows)
     except Exception as e:
         # Outputs an error message if the event could not be created
         print(e)
-
-        if dec:
-            encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Type/" + str(ctx.author.id) + "event_types" + ".csv")
         await channel.send(
             "There was an error deleting your event."
         )
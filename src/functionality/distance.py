@@ -3,6 +3,9 @@ import requests
 import sys
 import json
 
+# Base URL of the Geocoding and Distance Matrix APIs, overridable to run against fake_services
+MAPS_API_URL = os.environ.get("SCHEDULEBOT_MAPS_API_URL", "https://maps.googleapis.com/maps/api/")
+
 def get_key():
     '''
     Function to extract API key
@@ -41,7 +44,7 @@ def get_lat_log(address, api_key_1):
         return None
 
     address2 = address.replace(" ", "+")
-    url = f"https://maps.googleapis.com/maps/api/geocode/json?key={api_key_1}&address={address2}&language=en-EN"
+    url = f"{MAPS_API_URL}geocode/json?key={api_key_1}&address={address2}&language=en-EN"
     try:
         r = requests.get(url)
         response_json = r.json()
@@ -87,7 +90,7 @@ def get_distance(dest, src, mode):
 
     orig = f"{src_lat_lon[0]},{src_lat_lon[1]}"
     dest = f"{dest_lat_lon[0]},{dest_lat_lon[1]}"
-    url = f"https://maps.googleapis.com/maps/api/distancematrix/json?key={api_key_1}&origins={orig}&destinations={dest}&mode={mode}&language=en-EN&sensor=false"
+    url = f"{MAPS_API_URL}distancematrix/json?key={api_key_1}&origins={orig}&destinations={dest}&mode={mode}&language=en-EN&sensor=false"
     
     try:
         r = requests.get(url)
@@ -4,7 +4,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
 
-from src.functionality.shared_functions import read_event_file
+from src.functionality.shared_functions import repository
 from datetime import datetime
 
 def format_event_history(events):
@@ -23,6 +23,6 @@ def get_event_history(user_id):
     """
     Fetches the event history for the given user ID.
     """
-    events = read_event_file(user_id)
-    past_events = [event for event in events if datetime.strptime(event[3], "%Y-%m-%d %H:%M:%S") < datetime.now()]
+    now = datetime.now()
+    past_events = repository.select_events(user_id, lambda table: table.ended_before(now))
     return format_event_history(past_events)
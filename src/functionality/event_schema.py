@@ -0,0 +1,297 @@
+# functionality/event_schema.py
+
+from src.Event import Event
+from src.functionality.storage import ADD, DATE_FORMAT, DELETE, EDIT, RECURRENCE, parse_date
+
+# Version of the calendar header written by this code
+SCHEMA_VERSION = 2
+
+# Calendar header of every schema version. Version 1 was written for calendars created by the Google Calendar sync
+SCHEMA_HEADERS = {
+    1: ["eventId", "name", "startDateTime", "endDateTime", "priority", "type", "desc", "location"],
+    2: ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"],
+}
+
+# Column names mapped to the position of their field in the current schema. Names are compared lower case and
+# without spaces, dashes or underscores, so headers of other variants (old files, hand edited exports) still decode
+COLUMN_ALIASES = {
+    "id": 0, "eventid": 0, "uid": 0,
+    "name": 1, "eventname": 1, "summary": 1, "title": 1,
+    "startdate": 2, "startdatetime": 2, "start": 2, "dtstart": 2,
+    "enddate": 3, "enddatetime": 3, "end": 3, "dtend": 3,
+    "priority": 4,
+    "type": 5, "eventtype": 5,
+    "notes": 6, "desc": 6, "description": 6,
+    "location": 7,
+}
+
+
+def current_header():
+    """
+    Function: current_header
+    Description: Returns the calendar header of the current schema version.
+
+    Input: None
+    Output:
+        A new list with the column names
+    """
+    return list(SCHEMA_HEADERS[SCHEMA_VERSION])
+
+
+class EventRecord(Event):
+    """
+    Class:
+        EventRecord
+    Description:
+        An Event decoded from a calendar row. Dates are datetime objects parsed once when the row is loaded, or None
+        if the stored value is not a valid date. row holds the event in the current schema, as it is written back.
+        A recurring event keeps its rule in the optional column after Location, and its dates are those of its
+        first occurrence (see recurrence.py). An occurrence expanded from it has an ID of its own and names the
+        recurring event's ID in recurrence_of.
+    """
+
+    def __init__(self, event_id, name, start_date, end_date, priority, event_type, description, location, row,
+                 recurrence="", recurrence_of=""):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new EventRecord, use EventSchema.decode to build one from a stored row
+        Output:
+            - A new EventRecord instance
+        """
+        super().__init__(name, start_date, end_date, priority, event_type, description, location, recurrence)
+        self.event_id = event_id
+        self.row = row
+        self.recurrence_of = recurrence_of
+
+    def has_dates(self):
+        """Returns True if both dates of the event are valid."""
+        return self.start_date is not None and self.end_date is not None
+
+    def is_recurring(self):
+        """Returns True if the event has a recurrence rule."""
+        return bool(self.recurrence.strip())
+
+    def to_row(self):
+        """Returns a copy of the event's row in the current schema."""
+        return list(self.row)
+
+
+class EventSchema:
+    """
+    Class:
+        EventSchema
+    Description:
+        Maps the columns of a calendar header to the fields of the current schema. version is the schema version the
+        header belongs to, or 0 for a header that is no known version and was mapped by its column names.
+    """
+
+    def __init__(self, version, columns):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new EventSchema, use from_header to build one from a calendar header
+        Input:
+            version - Schema version of the header
+            columns - For every field of the current schema, the position of its column or None if it is missing.
+                      Columns mapped to no field (like participants) are kept after the fields
+        Output:
+            - A new EventSchema instance
+        """
+        self.version = version
+        self.columns = columns
+
+    @classmethod
+    def from_header(cls, header):
+        """
+        Function:
+            from_header
+        Description:
+            Recognizes the schema of a calendar header
+        Input:
+            header - The first row of the calendar
+        Output:
+            - The EventSchema of the header
+        """
+        fields = len(SCHEMA_HEADERS[SCHEMA_VERSION])
+        for version, names in SCHEMA_HEADERS.items():
+            if list(header[:len(names)]) == names:
+                return cls(version, tuple(range(fields)))
+
+        columns = [None] * fields
+        for position, name in enumerate(header):
+            field = COLUMN_ALIASES.get("".join(name.lower().split()).replace("_", "").replace("-", ""))
+            if field is not None and columns[field] is None:
+                columns[field] = position
+        if columns[2] is None or columns[3] is None:
+            # Without recognizable date columns the rows are read in the current column order
+            return cls(0, tuple(range(fields)))
+        return cls(0, tuple(columns))
+
+    def is_current(self):
+        """Returns True if rows of this schema are stored exactly like the current schema stores them."""
+        return self.version == SCHEMA_VERSION
+
+    def decode(self, row):
+        """
+        Function:
+            decode
+        Description:
+            Decodes one stored row, parsing its dates
+        Input:
+            row - An event row in this schema
+        Output:
+            - The EventRecord of the row
+        """
+        if self.is_current():
+            upgraded = list(row)
+        else:
+            upgraded = [row[column] if column is not None and column < len(row) else "" for column in self.columns]
+            mapped = set(self.columns)
+            upgraded += [value for position, value in enumerate(row) if position not in mapped]
+        fields = upgraded + [""] * (8 - len(upgraded))
+        return EventRecord(
+            fields[0],
+            fields[1],
+            parse_date(fields[2]),
+            parse_date(fields[3]),
+            fields[4],
+            fields[5],
+            fields[6],
+            fields[7] or "None",
+            upgraded,
+            fields[RECURRENCE] if len(fields) > RECURRENCE else "",
+        )
+
+
+def make_record(event_id, name, start_date, end_date, priority="", event_type="", description="", location="None",
+                recurrence="", recurrence_of=""):
+    """
+    Function: make_record
+    Description: Builds an EventRecord from values that are already parsed, formatting its row once.
+
+    Input:
+        event_id, name, priority, event_type, description, location - The event's fields
+        start_date, end_date - datetime objects, of the first occurrence for a recurring event
+        recurrence - Optional recurrence rule, the column is only written for recurring events
+        recurrence_of - ID of the recurring event, for an occurrence of it
+    Output:
+        The new EventRecord
+    """
+    row = [event_id, name, start_date.strftime(DATE_FORMAT), end_date.strftime(DATE_FORMAT), str(priority),
+           event_type, description, location]
+    if recurrence:
+        row.append(recurrence)
+    return EventRecord(event_id, name, start_date, end_date, str(priority), event_type, description, location, row,
+                       recurrence, recurrence_of)
+
+
+# Schema of rows written by this code
+CURRENT_SCHEMA = EventSchema(SCHEMA_VERSION, tuple(range(len(SCHEMA_HEADERS[SCHEMA_VERSION]))))
+
+
+def decode_row(row):
+    """
+    Function: decode_row
+    Description: Decodes one event row stored in the current schema.
+
+    Input:
+        row - The event row
+    Output:
+        The EventRecord of the row
+    """
+    return CURRENT_SCHEMA.decode(row)
+
+
+def decode_rows(rows):
+    """
+    Function: decode_rows
+    Description: Decodes a calendar, header included, parsing every date exactly once. Empty rows are dropped.
+
+    Input:
+        rows - List of calendar rows, header included
+    Output:
+        schema - The EventSchema of the calendar's header
+        records - List of EventRecords, in calendar order
+    """
+    schema = EventSchema.from_header(rows[0] if rows else current_header())
+    return schema, [schema.decode(row) for row in rows[1:] if len(row) > 0]
+
+
+def upgrade_rows(rows):
+    """
+    Function: upgrade_rows
+    Description: Rewrites a calendar, header included, in the current schema.
+
+    Input:
+        rows - List of calendar rows, header included
+    Output:
+        rows - The calendar in the current schema, rows of the current schema are returned unchanged
+    """
+    schema, records = decode_rows(rows)
+    if schema.is_current():
+        return [list(row) for row in rows if len(row) > 0]
+    return [current_header()] + [record.to_row() for record in records]
+
+
+def apply_record_mutation(records, action, event_id, record=None):
+    """
+    Function: apply_record_mutation
+    Description: Applies a single event mutation to decoded records in place, with the same rules as
+    storage.apply_mutation but comparing the dates parsed at load instead of parsing them again.
+
+    Input:
+        records - List of EventRecords, in calendar order
+        action - ADD, EDIT or DELETE
+        event_id - ID of the event the mutation targets
+        record - The new EventRecord, unused by DELETE
+    Output:
+        The number of records added, changed or removed
+    """
+    if action == ADD:
+        for position, current in enumerate(records):
+            if (record.start_date is not None and current.start_date is not None
+                    and record.start_date < current.start_date):
+                records.insert(position, record)
+                return 1
+        records.append(record)
+        return 1
+    if action == EDIT:
+        changed = 0
+        for position, current in enumerate(records):
+            if current.event_id == event_id:
+                records[position] = record
+                changed += 1
+        return changed
+    if action == DELETE:
+        count = len(records)
+        records[:] = [current for current in records if current.event_id != event_id]
+        return count - len(records)
+    raise ValueError(f"Unknown event mutation: {action}")
+
+
+def merge_records(records, batch):
+    """
+    Function: merge_records
+    Description: Merges a batch of new EventRecords into records ordered by start date in one pass, with the same
+    rules as storage.merge_chronological.
+
+    Input:
+        records - List of EventRecords ordered by start date
+        batch - List of EventRecords to add, in any order
+    Output: None
+    """
+    dated = sorted((record for record in batch if record.start_date is not None), key=lambda record: record.start_date)
+    merged = []
+    next_pending = 0
+    for current in records:
+        if current.start_date is not None:
+            while next_pending < len(dated) and dated[next_pending].start_date < current.start_date:
+                merged.append(dated[next_pending])
+                next_pending += 1
+        merged.append(current)
+    merged.extend(dated[next_pending:])
+    merged.extend(record for record in batch if record.start_date is None)
+    records[:] = merged
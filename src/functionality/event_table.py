@@ -0,0 +1,219 @@
+# functionality/event_table.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.functionality.event_schema import decode_row
+from src.functionality.storage import RECURRING_END, parse_date
+
+# Dates are stored as seconds since 1970-01-01 00:00:00 on the calendar's own wall clock, like the csv files
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def to_epoch(moment):
+    """
+    Function: to_epoch
+    Description: Converts a datetime to the seconds used by EventTable.
+
+    Input:
+        moment - datetime object
+    Output:
+        Seconds since 1970-01-01 00:00:00
+    """
+    return int((moment - EPOCH).total_seconds())
+
+
+def from_epoch(seconds):
+    """
+    Function: from_epoch
+    Description: Converts seconds used by EventTable back to a datetime.
+
+    Input:
+        seconds - Seconds since 1970-01-01 00:00:00
+    Output:
+        The datetime object
+    """
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+def _seconds(moments):
+    # Converts the dates parsed at load to int64 seconds in one pass
+    return np.array(moments, dtype="datetime64[s]").astype(np.int64)
+
+
+def _encode(values):
+    # Dictionary encodes a column: the distinct values and, for every row, the position of its value
+    categories, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return categories, codes.astype(np.int32)
+
+
+class EventTable:
+    """
+    Class:
+        EventTable
+    Description:
+        A user's events stored column by column in NumPy arrays, so date window filters, past/future splits and
+        per-day grouping run as vectorized masks instead of strptime calls in Python loops.
+        Start and end dates are int64 seconds (see to_epoch), priorities int8, types and locations dictionary
+        encoded categoricals, and IDs, names and notes string arrays. Events whose dates cannot be parsed are left
+        out; source holds the position of every event in the rows the table was built from.
+        A recurring event starts with its first occurrence and, as in storage, ends at RECURRING_END, so it never
+        counts as past. Tables built from expanded occurrences (see recurrence.py) hold no recurring events.
+    """
+
+    def __init__(self, source, ids, names, start, end, priority, type_categories, type_codes, notes,
+                 location_categories, location_codes, recurring=None):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new EventTable from its columns, use from_rows to build one from calendar rows
+        Output:
+            - A new EventTable instance
+        """
+        self.source = source
+        self.ids = ids
+        self.names = names
+        self.start = start
+        self.end = end
+        self.priority = priority
+        self.type_categories = type_categories
+        self.type_codes = type_codes
+        self.notes = notes
+        self.location_categories = location_categories
+        self.location_codes = location_codes
+        self.recurring = np.zeros(len(start), dtype=bool) if recurring is None else recurring
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Function:
+            from_rows
+        Description:
+            Builds the table from event rows (no header) in the current schema
+        Input:
+            rows - Event rows, [ID, Name, Start Date, End Date, Priority, Type, Notes, Location]
+        Output:
+            - A new EventTable instance
+        """
+        return cls.from_records([decode_row(row) for row in rows])
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Function:
+            from_records
+        Description:
+            Builds the table from decoded events, reusing the dates parsed when they were loaded
+        Input:
+            records - EventRecords, see event_schema.py
+        Output:
+            - A new EventTable instance
+        """
+        source = np.array([position for position, record in enumerate(records) if record.has_dates()], dtype=np.int64)
+        records = [records[position] for position in source]
+        recurring_end = parse_date(RECURRING_END)
+        priority = np.array([int(record.priority) if str(record.priority).strip().lstrip("-").isdigit() else 0
+                             for record in records], dtype=np.int64).clip(-128, 127).astype(np.int8)
+        type_categories, type_codes = _encode([record.event_type for record in records])
+        location_categories, location_codes = _encode([record.location for record in records])
+        return cls(
+            source,
+            np.array([record.event_id for record in records], dtype=str),
+            np.array([record.name for record in records], dtype=str),
+            _seconds([record.start_date for record in records]),
+            _seconds([recurring_end if record.is_recurring() else record.end_date for record in records]),
+            priority,
+            type_categories,
+            type_codes,
+            np.array([record.description for record in records], dtype=str),
+            location_categories,
+            location_codes,
+            np.array([record.is_recurring() for record in records], dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.start)
+
+    def types(self):
+        """Returns the type of every event."""
+        return self.type_categories[self.type_codes]
+
+    def locations(self):
+        """Returns the location of every event."""
+        return self.location_categories[self.location_codes]
+
+    def between(self, start, end):
+        """
+        Function:
+            between
+        Description:
+            Selects the events falling into the window [start, end), with the same rule as storage.overlaps
+        Input:
+            start, end - datetime objects of the window
+        Output:
+            Boolean mask over the events
+        """
+        start, end = to_epoch(start), to_epoch(end)
+        return (self.start < end) & ((self.end > start) | (self.start >= start))
+
+    def ended_before(self, moment):
+        """
+        Function:
+            ended_before
+        Description:
+            Selects the events that are over at the given moment
+        Input:
+            moment - datetime object
+        Output:
+            Boolean mask over the events
+        """
+        return self.end < to_epoch(moment)
+
+    def starts_after(self, moment):
+        """
+        Function:
+            starts_after
+        Description:
+            Selects the events that haven't started at the given moment, and the recurring events, whose next
+            occurrences may still be to come
+        Input:
+            moment - datetime object
+        Output:
+            Boolean mask over the events
+        """
+        return (self.start > to_epoch(moment)) | self.recurring
+
+    def by_day(self, mask=None):
+        """
+        Function:
+            by_day
+        Description:
+            Groups the events by the day they start on
+        Input:
+            mask - Optional boolean mask selecting the events to group
+        Output:
+            Dictionary from date to the positions of the events starting that day, in start order
+        """
+        positions = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        positions = positions[np.argsort(self.start[positions], kind="stable")]
+        days = self.start[positions] // SECONDS_PER_DAY
+        unique_days, first = np.unique(days, return_index=True)
+        groups = np.split(positions, first[1:])
+        return {(EPOCH + timedelta(days=int(day))).date(): group for day, group in zip(unique_days, groups)}
+
+    def select(self, rows, mask):
+        """
+        Function:
+            select
+        Description:
+            Picks the rows of the selected events out of the rows the table was built from
+        Input:
+            rows - The rows passed to from_rows
+            mask - Boolean mask over the events
+        Output:
+            rows - The selected rows, in their original order
+        """
+        return [rows[position] for position in self.source[mask]]
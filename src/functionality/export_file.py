@@ -1,39 +1,208 @@
+import io
 import os
 import csv
+import gzip
+import json
 import discord
+from datetime import datetime, timedelta
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
-from src.functionality.shared_functions import create_event_file, create_event_directory
+from src.functionality.event_schema import decode_rows
+from src.functionality.shared_functions import (
+    EVENT_HEADER,
+    create_event_tree,
+    read_event_file,
+    read_events_between,
+)
+from src.functionality.storage import rows_to_csv
+from src.functionality.storage_access import run_locked, run_storage
+from icalendar import Calendar, Event as IcsEvent, vRecur
 
-from src.functionality.shared_functions import load_key, decrypt_file, encrypt_file
+# Formats !exportfile can write
+EXPORT_FORMATS = ("csv", "ics", "jsonl")
 
+# Exports larger than this many bytes are sent gzip compressed
+GZIP_THRESHOLD = 1024 * 1024
 
-async def export_file(ctx):
+# Date formats accepted for the export range
+RANGE_FORMATS = ["%m/%d/%y", "%Y-%m-%d"]
+
+
+def parse_export_args(args):
+    """
+    Function:
+        parse_export_args
+    Description:
+        Reads the optional format and date range of !exportfile, e.g. "ics 10/01/21 10/31/21". A single date exports
+        that day only, two dates export every day from the first to the second.
+    Input:
+        args - The words following the command
+    Output:
+        - The format, and the start and end datetimes of the range (None when no range was given)
+    Raises:
+        ValueError if an argument is neither a format nor a date
+    """
+    export_format = "csv"
+    days = []
+    for arg in args:
+        if arg.lower() in EXPORT_FORMATS:
+            export_format = arg.lower()
+            continue
+        for date_format in RANGE_FORMATS:
+            try:
+                days.append(datetime.strptime(arg, date_format))
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"'{arg}' is not a format ({', '.join(EXPORT_FORMATS)}) or a mm/dd/yy date")
+    if len(days) > 2:
+        raise ValueError("At most two dates can be given")
+    if not days:
+        return export_format, None, None
+    start, end = min(days), max(days)
+    return export_format, start, end + timedelta(days=1)
+
+
+def write_csv(stream, rows):
+    """
+    Function:
+        write_csv
+    Description:
+        Writes calendar rows, header included, to a binary stream as CSV
+    Input:
+        stream - Binary stream to write to
+        rows - List of calendar rows, header included
+    Output: None
+    """
+    stream.write(rows_to_csv(rows).encode("utf-8"))
+
+
+def write_jsonl(stream, rows):
+    """
+    Function:
+        write_jsonl
+    Description:
+        Writes calendar rows to a binary stream as JSON Lines, one object per event keyed by the header's columns.
+        Recurring events also get their rule under "Recurrence".
+    Input:
+        stream - Binary stream to write to
+        rows - List of calendar rows, header included
+    Output: None
+    """
+    header = list(rows[0] if rows else EVENT_HEADER)[:len(EVENT_HEADER)] + ["Recurrence"]
+    for row in rows[1:]:
+        stream.write(json.dumps(dict(zip(header, row))).encode("utf-8") + b"\n")
+
+
+def write_ics(stream, rows):
+    """
+    Function:
+        write_ics
+    Description:
+        Writes calendar rows to a binary stream as an ICS calendar, skipping events without valid dates. Recurring
+        events are written once with their RRULE and EXDATE properties, and the occurrences of a ranged export
+        carry their own IDs. Every UID is unique, IDs shared by several events get their position appended.
+    Input:
+        stream - Binary stream to write to
+        rows - List of calendar rows, header included
+    Output: None
+    """
+    calendar = Calendar()
+    calendar.add('prodid', '-//ScheduleBot//EN')
+    calendar.add('version', '2.0')
+    uids = set()
+    for position, record in enumerate(decode_rows(rows)[1]):
+        if not record.has_dates():
+            continue
+        uid = record.event_id or f"schedulebot-{position}"
+        if uid in uids:
+            uid = f"{uid}-{position}"
+        uids.add(uid)
+        event = IcsEvent()
+        event.add('uid', uid)
+        event.add('summary', record.name)
+        event.add('dtstart', record.start_date)
+        event.add('dtend', record.end_date)
+        if record.description:
+            event.add('description', record.description)
+        if record.location and record.location != "None":
+            event.add('location', record.location)
+        if record.event_type:
+            event.add('categories', record.event_type)
+        for line in record.recurrence.splitlines():
+            name, _, value = line.partition(":")
+            try:
+                if name == "RRULE":
+                    event.add('rrule', vRecur.from_ical(value))
+                elif name == "EXDATE":
+                    event.add('exdate', [datetime.strptime(moment, "%Y%m%dT%H%M%S") for moment in value.split(",")])
+            except ValueError:
+                continue
+        calendar.add_component(event)
+    stream.write(calendar.to_ical())
+
+
+WRITERS = {"csv": write_csv, "ics": write_ics, "jsonl": write_jsonl}
+
+
+def build_export(user_id, export_format="csv", start=None, end=None):
+    """
+    Function:
+        build_export
+    Description:
+        Builds an export of the user's calendar in memory from the decrypted rows, never writing plaintext to disk.
+        Exports larger than GZIP_THRESHOLD are gzip compressed.
+    Input:
+        user_id - String representing the Discord ID of the user
+        export_format - "csv", "ics" or "jsonl"
+        start, end - datetime objects of the window [start, end) to export, or None for every event
+    Output:
+        - The BytesIO stream, positioned at its start, and the file name to send it as
+    """
+    if start is None:
+        rows = read_event_file(user_id)
+    else:
+        rows = [EVENT_HEADER] + read_events_between(user_id, start, end)
+
+    stream = io.BytesIO()
+    WRITERS[export_format](stream, rows)
+    filename = f"{user_id}.{export_format}"
+    if stream.tell() > GZIP_THRESHOLD:
+        stream = io.BytesIO(gzip.compress(stream.getvalue()))
+        filename += ".gz"
+    stream.seek(0)
+    return stream, filename
+
+
+async def export_file(ctx, *args):
     """
     Function:
         export_file
     Description:
-        Sends the user a CSV file containing their scheduled events.
+        Sends the user a file containing their scheduled events.
     Input:
         ctx - Discord context window
+        args - Optional format (csv, ics or jsonl) and one or two mm/dd/yy dates limiting the exported days
     Output:
-        - A CSV file sent to the context that contains a user's scheduled events.
+        - A file sent to the context that contains a user's scheduled events.
     """
 
     channel = await ctx.author.create_dm()
-    print(ctx.author.id)
 
     user_id = str(ctx.author.id)
 
-    # Checks if the calendar csv file exists, and creates it if it does not
-    if not os.path.exists(os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv"):
-        create_event_directory()
-        create_event_file(user_id)
+    try:
+        export_format, start, end = parse_export_args(args)
+    except ValueError as e:
+        await channel.send(f"{e}. Usage: !exportfile [csv|ics|jsonl] [start mm/dd/yy] [end mm/dd/yy]")
+        return
 
-    key = load_key(user_id)
-    decrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv")
+    # Checks if the calendar exists, and creates it if it does not
+    await run_locked(user_id, create_event_tree, user_id)
 
-    await channel.send(file=discord.File(os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv"))
+    # The export is built in memory, so the decrypted calendar is never written to disk
+    stream, filename = await run_storage(build_export, user_id, export_format, start, end)
 
-    encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv")
\ No newline at end of file
+    await channel.send(file=discord.File(stream, filename=filename))
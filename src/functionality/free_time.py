@@ -0,0 +1,271 @@
+# functionality/free_time.py
+
+from datetime import datetime, time, timedelta
+
+from src.functionality.shared_functions import read_free_slots
+
+# Free slots shorter than this are not reported by !freetime
+DEFAULT_MIN_SLOT = timedelta(minutes=15)
+
+# !freetime reports slot boundaries on multiples of this
+DEFAULT_GRANULARITY = timedelta(minutes=5)
+
+# Date formats accepted for a !freetime range
+WINDOW_FORMATS = ["%m/%d/%y", "%Y-%m-%d"]
+
+# Longest !freetime range, in days, so one command cannot walk years of calendar
+MAX_WINDOW_DAYS = 92
+
+
+def merge_busy(intervals):
+    """
+    Function: merge_busy
+    Description: Merges busy intervals that overlap or touch, with one sort and one sweep.
+
+    Input:
+        intervals - Iterable of (start, end) pairs, in any order
+    Output:
+        List of disjoint (start, end) pairs ordered by start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def round_up(moment, granularity):
+    """
+    Function: round_up
+    Description: Rounds a moment up to the next multiple of the granularity, counted from datetime.min.
+
+    Input:
+        moment - datetime to round
+        granularity - timedelta the result is a multiple of
+    Output:
+        The rounded datetime, the moment itself if it already is a multiple
+    """
+    remainder = (moment - datetime.min) % granularity
+    return moment + (granularity - remainder) if remainder else moment
+
+
+def _round_down(moment, granularity):
+    return moment - (moment - datetime.min) % granularity
+
+
+def _fit(slot_start, slot_end, min_length, granularity):
+    # Shrinks a free slot to the granularity, returning None if too little of it is left
+    if granularity:
+        slot_start, slot_end = round_up(slot_start, granularity), _round_down(slot_end, granularity)
+    if slot_end > slot_start and slot_end - slot_start >= min_length:
+        return slot_start, slot_end
+    return None
+
+
+def fit_slots(slots, min_length=timedelta(0), granularity=None):
+    """
+    Function: fit_slots
+    Description: Shrinks free slots to start and end on multiples of the granularity and drops the short ones.
+
+    Input:
+        slots - List of free (start, end) pairs
+        min_length - Free slots shorter than this are dropped
+        granularity - Optional timedelta the slot boundaries are rounded to
+    Output:
+        List of the remaining (start, end) pairs, in the same order
+    """
+    fitted = (_fit(slot_start, slot_end, min_length, granularity) for slot_start, slot_end in slots)
+    return [slot for slot in fitted if slot is not None]
+
+
+def subtract_busy(window_start, window_end, busy, min_length=timedelta(0), granularity=None):
+    """
+    Function: subtract_busy
+    Description: Returns the parts of a window not covered by busy intervals, in one pass over the merged intervals.
+
+    Input:
+        window_start, window_end - datetime objects of the window
+        busy - Iterable of (start, end) busy pairs, in any order, they may overlap or reach outside the window
+        min_length - Free slots shorter than this are dropped
+        granularity - Optional timedelta, free slots are shrunk to start and end on multiples of it
+    Output:
+        List of free (start, end) pairs ordered by start
+    """
+    return subtract_busy_windows([(window_start, window_end)], busy, min_length, granularity)
+
+
+def subtract_busy_windows(windows, busy, min_length=timedelta(0), granularity=None):
+    """
+    Function: subtract_busy_windows
+    Description: Returns the parts of several windows not covered by busy intervals. The busy intervals are merged
+    once and walked together with the windows, so a range of days costs one sort and one linear sweep.
+
+    Input:
+        windows - List of (start, end) windows, ordered by start and not overlapping
+        busy - Iterable of (start, end) busy pairs, in any order, they may overlap or reach outside the windows
+        min_length - Free slots shorter than this are dropped
+        granularity - Optional timedelta, free slots are shrunk to start and end on multiples of it
+    Output:
+        List of free (start, end) pairs ordered by start
+    """
+    merged = merge_busy(busy)
+    free = []
+    first = 0
+    for window_start, window_end in windows:
+        # Busy intervals over before this window are over before every later window too
+        while first < len(merged) and merged[first][1] <= window_start:
+            first += 1
+        cursor = window_start
+        position = first
+        while cursor < window_end:
+            if position < len(merged) and merged[position][0] < window_end:
+                start, end = merged[position]
+                position += 1
+            else:
+                start, end = window_end, window_end
+            slot = _fit(cursor, min(start, window_end), min_length, granularity)
+            if slot is not None:
+                free.append(slot)
+            cursor = max(cursor, end)
+    return free
+
+
+def intersect_slots(first, second):
+    """
+    Function: intersect_slots
+    Description: Intersects two lists of free slots with a linear two pointer walk.
+
+    Input:
+        first, second - Lists of disjoint (start, end) pairs ordered by start
+    Output:
+        List of (start, end) pairs free in both, ordered by start
+    """
+    common = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            common.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def preferred_windows(first_day, last_day, start_time, end_time):
+    """
+    Function: preferred_windows
+    Description: Lists the daily preferred window of an event type over a range of days. A window whose end time is
+    not after its start time runs past midnight into the next day.
+
+    Input:
+        first_day, last_day - date objects, both included
+        start_time, end_time - time objects of the daily window
+    Output:
+        List of (start, end) windows ordered by start
+    """
+    windows = []
+    day = first_day
+    while day <= last_day:
+        start = datetime.combine(day, start_time)
+        end = datetime.combine(day, end_time)
+        if end <= start:
+            end += timedelta(days=1)
+        windows.append((start, end))
+        day += timedelta(days=1)
+    return windows
+
+
+def busy_intervals(records):
+    """
+    Function: busy_intervals
+    Description: Turns decoded events into busy (start, end) pairs, skipping events without valid dates.
+
+    Input:
+        records - Iterable of EventRecords
+    Output:
+        List of (start, end) pairs
+    """
+    return [(record.start_date, record.end_date) for record in records if record.has_dates()]
+
+
+def find_free_time(user_id, window_start, window_end, min_length=DEFAULT_MIN_SLOT, granularity=DEFAULT_GRANULARITY):
+    """
+    Function: find_free_time
+    Description: Finds the user's free time in a window of any length, from the minute bitmaps of the days it
+    covers (see occupancy.py).
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        window_start, window_end - datetime objects of the window
+        min_length - Shortest free slot reported
+        granularity - Slot boundaries are multiples of it
+    Output:
+        List of free (start, end) pairs ordered by start
+    """
+    return fit_slots(read_free_slots(user_id, window_start, window_end), min_length, granularity)
+
+
+def parse_window(args, today=None):
+    """
+    Function: parse_window
+    Description: Reads the window of !freetime: nothing for today, "week" for the seven days starting today, or one
+    or two mm/dd/yy dates for those days.
+
+    Input:
+        args - The words following the command
+        today - date to count from, defaults to the current date
+    Output:
+        The start and end datetimes of the window
+    Raises:
+        ValueError if the arguments are not a window, or span more than MAX_WINDOW_DAYS days
+    """
+    start = datetime.combine(today or datetime.today().date(), time())
+    if not args:
+        return start, start + timedelta(days=1)
+    if len(args) == 1 and args[0].lower() == "week":
+        return start, start + timedelta(days=7)
+    days = []
+    for arg in args:
+        for date_format in WINDOW_FORMATS:
+            try:
+                days.append(datetime.strptime(arg, date_format))
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"'{arg}' is not a mm/dd/yy date")
+    if len(days) > 2:
+        raise ValueError("At most two dates can be given")
+    if max(days) - min(days) >= timedelta(days=MAX_WINDOW_DAYS):
+        raise ValueError(f"A range can span at most {MAX_WINDOW_DAYS} days")
+    return min(days), max(days) + timedelta(days=1)
+
+
+def format_free_slots(slots):
+    """
+    Function: format_free_slots
+    Description: Formats free slots as a message, grouped by day. A slot running past midnight is listed under
+    the day it starts.
+
+    Input:
+        slots - List of free (start, end) pairs ordered by start
+    Output:
+        The message
+    """
+    if not slots:
+        return "You have no free time in that range"
+    lines = []
+    day = None
+    for start, end in slots:
+        if start.date() != day:
+            day = start.date()
+            lines.append(f"**{day.strftime('%A %m/%d/%y')}**")
+        until = end.strftime("%H:%M") if end.date() == day else end.strftime("%m/%d/%y %H:%M")
+        lines.append(f"Free time from {start.strftime('%H:%M')} until {until}")
+    return "\n".join(lines)
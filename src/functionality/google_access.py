@@ -0,0 +1,94 @@
+# functionality/google_access.py
+
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of Google API calls running at the same time for every user together
+GOOGLE_WORKERS = 16
+
+# Number of Google API calls of one user running at the same time. A user's calls share their cached service,
+# whose httplib2 connection is not thread safe, so they run one at a time
+GOOGLE_USER_CONCURRENCY = 1
+
+# Seconds a command waits for one Google API call, including the time it waits for a free slot
+GOOGLE_TIMEOUT = 30
+
+# Google calls get their own threads, so slow responses never hold up storage work
+_executor = ThreadPoolExecutor(max_workers=GOOGLE_WORKERS, thread_name_prefix="schedulebot-google")
+
+# A semaphore only lives as long as a call holds or waits on it
+_user_slots = weakref.WeakValueDictionary()
+
+
+def user_slots(user_id):
+    """
+    Function: user_slots
+    Description: Returns the asyncio semaphore bounding the Google API calls of one user.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+    Output:
+        The user's asyncio.Semaphore
+    """
+    slots = _user_slots.get(user_id)
+    if slots is None:
+        slots = asyncio.Semaphore(GOOGLE_USER_CONCURRENCY)
+        _user_slots[user_id] = slots
+    return slots
+
+
+async def run_google(user_id, func, *args, timeout=GOOGLE_TIMEOUT, **kwargs):
+    """
+    Function: run_google
+    Description: Runs a blocking Google API call on the Google thread pool, so the event loop and the gateway
+    heartbeat keep running while Google answers. A user's calls wait for their earlier ones, and the pool bounds
+    the calls of all users together.
+
+    If the call takes longer than timeout, or the command awaiting it is cancelled, the command stops waiting
+    right away. The thread cannot be interrupted, so it finishes on its own and the user's slot is only freed
+    then, which keeps the user's service from being used by two threads.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        func - The blocking function
+        args, kwargs - Its arguments
+        timeout - Seconds to wait for the call, None to wait as long as it takes
+    Output:
+        What func returns
+    Raises:
+        asyncio.TimeoutError if the call did not finish in time
+    """
+    loop = asyncio.get_running_loop()
+    slots = user_slots(user_id)
+
+    async def call():
+        await slots.acquire()
+        try:
+            future = loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+        except BaseException:
+            slots.release()
+            raise
+        # The future keeps the semaphore alive until the thread is done with the call
+        future.add_done_callback(lambda _: slots.release())
+        return await asyncio.shield(future)
+
+    return await asyncio.wait_for(call(), timeout)
+
+
+async def execute(user_id, request, timeout=GOOGLE_TIMEOUT):
+    """
+    Function: execute
+    Description: Executes a Google API request, e.g. service.events().list(...), off the event loop.
+
+    Input:
+        user_id - String representing the Discord ID of the user whose service built the request
+        request - The HttpRequest, not executed yet
+        timeout - Seconds to wait for the response
+    Output:
+        The response
+    Raises:
+        HttpError from the API, asyncio.TimeoutError if Google did not answer in time
+    """
+    return await run_google(user_id, request.execute, timeout=timeout)
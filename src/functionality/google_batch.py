@@ -0,0 +1,194 @@
+# functionality/google_batch.py
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from googleapiclient.errors import HttpError
+
+from src.functionality.google_access import run_google
+
+logger = logging.getLogger(__name__)
+
+# Most requests the Calendar API accepts in one batch
+GOOGLE_BATCH_SIZE = 50
+
+# Times the failed requests of a batch are sent again
+GOOGLE_BATCH_RETRIES = 3
+
+# Seconds waited before the first retry, doubled for every later one
+GOOGLE_RETRY_DELAY = 1.0
+
+# Statuses of failures that go away by themselves, the requests failing with them are retried
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+INSERT = "insert"
+PATCH = "patch"
+DELETE = "delete"
+
+
+class GoogleMutation:
+    """
+    Class:
+        GoogleMutation
+    Description:
+        One change queued for Google Calendar: an insert of a new event, a patch or a delete of an event Google
+        already has. local_id is whatever the caller uses to find the event again in the results.
+    """
+
+    def __init__(self, kind, local_id, event_id=None, body=None):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new GoogleMutation
+        Input:
+            kind - INSERT, PATCH or DELETE
+            local_id - Key of the event in the results
+            event_id - Google ID of the event, None for an insert
+            body - Event fields sent with an insert or patch
+        Output:
+            - A new GoogleMutation instance
+        """
+        self.kind = kind
+        self.local_id = local_id
+        self.event_id = event_id
+        self.body = body
+
+    def request(self, service):
+        """Builds the events() request of the mutation, not executed yet."""
+        if self.kind == INSERT:
+            return service.events().insert(calendarId='primary', body=self.body)
+        if self.kind == PATCH:
+            return service.events().patch(calendarId='primary', eventId=self.event_id, body=self.body)
+        return service.events().delete(calendarId='primary', eventId=self.event_id)
+
+
+def is_retryable(error):
+    """
+    Function: is_retryable
+    Description: Tells if a failed request may succeed when it is sent again, i.e. it hit a rate limit or a
+    server error.
+
+    Input:
+        error - The exception the request failed with
+    Output:
+        True if the request should be retried
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in RETRY_STATUSES:
+        return True
+    reasons = {detail.get("reason") for detail in (error.error_details or []) if isinstance(detail, dict)}
+    return error.resp.status == 403 and bool(reasons & RATE_LIMIT_REASONS)
+
+
+class GoogleMutationQueue:
+    """
+    Class:
+        GoogleMutationQueue
+    Description:
+        Collects a user's changes to Google Calendar and sends them as batch requests of up to GOOGLE_BATCH_SIZE
+        events, instead of one HTTP round trip per event. Changes to the same event are coalesced while queued:
+        a patch of a queued insert or patch is merged into it, and a delete drops a queued insert altogether.
+        Requests that fail with a rate limit or server error are retried on their own, with a growing delay,
+        while the ones that succeeded are not sent again.
+    """
+
+    def __init__(self, user_id, service, batch_size=GOOGLE_BATCH_SIZE, retries=GOOGLE_BATCH_RETRIES,
+                 retry_delay=GOOGLE_RETRY_DELAY):
+        """
+        Function:
+            __init__
+        Description:
+            Creates an empty queue
+        Input:
+            user_id - String representing the Discord ID of the user
+            service - The user's Google Calendar service
+            batch_size - Requests per batch, at most GOOGLE_BATCH_SIZE
+            retries - Times failed requests are sent again
+            retry_delay - Seconds waited before the first retry
+        Output:
+            - A new GoogleMutationQueue instance
+        """
+        self.user_id = user_id
+        self.service = service
+        self.batch_size = min(batch_size, GOOGLE_BATCH_SIZE)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._pending = OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def insert(self, local_id, body):
+        """Queues the creation of an event, its response carries the ID Google gave it."""
+        self._pending[local_id] = GoogleMutation(INSERT, local_id, body=body)
+
+    def patch(self, local_id, event_id, body):
+        """Queues a change of some fields of an event Google has."""
+        queued = self._pending.get(local_id)
+        if queued is not None and queued.kind in (INSERT, PATCH):
+            queued.body = {**queued.body, **body}
+        elif queued is None:
+            self._pending[local_id] = GoogleMutation(PATCH, local_id, event_id, body)
+
+    def delete(self, local_id, event_id):
+        """Queues the deletion of an event. An event whose insert is still queued is never sent."""
+        queued = self._pending.pop(local_id, None)
+        if queued is not None and queued.kind == INSERT:
+            return
+        self._pending[local_id] = GoogleMutation(DELETE, local_id, event_id or (queued and queued.event_id))
+
+    async def flush(self):
+        """
+        Function:
+            flush
+        Description:
+            Sends every queued change and empties the queue
+        Input: None
+        Output:
+            - Dictionary of the responses by local ID, None for deleted events
+            - Dictionary of the exceptions of the changes that failed for good, by local ID
+        """
+        mutations = list(self._pending.values())
+        self._pending.clear()
+        responses, errors = {}, {}
+        for first in range(0, len(mutations), self.batch_size):
+            batch = mutations[first:first + self.batch_size]
+            for attempt in range(self.retries + 1):
+                failed = await self._send(batch, responses, errors)
+                batch = [mutation for mutation in failed if is_retryable(errors[mutation.local_id])]
+                if not batch or attempt == self.retries:
+                    break
+                logger.info(f"Retrying {len(batch)} Google Calendar requests of user {self.user_id}")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        return responses, errors
+
+    async def _send(self, mutations, responses, errors):
+        # Sends one batch, filling in responses and errors, and returns the mutations that failed
+        failed = []
+
+        def callback(request_id, response, exception):
+            mutation = mutations[int(request_id)]
+            # An event that is already gone needs no deleting
+            if exception is not None and not (mutation.kind == DELETE and isinstance(exception, HttpError)
+                                              and exception.resp.status in (404, 410)):
+                errors[mutation.local_id] = exception
+                failed.append(mutation)
+                return
+            errors.pop(mutation.local_id, None)
+            responses[mutation.local_id] = None if mutation.kind == DELETE else response
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for position, mutation in enumerate(mutations):
+            batch.add(mutation.request(self.service), request_id=str(position))
+        try:
+            await run_google(self.user_id, batch.execute)
+        except HttpError as e:
+            # The whole batch was refused, every request in it failed the same way
+            for mutation in mutations:
+                errors[mutation.local_id] = e
+            return list(mutations)
+        return failed
@@ -0,0 +1,174 @@
+# functionality/google_services.py
+
+import functools
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from google.auth.exceptions import RefreshError, TransportError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Root URL Google Calendar requests go to instead of https://www.googleapis.com/, e.g. fake_services for tests
+GOOGLE_API_URL = os.environ.get("SCHEDULEBOT_GOOGLE_API_URL")
+
+# Directory holding credentials.json, key.json and the tokens of every user
+JSON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "json")
+
+
+@functools.lru_cache(maxsize=None)
+def calendar_discovery(root_url=None):
+    """
+    Function: calendar_discovery
+    Description: Returns the Calendar v3 discovery document shipped with google-api-python-client, parsed once.
+    Services are built from it, so building one never reads the document from disk or fetches it from Google.
+
+    Input:
+        root_url - Optional URL the requests, batches included, are sent to instead of Google's
+    Output:
+        The discovery document as a dictionary
+    """
+    document = discovery_cache.get_static_doc("calendar", "v3")
+    if document is None:
+        raise FileNotFoundError("google-api-python-client does not ship the Calendar v3 discovery document")
+    document = json.loads(document)
+    if root_url:
+        document["rootUrl"] = document["mtlsRootUrl"] = root_url
+        document["baseUrl"] = root_url + document["servicePath"]
+    return document
+
+
+class GoogleServiceRegistry:
+    """
+    Class:
+        GoogleServiceRegistry
+    Description:
+        Keeps one authorized Google Calendar service per user, so commands reuse it instead of reading the token
+        file and building a service every time. A service keeps its Credentials object, and expired credentials
+        are refreshed on that same object, so the service stays valid without being rebuilt. Refreshed tokens
+        are written back to the user's token file.
+    """
+
+    def __init__(self, tokens_dir, root_url=GOOGLE_API_URL):
+        """
+        Function:
+            __init__
+        Description:
+            Creates an empty GoogleServiceRegistry
+        Input:
+            tokens_dir - Directory of the <user_id>_token.json files
+            root_url - Optional URL of a stand-in for Google Calendar
+        Output:
+            - A new GoogleServiceRegistry instance
+        """
+        self.tokens_dir = tokens_dir
+        self.root_url = root_url
+        self._services = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def token_path(self, user_id):
+        """Returns the path of the user's token file."""
+        return os.path.join(self.tokens_dir, f"{user_id}_token.json")
+
+    def get(self, user_id):
+        """
+        Function:
+            get
+        Description:
+            Returns the user's service, building it from their token file the first time and refreshing expired
+            credentials. Blocks while a token is refreshed, so call it off the event loop.
+        Input:
+            user_id - String representing the Discord ID of the user
+        Output:
+            The service, or None if the user has no usable token and has to log in again
+        """
+        # Loading and refreshing take the user's own lock, so a slow refresh never holds up other users
+        with self._user_lock(user_id):
+            entry = self._services.get(user_id)
+            if entry is None:
+                creds = self._load(user_id)
+                if creds is None:
+                    return None
+                entry = (creds, build_from_document(calendar_discovery(self.root_url), credentials=creds))
+                self._services[user_id] = entry
+                logger.debug(f"Google Calendar service built for user {user_id}")
+            creds, service = entry
+            if not creds.valid:
+                if not self._refresh(user_id, creds):
+                    self._services.pop(user_id, None)
+                    return None
+            return service
+
+    def register(self, user_id, creds):
+        """
+        Function:
+            register
+        Description:
+            Stores the credentials of a user who just logged in and builds their service
+        Input:
+            user_id - String representing the Discord ID of the user
+            creds - The user's Credentials
+        Output:
+            The service
+        """
+        service = build_from_document(calendar_discovery(self.root_url), credentials=creds)
+        with self._user_lock(user_id):
+            self._save(user_id, creds)
+            self._services[user_id] = (creds, service)
+        return service
+
+    def forget(self, user_id):
+        """Drops the user's cached service, e.g. after their access was revoked."""
+        with self._user_lock(user_id):
+            self._services.pop(user_id, None)
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _load(self, user_id):
+        # Reads the user's credentials, None if they have no token file or it cannot be read
+        path = self.token_path(user_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            creds = Credentials.from_authorized_user_file(path, SCOPES)
+        except (ValueError, KeyError) as e:
+            logger.error(f"Error loading credentials from {path}: {e}")
+            return None
+        if self.root_url and hasattr(creds, "with_token_uri"):
+            # Recent google-auth always refreshes at Google, a stand-in for Google answers refreshes too
+            expiry = creds.expiry
+            creds = creds.with_token_uri(self.root_url + "token")
+            creds.expiry = expiry
+        return creds
+
+    def _refresh(self, user_id, creds):
+        # Refreshes the credentials in place, the service built on them picks up the new token
+        if not (creds.expired and creds.refresh_token):
+            return False
+        try:
+            creds.refresh(Request())
+        except (RefreshError, TransportError) as e:
+            logger.error(f"Error refreshing credentials of user {user_id}: {e}")
+            return False
+        self._save(user_id, creds)
+        logger.info(f"Credentials of user {user_id} refreshed.")
+        return True
+
+    def _save(self, user_id, creds):
+        Path(self.tokens_dir).mkdir(parents=True, exist_ok=True)
+        with open(self.token_path(user_id), 'w') as token_file:
+            token_file.write(creds.to_json())
+
+
+google_services = GoogleServiceRegistry(os.path.join(JSON_DIR, "tokens"))
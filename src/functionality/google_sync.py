@@ -0,0 +1,240 @@
+# functionality/google_sync.py
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from cryptography.fernet import InvalidToken
+from googleapiclient.errors import HttpError
+
+from src.functionality.event_schema import decode_rows
+from src.functionality.google_access import execute
+from src.functionality.shared_functions import (
+    EVENT_HEADER,
+    GOOGLE_EVENT_TYPE,
+    event_data_to_row,
+    keyring,
+    parse_google_event,
+    repository,
+)
+from src.functionality.storage import EVENTS, data_directory, merge_chronological, write_atomic
+from src.functionality.storage_access import run_locked, run_storage
+
+logger = logging.getLogger(__name__)
+
+# Events asked for per page, the most the Calendar API hands out at once
+SYNC_PAGE_SIZE = 250
+
+
+def sync_token_path(user_id):
+    """Returns the path of the file holding the user's Google sync token."""
+    return os.path.join(data_directory(), "Google", f"{user_id}.sync")
+
+
+def read_sync_token(user_id):
+    """
+    Function: read_sync_token
+    Description: Reads the nextSyncToken stored by the user's last sync.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+    Output:
+        The token, or None if the user has not synced yet
+    """
+    try:
+        with open(sync_token_path(user_id), "rb") as token_file:
+            return keyring.fernet(user_id).decrypt(token_file.read()).decode("utf-8")
+    except (FileNotFoundError, InvalidToken):
+        return None
+
+
+def write_sync_token(user_id, token):
+    """
+    Function: write_sync_token
+    Description: Stores the user's nextSyncToken encrypted with their data key, or removes it if token is None.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        token - The token to store
+    Output: None
+    """
+    path = sync_token_path(user_id)
+    if token is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+    write_atomic(path, keyring.fernet(user_id).encrypt(token.encode("utf-8")))
+
+
+class GoogleDelta:
+    """
+    Class:
+        GoogleDelta
+    Description:
+        The changes of a user's Google Calendar since their last sync, collected page by page: the rows of new
+        and changed events by ID, and the IDs of cancelled events. A later change of the same event replaces an
+        earlier one. sync_token is the nextSyncToken of the last page.
+    """
+
+    def __init__(self, full=False):
+        """
+        Function:
+            __init__
+        Description:
+            Creates an empty GoogleDelta
+        Input:
+            full - True if the delta lists every event rather than changes since a sync token
+        Output:
+            - A new GoogleDelta instance
+        """
+        self.full = full
+        self.upserts = {}
+        self.deletes = set()
+        self.sync_token = None
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.upserts) + len(self.deletes)
+
+    def add_page(self, page):
+        """
+        Function:
+            add_page
+        Description:
+            Adds the events of one page of an events().list response
+        Input:
+            page - The response dictionary
+        Output: None
+        """
+        for event in page.get("items", []):
+            event_id = event.get("id")
+            if event.get("status") == "cancelled":
+                self.upserts.pop(event_id, None)
+                self.deletes.add(event_id)
+                continue
+            try:
+                row = event_data_to_row(parse_google_event(event))
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error processing event {event_id}: {e}")
+                self.skipped += 1
+                continue
+            self.deletes.discard(event_id)
+            self.upserts[event_id] = row
+        if page.get("nextSyncToken"):
+            self.sync_token = page["nextSyncToken"]
+
+
+def list_request(service, sync_token=None, page_token=None):
+    """
+    Function: list_request
+    Description: Builds the events().list request of one sync page. Recurring events are listed once with their
+    rule (see recurrence.py), and cancelled events are listed so their deletion reaches the local calendar.
+
+    Input:
+        service - Google Calendar service
+        sync_token - nextSyncToken of the last sync, or None for a full sync
+        page_token - nextPageToken of the previous page, or None for the first page
+    Output:
+        The request, not executed yet
+    """
+    arguments = {"calendarId": "primary", "maxResults": SYNC_PAGE_SIZE, "showDeleted": True}
+    if sync_token:
+        arguments["syncToken"] = sync_token
+    if page_token:
+        arguments["pageToken"] = page_token
+    return service.events().list(**arguments)
+
+
+async def fetch_delta(user_id, service, sync_token=None):
+    """
+    Function: fetch_delta
+    Description: Pages through the user's changes since sync_token, or every event if there is none. The next
+    page is requested before the current one is added to the delta, so parsing overlaps the next round trip.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        service - Google Calendar service
+        sync_token - nextSyncToken of the last sync, or None for a full sync
+    Output:
+        The GoogleDelta
+    Raises:
+        HttpError from the API, status 410 when the sync token has expired
+        asyncio.TimeoutError if Google did not answer in time
+    """
+    delta = GoogleDelta(full=sync_token is None)
+    pending = asyncio.ensure_future(execute(user_id, list_request(service, sync_token)))
+    try:
+        while pending is not None:
+            page = await pending
+            pending = None
+            if page.get("nextPageToken"):
+                request = list_request(service, sync_token, page["nextPageToken"])
+                pending = asyncio.ensure_future(execute(user_id, request))
+            delta.add_page(page)
+    finally:
+        if pending is not None:
+            pending.cancel()
+    return delta
+
+
+def apply_delta(user_id, delta):
+    """
+    Function: apply_delta
+    Description: Applies a GoogleDelta to the user's calendar with a single write, then stores the delta's sync
+    token. Changed events replace their old rows, new events are merged in chronological order and cancelled
+    events are removed. A full delta lists every event, so synced events missing from it are removed as well.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        delta - The GoogleDelta
+    Output:
+        - The numbers of events added, updated and removed
+    """
+    if repository.exists(user_id, EVENTS):
+        rows = repository.read(user_id, EVENTS)
+    else:
+        rows = [EVENT_HEADER]
+    records = decode_rows(rows)[1]
+    existing = {record.event_id for record in records}
+    deletes = set(delta.deletes)
+    if delta.full:
+        # Events deleted while no sync token was kept never show up as cancelled
+        deletes.update(record.event_id for record in records
+                       if record.event_type == GOOGLE_EVENT_TYPE and record.event_id not in delta.upserts)
+    replaced = set(delta.upserts) | deletes
+    kept = rows[:1] + [row for row in rows[1:] if row[0] not in replaced]
+    merge_chronological(kept, list(delta.upserts.values()))
+
+    added = len([event_id for event_id in delta.upserts if event_id not in existing])
+    removed = len([event_id for event_id in deletes if event_id in existing])
+    if len(delta) > 0 or removed:
+        repository.write(user_id, EVENTS, kept)
+    write_sync_token(user_id, delta.sync_token)
+    return added, len(delta.upserts) - added, removed
+
+
+async def sync_google_events(user_id, service):
+    """
+    Function: sync_google_events
+    Description: Brings the user's calendar up to date with Google Calendar. Only the changes since the last
+    sync are fetched; the first sync, and a sync whose token Google no longer accepts, fetch every event.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        service - Google Calendar service
+    Output:
+        - The numbers of events added, updated and removed
+    """
+    sync_token = await run_storage(read_sync_token, user_id)
+    try:
+        delta = await fetch_delta(user_id, service, sync_token)
+    except HttpError as e:
+        if sync_token is None or e.resp.status != 410:
+            raise
+        # The token expired, so everything is fetched again
+        logger.info(f"Sync token of user {user_id} expired, running a full sync")
+        delta = await fetch_delta(user_id, service)
+    # Other commands of the same user can't change the calendar between its read and write
+    return await run_locked(user_id, apply_delta, user_id, delta)
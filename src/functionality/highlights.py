@@ -5,29 +5,34 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
 
-from src.functionality.shared_functions import read_event_file, create_event_tree
+from src.functionality.shared_functions import read_records_between, create_event_tree
+from src.functionality.storage_access import run_locked, run_storage
 from src.functionality.weather import getWeatherData
 from src.functionality.distance import get_lat_log, get_key
 
 
 async def get_highlight(ctx, arg):
     day = get_date(arg)
-    create_event_tree(str(ctx.author.id))
-    rows = read_event_file(str(ctx.author.id))
+    await run_locked(str(ctx.author.id), create_event_tree, str(ctx.author.id))
+    day_start = datetime.datetime.strptime(day, "%Y-%m-%d")
+    # Only the events touching that day are fetched. The window opens one second early so events
+    # ending exactly at midnight, which still end on that day, are included
+    records = await run_storage(read_records_between, str(ctx.author.id), day_start - datetime.timedelta(seconds=1),
+                                day_start + datetime.timedelta(days=1))
 
     channel = await ctx.author.create_dm()
     events = []
 
-    for row in rows[1:]:
+    for record in records:
         event = {
-            'name': row[1],
-            'startDate': row[2].split()[0],
-            'startTime': convert_to_12(row[2].split()[1][:-3]),
-            'endDate': row[3].split()[0],
-            'endTime': convert_to_12(row[3].split()[1][:-3]),
-            'type': row[4],
-            'desc': row[5],
-            'location': row[7]
+            'name': record.name,
+            'startDate': record.start_date.strftime("%Y-%m-%d"),
+            'startTime': convert_to_12(record.start_date.strftime("%H:%M")),
+            'endDate': record.end_date.strftime("%Y-%m-%d"),
+            'endTime': convert_to_12(record.end_date.strftime("%H:%M")),
+            'type': record.event_type,
+            'desc': record.description,
+            'location': record.location
         }
         flag = check_start_or_end([event['startDate'], event['endDate']], day)
         event['flag'] = flag
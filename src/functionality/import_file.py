@@ -1,18 +1,70 @@
 import os
+import asyncio
 import csv
-import discord
-import pandas as pd
-import tempfile
-from discord import Attachment
+import io
+import datetime
+import re
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
-from src.functionality.shared_functions import create_event_tree, create_type_tree, add_event_to_file, turn_types_to_string
-from src.Event import Event
-from src.parse.match import parse_period
+from src.functionality.shared_functions import (
+    create_event_tree,
+    add_events_to_file,
+    record_to_google_event,
+    repository,
+)
+from src.functionality.event_schema import decode_row, make_record
+from src.functionality.Google import google_service
+from src.functionality.google_batch import GoogleMutationQueue
+from src.functionality.recurrence import normalize_recurrence
+from src.functionality.storage import parse_date
+from src.functionality.storage_access import run_locked, run_storage
 from icalendar import Calendar
 
-import fnmatch
+# Number of imported events stored with each bulk write
+IMPORT_BATCH_SIZE = 500
+
+# Largest file !importfile accepts, in bytes. Files are read into memory, so this bounds what one import can use
+IMPORT_MAX_BYTES = int(os.environ.get("SCHEDULEBOT_IMPORT_MAX_BYTES", 5 * 1024 * 1024))
+
+# Columns an imported csv file starts with, the format !exportfile writes
+CSV_COLUMNS = ['ID', 'Name', 'Start Date', 'End Date', 'Priority', 'Type', 'Notes']
+
+# Date formats accepted in imported csv files
+CSV_DATE_FORMATS = ["%Y-%m-%d %H:%M", "%Y-%m-%d"]
+
+# Google Calendar event IDs are 5 to 1024 base32hex characters, ICS files exported by Google add this to them
+GOOGLE_EVENT_ID = re.compile(r"[a-v0-9]{5,1024}")
+GOOGLE_UID_SUFFIX = "@google.com"
+
+
+class ImportStats:
+    """
+    Class:
+        ImportStats
+    Description:
+        Counts what happened to the events of one import
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.google = 0
+        self.google_failed = 0
+
+    def summary(self):
+        """Returns the message reporting the import to the user."""
+        message = f"Your events were successfully added! ({self.imported} imported"
+        if self.duplicates:
+            message += f", {self.duplicates} already in your calendar"
+        if self.invalid:
+            message += f", {self.invalid} rows with invalid dates skipped"
+        if self.google:
+            message += f", {self.google} added to Google Calendar"
+        if self.google_failed:
+            message += f", {self.google_failed} could not be added to Google Calendar"
+        return message + ")"
 
 
 def verify_csv(data):
@@ -20,29 +72,95 @@ def verify_csv(data):
     Function:
         verify_csv
     Description:
-        Verifies that CSV data retrieved through pandas matches the expected format
+        Verifies that the columns of a table of CSV data match the expected format. Imported files are read
+        with csv.reader and their first row is checked with verify_header
     Input:
-        data - A Pandas Dataframe of data pulled from a CSV
+        data - A table of data pulled from a CSV with a columns attribute, e.g. a Pandas Dataframe
     Output:
         - True if the data matches the expectation, false otherwise
     """
+    return verify_header(list(data.columns))
 
-    if data.columns[0] != "ID":
-        return False
-    if data.columns[1] != "Name":
-        return False
-    if data.columns[2] != "Start Date":
-        return False
-    if data.columns[3] != "End Date":
-        return False
-    if data.columns[4] != "Priority":
-        return False
-    if data.columns[5] != "Type":
-        return False
-    if data.columns[6] != "Notes":
-        return False
 
-    return True
+def verify_header(header):
+    """
+    Function:
+        verify_header
+    Description:
+        Verifies that the header row of an imported CSV file matches the expected format
+    Input:
+        header - The first row of the file
+    Output:
+        - True if the header matches the expectation, false otherwise
+    """
+    return list(header[:len(CSV_COLUMNS)]) == CSV_COLUMNS
+
+
+def google_event_id(value):
+    """
+    Function:
+        google_event_id
+    Description:
+        Reads the Google Calendar event ID out of the ID column of a csv file (see !exportfile) or the UID of an
+        ICS event. Events that came from Google keep their ID, so they are not added to Google again
+    Input:
+        value - The ID or UID in the file
+    Output:
+        - The Google event ID, or "" if the event did not come from Google
+    """
+    value = str(value or '').strip()
+    if value.endswith(GOOGLE_UID_SUFFIX):
+        return value[:-len(GOOGLE_UID_SUFFIX)]
+    return value if GOOGLE_EVENT_ID.fullmatch(value) else ''
+
+
+def parse_csv_date(value):
+    """
+    Function:
+        parse_csv_date
+    Description:
+        Parses a date of an imported CSV file, with or without seconds or a time
+    Input:
+        value - The date string
+    Output:
+        - The datetime object, or None if the value is not a date
+    """
+    value = value.strip()
+    parsed = parse_date(value)
+    if parsed is not None:
+        return parsed
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def iter_csv_events(reader, stats):
+    """
+    Function:
+        iter_csv_events
+    Description:
+        Yields an EventRecord for every valid row of a CSV file, one row at a time. Rows whose dates cannot be
+        parsed are counted in stats and skipped.
+    Input:
+        reader - csv reader positioned after the header row
+        stats - ImportStats of the import
+    Output:
+        - Generator of EventRecords
+    """
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        row = row + [''] * (len(CSV_COLUMNS) + 1 - len(row))
+        start = parse_csv_date(row[2])
+        end = parse_csv_date(row[3])
+        if start is None or end is None:
+            stats.invalid += 1
+            continue
+        # Files written by !exportfile also carry the location
+        yield make_record(google_event_id(row[0]), row[1], start, end, row[4], row[5], row[6], row[7] or 'None')
 
 
 def convert_time(old_str):
@@ -79,6 +197,126 @@ def convert_time(old_str):
     return new_str
 
 
+def ics_datetime(value):
+    """
+    Function:
+        ics_datetime
+    Description:
+        Converts an ICS DTSTART/DTEND value to the naive datetime stored in the calendar. All day dates start at
+        midnight and times keep the wall clock time they were written in.
+    Input:
+        value - date or datetime from icalendar
+    Output:
+        - The datetime object
+    """
+    if not isinstance(value, datetime.datetime):
+        return datetime.datetime(value.year, value.month, value.day)
+    return value.replace(tzinfo=None, microsecond=0)
+
+
+def iter_components(component, name):
+    """
+    Function:
+        iter_components
+    Description:
+        Yields the subcomponents with the given name depth first, without collecting them into a list first
+    Input:
+        component - icalendar component to search
+        name - Component name, like "VEVENT"
+    Output:
+        - Generator of the matching components
+    """
+    if component.name == name:
+        yield component
+    for subcomponent in component.subcomponents:
+        yield from iter_components(subcomponent, name)
+
+
+def ics_recurrence(component):
+    """
+    Function:
+        ics_recurrence
+    Description:
+        Reads the recurrence of a VEVENT, its RRULE and the EXDATEs skipping some of its occurrences
+    Input:
+        component - icalendar VEVENT
+    Output:
+        - The rule to store with the event, "" for a single event
+    """
+    lines = []
+    rules = component.get('rrule')
+    for rule in rules if isinstance(rules, list) else [rules]:
+        if rule is not None:
+            lines.append("RRULE:" + rule.to_ical().decode("utf-8"))
+    exdates = component.get('exdate')
+    for exdate in exdates if isinstance(exdates, list) else [exdates]:
+        if exdate is not None:
+            moments = [ics_datetime(value.dt).strftime("%Y%m%dT%H%M%S") for value in exdate.dts]
+            lines.append("EXDATE:" + ",".join(moments))
+    return normalize_recurrence(lines)
+
+
+def iter_ics_events(calendar):
+    """
+    Function:
+        iter_ics_events
+    Description:
+        Yields an EventRecord for every VEVENT of an ICS calendar, converting its dates straight to datetimes.
+        Events without a start date are skipped, events without an end date end after their DURATION or when
+        they start. Recurring events are stored once with their rule instead of once per occurrence.
+    Input:
+        calendar - icalendar Calendar
+    Output:
+        - Generator of EventRecords
+    """
+    for component in iter_components(calendar, "VEVENT"):
+        dtstart = component.get('dtstart')
+        if dtstart is None:
+            continue
+        start = ics_datetime(dtstart.dt)
+        dtend = component.get('dtend')
+        duration = component.get('duration')
+        if dtend is not None:
+            end = ics_datetime(dtend.dt)
+        elif duration is not None:
+            end = start + duration.dt
+        else:
+            end = start
+        yield make_record(
+            google_event_id(component.get('uid')),
+            str(component.get('summary') or ''),
+            start,
+            end,
+            '3',
+            '',
+            str(component.get('description') or ''),
+            str(component.get('location') or 'None'),
+            ics_recurrence(component),
+        )
+
+
+def batched(records, size=IMPORT_BATCH_SIZE):
+    """
+    Function:
+        batched
+    Description:
+        Groups a stream of records into lists of at most size records
+    Input:
+        records - Iterable of records
+        size - Number of records per batch
+    Output:
+        - Generator of lists of records
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def get_ics_data(calendar):
     """
     Function:
@@ -90,39 +328,112 @@ def get_ics_data(calendar):
     Output:
         - A pandas table containing the calendar data.
     """
+    # Only needed by callers that want a table, the import itself doesn't load pandas
+    import pandas as pd
+
+    # The table is built once from every event, rather than concatenated one row at a time
+    return pd.DataFrame([record.row[:len(CSV_COLUMNS)] for record in iter_ics_events(calendar)], columns=CSV_COLUMNS)
+
+
+def dedupe(records, seen, stats):
+    """
+    Function:
+        dedupe
+    Description:
+        Drops events that have the same name, start and end as one seen before, counting them in stats
+    Input:
+        records - Iterable of EventRecords
+        seen - Set of (name, start, end) keys already stored, extended with every event let through
+        stats - ImportStats of the import
+    Output:
+        - Generator of the new EventRecords
+    """
+    for record in records:
+        key = (record.name, record.start_date, record.end_date)
+        if key in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(key)
+        yield record
 
-    columns = ['ID',
-               'Name',
-               'Start Date',
-               'End Date',
-               'Priority',
-               'Type',
-               'Notes']
 
-    data = pd.DataFrame(columns=columns)
+def existing_event_keys(user_id):
+    """
+    Function:
+        existing_event_keys
+    Description:
+        Creates the user's calendar if needed and returns the (name, start, end) keys of the events in it
+    Input:
+        user_id - String representing the Discord ID of the user
+    Output:
+        - Set of keys
+    """
+    create_event_tree(user_id)
+    return {(record.name, record.start_date, record.end_date) for record in repository.records(user_id)}
 
-    for component in calendar.walk():
-        if component.name == "VEVENT":
-            print("Adding Event....")
-            # Create a new DataFrame for the row to be added
-            new_row = pd.DataFrame([{
-                'ID': '',
-                'Name': component.get('summary'),
-                'Start Date': str(component.get('dtstart').dt),
-                'End Date': str(component.get('dtend').dt),
-                'Priority': '3',
-                'Type': '',
-                'Notes': component.get('description')
-            }])
 
-            # Concatenate the new row with the existing data DataFrame
-            data = pd.concat([data, new_row], ignore_index=True)
+async def push_to_google(queue, batch, stats):
+    """
+    Function:
+        push_to_google
+    Description:
+        Adds a batch of imported events to Google Calendar with batch requests. Events that came from Google
+        already have an ID and are skipped. Events Google accepted are stored under the ID Google gave them, so
+        they can be edited and deleted there later, the others only locally.
+    Input:
+        queue - The user's GoogleMutationQueue
+        batch - List of EventRecords
+        stats - ImportStats of the import
+    Output:
+        - The EventRecords to store, in the same order
+    """
+    for position, record in enumerate(batch):
+        if not record.event_id:
+            queue.insert(position, record_to_google_event(record))
+    pushed = len(queue)
+    if not pushed:
+        return batch
+    try:
+        responses, errors = await queue.flush()
+    except asyncio.TimeoutError:
+        stats.google_failed += pushed
+        return batch
+    stats.google += len(responses)
+    stats.google_failed += len(errors)
+    return [decode_row([responses[position]['id']] + record.row[1:]) if position in responses else record
+            for position, record in enumerate(batch)]
 
 
-    return data
+async def store_records(channel, user_id, records, stats, queue=None):
+    """
+    Function:
+        store_records
+    Description:
+        Streams imported events through de-duplication into batched bulk writes, reporting progress after every
+        full batch. Parsing and storing run on the storage threads, so large files don't block other commands.
+    Input:
+        channel - Channel the progress is reported in
+        user_id - String representing the Discord ID of the user
+        records - Iterable of EventRecords
+        stats - ImportStats of the import
+        queue - GoogleMutationQueue the events are also added to Google Calendar with, None to store them locally
+    Output: None
+    """
+    seen = await run_storage(existing_event_keys, user_id)
+    batches = batched(dedupe(records, seen, stats))
+    while True:
+        batch = await run_storage(next, batches, None)
+        if batch is None:
+            return
+        if queue is not None:
+            batch = await push_to_google(queue, batch, stats)
+        await run_locked(user_id, add_events_to_file, user_id, batch)
+        stats.imported += len(batch)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            await channel.send(f"Imported {stats.imported} events so far...")
 
 
-async def import_file(ctx, client):
+async def import_file(ctx, client, push=False):
     """
     Function:
         importfile
@@ -131,6 +442,7 @@ async def import_file(ctx, client):
     Input:
         ctx - Discord context window
         client - The Discord chat bot
+        push - True to also add the events to the user's Google Calendar, if they are connected
     Output:
         - Events are added to a users profile.
     """
@@ -155,50 +467,57 @@ async def import_file(ctx, client):
         else:
             break
 
-    temp_file = open("import_temp_file", "w")
-    temp_path = str(os.path.abspath(temp_file.name))
-    temp_file.close()
-    try:
-        await event_msg.attachments[0].save(temp_path, seek_begin=True, use_cached=False)
-
-        if event_msg.attachments[0].filename.endswith(".csv"):
-            data = pd.read_csv(temp_path)
-        elif event_msg.attachments[0].filename.endswith(".ics"):
-            temp_file = open("import_temp_file", "r")
-            gcal = Calendar.from_ical(temp_file.read())
-            temp_file.close()
+    attachment = event_msg.attachments[0]
+    if not attachment.filename.endswith((".csv", ".ics")):
+        await channel.send("File is not a CSV or ICS file. Import has failed.")
+        return
+    if attachment.size > IMPORT_MAX_BYTES:
+        await channel.send(f"File is larger than {IMPORT_MAX_BYTES // 1024} KB. Import has failed.")
+        return
 
-            data = get_ics_data(gcal)
+    # The upload is read into memory, every import has its own copy
+    try:
+        text = (await attachment.read(use_cached=False)).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        await channel.send("File is not a text file. Import has Failed.")
+        return
 
-        else:
-            await channel.send("File is not a CSV or ICS file. Import has failed.")
+    stats = ImportStats()
+    if attachment.filename.endswith(".csv"):
+        reader = csv.reader(io.StringIO(text))
+        try:
+            header = next(reader, None)
+        except csv.Error:
+            header = None
+        if header is None:
+            await channel.send("File is empty. Import has Failed.")
             return
-
-        if not verify_csv(data):
+        if not verify_header(header):
             await channel.send("Unexpected CSV Format. Import has failed.")
             return
+        records = iter_csv_events(reader, stats)
+    else:
+        try:
+            calendar = await run_storage(Calendar.from_ical, text)
+        except ValueError:
+            await channel.send("File is not an ICS file. Import has Failed.")
+            return
+        records = iter_ics_events(calendar)
+
+    # The events only reach Google Calendar when the user asked for it
+    queue = None
+    if push:
+        service = await google_service(user_id)
+        if service is None:
+            await channel.send("You are not connected to Google Calendar, so your events are only added here. "
+                               "Use !ConnectGoogle first to add them to Google Calendar too.")
+        else:
+            queue = GoogleMutationQueue(user_id, service)
 
-    except pd.errors.EmptyDataError:
-        await channel.send("File is empty. Import has Failed.")
-        return
-    except pd.errors.ParserError:
-        await channel.send("File is not a CSV. Import has Failed.")
-        return
-    finally:
-        temp_file.close()
-        os.remove(temp_path)
-
-    if not verify_csv(data):
-        await channel.send("Unexpected CSV Format. Import has failed.")
+    try:
+        await store_records(channel, user_id, records, stats, queue)
+    except csv.Error:
+        await channel.send(f"File is not a CSV. Import stopped after {stats.imported} events.")
         return
 
-    # creates an event tree if one doesn't exist yet.
-    create_event_tree(str(ctx.author.id))
-
-    for index, row in data.iterrows():
-        print(convert_time(row['Start Date']) + ' ' + convert_time(row['End Date']))
-        time_period = parse_period(convert_time(row['Start Date']) + ' ' + convert_time(row['End Date']))
-        current = Event(row['Name'], time_period[0], time_period[1], row['Priority'], row['Type'], row['Notes'])
-        add_event_to_file(str(ctx.author.id), current)
-
-    await channel.send("Your events were successfully added!")
+    await channel.send(stats.summary())
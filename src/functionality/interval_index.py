@@ -0,0 +1,263 @@
+# functionality/interval_index.py
+
+import random
+from datetime import timedelta
+
+from src.functionality.event_schema import EventRecord, decode_row
+from src.functionality.recurrence import expand_records, occurrences
+from src.functionality.storage import ADD, DELETE, EDIT
+
+
+class _Node:
+    __slots__ = ("key", "record", "priority", "left", "right", "max_end")
+
+    def __init__(self, key, record):
+        self.key = key
+        self.record = record
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = key[1]
+
+    def copy(self):
+        node = _Node.__new__(_Node)
+        node.key, node.record, node.priority = self.key, self.record, self.priority
+        node.left, node.right, node.max_end = self.left, self.right, self.max_end
+        return node
+
+
+class IntervalIndex:
+    """
+    Class:
+        IntervalIndex
+    Description:
+        An augmented interval tree over a user's event rows. The tree is a treap ordered by start date, where every
+        node also stores the latest end date of its subtree, so both overlap and stabbing queries skip every subtree
+        that cannot contain a match and run in O(log n + k). Single event adds, edits and deletes update the tree in
+        O(log n) instead of rebuilding it. The tree holds EventRecords, so the dates parsed when the calendar was
+        loaded are compared directly. Rows whose dates cannot be parsed are not indexed.
+
+        Recurring events are kept next to the tree and expanded only within the window of a query (see
+        recurrence.py), so their occurrences are returned like single events.
+
+        Nodes are never changed once built: an update copies the O(log n) nodes on its path and shares the rest.
+        copy() is therefore cheap, and a copy can be updated while other threads keep querying the original.
+    """
+
+    def __init__(self, rows=()):
+        """
+        Function:
+            __init__
+        Description:
+            Builds the index from event rows (no header)
+        Input:
+            rows - Event rows, [ID, Name, Start Date, End Date, Priority, Type, Notes, Location], or their
+                   EventRecords
+        Output:
+            - A new IntervalIndex instance
+        """
+        self._root = None
+        self._keys = {}
+        self._sequence = 0
+        self._recurring = ()
+        for row in rows:
+            self.add(row)
+
+    def copy(self):
+        """
+        Function:
+            copy
+        Description:
+            Returns an independent index sharing this one's tree
+        Input: None
+        Output:
+            - A new IntervalIndex instance
+        """
+        index = IntervalIndex()
+        index._root = self._root
+        index._keys = {event_id: list(keys) for event_id, keys in self._keys.items()}
+        index._sequence = self._sequence
+        index._recurring = self._recurring
+        return index
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._keys.values()) + len(self._recurring)
+
+    def add(self, row):
+        """
+        Function:
+            add
+        Description:
+            Indexes one event
+        Input:
+            row - The event row or its EventRecord
+        Output: None
+        """
+        record = row if isinstance(row, EventRecord) else decode_row(row)
+        if not record.has_dates():
+            return
+        if record.is_recurring():
+            self._recurring += (record,)
+            return
+        self._sequence += 1
+        key = (record.start_date, record.end_date, self._sequence)
+        left, right = self._split(self._root, key)
+        self._root = self._merge(self._merge(left, _Node(key, record)), right)
+        self._keys.setdefault(record.event_id, []).append(key)
+
+    def remove(self, event_id):
+        """
+        Function:
+            remove
+        Description:
+            Removes every indexed row with the given event ID
+        Input:
+            event_id - ID of the event
+        Output:
+            The number of rows removed
+        """
+        keys = self._keys.pop(event_id, [])
+        for key in keys:
+            left, rest = self._split(self._root, key)
+            _, right = self._split(rest, (key[0], key[1], key[2] + 1))
+            self._root = self._merge(left, right)
+        recurring = tuple(record for record in self._recurring if record.event_id != event_id)
+        removed = len(self._recurring) - len(recurring)
+        self._recurring = recurring
+        return len(keys) + removed
+
+    def apply(self, action, event_id, row=None):
+        """
+        Function:
+            apply
+        Description:
+            Mirrors a single event mutation (see storage.apply_mutation) on the index
+        Input:
+            action - ADD, EDIT or DELETE
+            event_id - ID of the event the mutation targets
+            row - The new event row or its EventRecord, unused by DELETE
+        Output: None
+        """
+        if row is not None and not isinstance(row, EventRecord):
+            row = decode_row(row)
+        if action == ADD:
+            self.add(row)
+        elif action == EDIT:
+            for _ in range(self.remove(event_id)):
+                self.add(row)
+        elif action == DELETE:
+            self.remove(event_id)
+
+    def overlapping(self, start, end):
+        """
+        Function:
+            overlapping
+        Description:
+            Returns the rows of the events that fall into the window [start, end), ordered by start date. Uses the
+            same rule as storage.overlaps, so events lasting no time at all are found when they start in the window.
+        Input:
+            start, end - datetime objects of the window
+        Output:
+            rows - Copies of the matching event rows
+        """
+        return [record.to_row() for record in self.overlapping_records(start, end)]
+
+    def overlapping_records(self, start, end):
+        """
+        Function:
+            overlapping_records
+        Description:
+            Like overlapping, but returns the indexed EventRecords themselves
+        Input:
+            start, end - datetime objects of the window
+        Output:
+            records - The matching EventRecords, shared with the index and not to be modified, and the
+                      occurrences of recurring events in the window
+        """
+        found = []
+
+        def visit(node):
+            # Nothing in this subtree ends late enough to reach the window
+            if node is None or node.max_end < start:
+                return
+            visit(node.left)
+            node_start, node_end, _ = node.key
+            if node_start >= end:
+                # Every node further right starts even later
+                return
+            if node_end > start or node_start >= start:
+                found.append(node.record)
+            visit(node.right)
+
+        visit(self._root)
+        if self._recurring:
+            return expand_records(found + [record for record in self._recurring if record.start_date < end],
+                                  start, end)
+        return found
+
+    def active_at(self, moment):
+        """
+        Function:
+            active_at
+        Description:
+            Returns the rows of the events going on at the given moment, that is start <= moment < end
+        Input:
+            moment - datetime object
+        Output:
+            rows - Copies of the matching event rows, ordered by start date
+        """
+        found = []
+
+        def visit(node):
+            if node is None or node.max_end <= moment:
+                return
+            visit(node.left)
+            node_start, node_end, _ = node.key
+            if node_start > moment:
+                return
+            if node_end > moment:
+                found.append(node.record.to_row())
+            visit(node.right)
+
+        visit(self._root)
+        if self._recurring:
+            instant = moment + timedelta(microseconds=1)
+            for record in self._recurring:
+                if record.start_date <= moment:
+                    found.extend(occurrence.to_row() for occurrence in occurrences(record, moment, instant)
+                                 if occurrence.end_date > moment)
+            found.sort(key=lambda row: row[2])
+        return found
+
+    def _update(self, node):
+        node.max_end = node.key[1]
+        if node.left is not None and node.left.max_end > node.max_end:
+            node.max_end = node.left.max_end
+        if node.right is not None and node.right.max_end > node.max_end:
+            node.max_end = node.right.max_end
+        return node
+
+    def _split(self, node, key):
+        # Splits the tree into the nodes ordered before key and the nodes from key on, copying the nodes it changes
+        if node is None:
+            return None, None
+        node = node.copy()
+        if node.key < key:
+            node.right, right = self._split(node.right, key)
+            return self._update(node), right
+        left, node.left = self._split(node.left, key)
+        return left, self._update(node)
+
+    def _merge(self, left, right):
+        # Joins two trees where every key of left is ordered before every key of right, copying the nodes it changes
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left = left.copy()
+            left.right = self._merge(left.right, right)
+            return self._update(left)
+        right = right.copy()
+        right.left = self._merge(left, right.left)
+        return self._update(right)
@@ -0,0 +1,149 @@
+# functionality/keyring.py
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from cryptography.fernet import Fernet, InvalidToken
+
+from src.functionality.storage import data_directory, write_atomic
+
+# Maximum number of user Fernet instances kept in memory at once
+KEY_CACHE_SIZE = 1024
+
+
+class Keyring:
+    """
+    Class:
+        Keyring
+    Description:
+        Hands out the per-user data keys and ready to use Fernet instances. Keys are stored in Key/{user_id}.key
+        under the data directory and kept in a bounded LRU once loaded, so the key file is opened and the Fernet
+        object built once per cache lifetime instead of on every read and write.
+
+        With a master key (the SCHEDULEBOT_MASTER_KEY environment variable by default) the key files hold the data
+        keys wrapped by the master key (envelope encryption), and a data key is unwrapped once when it is loaded
+        into the cache. Key files still holding a bare data key are wrapped on their first load.
+    """
+
+    def __init__(self, master_key=None, base_dir=None, max_entries=KEY_CACHE_SIZE):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new Keyring
+        Input:
+            master_key - Fernet key wrapping the data keys, or None to store them unwrapped
+            base_dir - Root directory of the Key folder, defaults to data_directory()
+            max_entries - Number of users whose keys are kept in memory
+        Output:
+            - A new Keyring instance
+        """
+        self.master = Fernet(master_key) if master_key else None
+        self.base_dir = base_dir
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def path(self, user_id):
+        """Returns the path of the user's key file."""
+        return os.path.join(self.base_dir or data_directory(), "Key", f"{user_id}.key")
+
+    def key(self, user_id):
+        """
+        Function:
+            key
+        Description:
+            Returns the user's data key, creating it if the user has none yet
+        Input:
+            user_id - String representing the Discord ID of the user
+        Output:
+            key - The data key
+        """
+        return self._entry(user_id)[0]
+
+    def fernet(self, user_id):
+        """
+        Function:
+            fernet
+        Description:
+            Returns the Fernet instance of the user's data key, creating the key if the user has none yet
+        Input:
+            user_id - String representing the Discord ID of the user
+        Output:
+            The cached Fernet instance
+        """
+        return self._entry(user_id)[1]
+
+    def write_key(self, user_id, key=None):
+        """
+        Function:
+            write_key
+        Description:
+            Stores a data key for the user, replacing any previous one
+        Input:
+            user_id - String representing the Discord ID of the user
+            key - The data key, a new one is generated if not given
+        Output:
+            key - The written key
+        """
+        key = key or Fernet.generate_key()
+        filepath = self.path(user_id)
+        Path(os.path.dirname(filepath)).mkdir(parents=True, exist_ok=True)
+        write_atomic(filepath, self.master.encrypt(key) if self.master else key)
+        self._store(user_id, key)
+        return key
+
+    def invalidate(self, user_id=None):
+        """
+        Function:
+            invalidate
+        Description:
+            Drops a user's key from the cache, or every key if no user is given
+        Input:
+            user_id - String representing the Discord ID of the user, or None to clear the whole cache
+        Output: None
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def _entry(self, user_id):
+        # Loading happens under the lock, so two commands can never generate two different keys for a new user
+        with self._lock:
+            if user_id in self._entries:
+                self._entries.move_to_end(user_id)
+                return self._entries[user_id]
+
+            filepath = self.path(user_id)
+            if not os.path.exists(filepath):
+                key = self.write_key(user_id)
+            else:
+                with open(filepath, "rb") as key_file:
+                    stored = key_file.read().strip()
+                key = self._unwrap(stored)
+                if self.master and key == stored:
+                    # A bare data key written before the master key was configured
+                    self.write_key(user_id, key)
+            return self._store(user_id, key)
+
+    def _unwrap(self, stored):
+        if self.master is None:
+            return stored
+        try:
+            return self.master.decrypt(stored)
+        except InvalidToken:
+            # Not wrapped by the master key, only a valid bare data key is accepted
+            Fernet(stored)
+            return stored
+
+    def _store(self, user_id, key):
+        entry = (key, Fernet(key))
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,279 @@
+# functionality/meet.py
+
+import asyncio
+import heapq
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from src.functionality.DisplayFreeTime import send_lines
+from src.functionality.free_time import (
+    busy_intervals,
+    merge_busy,
+    parse_window,
+    preferred_windows,
+    round_up,
+    subtract_busy,
+)
+from src.functionality.shared_functions import read_records_between, read_type_file
+from src.functionality.storage_access import run_storage
+
+# Number of common slots !meet reports
+MEET_RESULTS = 5
+
+# Number of participants whose calendars are loaded at the same time
+MEET_CONCURRENCY = 4
+
+# Meeting length used when none is given
+DEFAULT_DURATION = timedelta(minutes=30)
+
+# Meeting starts are rounded up to multiples of this
+MEET_GRANULARITY = timedelta(minutes=15)
+
+# Number of candidate starts !meet ranks, the earliest ones: a week of quarter hours
+MEET_HORIZON = 7 * 24 * 4
+
+MENTION = re.compile(r"<@!?\d+>")
+DURATION = re.compile(r"^(?:(\d+)h)?(?:(\d+)m?)?$")
+
+
+def parse_duration(text):
+    """
+    Function: parse_duration
+    Description: Reads a meeting length like "45", "45m", "1h" or "1h30m". Plain numbers are minutes.
+
+    Input:
+        text - The length as typed by the user
+    Output:
+        The length as a timedelta
+    Raises:
+        ValueError if the text is not a length
+    """
+    match = DURATION.match(text.lower())
+    if not text or match is None:
+        raise ValueError(f"'{text}' is not a meeting length")
+    hours, minutes = match.groups()
+    duration = timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+    if duration <= timedelta(0):
+        raise ValueError("The meeting has to last some time")
+    return duration
+
+
+def parse_meet_args(args, today=None):
+    """
+    Function: parse_meet_args
+    Description: Reads the arguments of !meet after the mentions: an optional meeting length followed by a range as
+    !freetime takes it. Without a range the seven days starting today are searched.
+
+    Input:
+        args - The words following the command
+        today - date to count from, defaults to the current date
+    Output:
+        The meeting length, and the start and end datetimes of the range
+    Raises:
+        ValueError if the arguments cannot be read
+    """
+    words = [arg for arg in args if not MENTION.fullmatch(arg)]
+    duration = DEFAULT_DURATION
+    if words and "/" not in words[0] and "-" not in words[0] and words[0].lower() != "week":
+        duration = parse_duration(words.pop(0))
+    window_start, window_end = parse_window(words or ("week",), today)
+    return duration, window_start, window_end
+
+
+def type_windows(type_rows, window_start, window_end):
+    """
+    Function: type_windows
+    Description: Lists the preferred windows of all of a user's event types over a range, merged.
+
+    Input:
+        type_rows - Rows of the user's Type file, header included
+        window_start, window_end - datetime objects of the range
+    Output:
+        List of disjoint (start, end) windows ordered by start, empty if the user has no event types
+    """
+    windows = []
+    # A preferred time running past midnight can reach into the range from the day before
+    first_day, last_day = (window_start - timedelta(days=1)).date(), window_end.date()
+    for row in type_rows[1:]:
+        try:
+            start_time = datetime.strptime(row[1], "%I:%M %p").time()
+            end_time = datetime.strptime(row[2], "%I:%M %p").time()
+        except (IndexError, ValueError):
+            continue
+        windows.extend(preferred_windows(first_day, last_day, start_time, end_time))
+    return merge_busy(windows)
+
+
+def load_participant(user_id, window_start, window_end):
+    """
+    Function: load_participant
+    Description: Loads what !meet needs to know about one participant. Users without a calendar or event types
+    count as free and without preferences.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        window_start, window_end - datetime objects of the range
+    Output:
+        The user's merged busy intervals and merged preferred windows, both ordered by start
+    """
+    try:
+        busy = merge_busy(busy_intervals(read_records_between(user_id, window_start, window_end)))
+    except FileNotFoundError:
+        busy = []
+    try:
+        windows = type_windows(read_type_file(user_id), window_start, window_end)
+    except FileNotFoundError:
+        windows = []
+    return busy, windows
+
+
+def merge_participants(busy_lists):
+    """
+    Function: merge_participants
+    Description: Merges the busy intervals of every participant with a heap based k-way merge, coalescing them as
+    they come out of the heap. Costs O(n log k) for n intervals of k participants.
+
+    Input:
+        busy_lists - For every participant, a list of (start, end) pairs ordered by start
+    Output:
+        List of disjoint (start, end) pairs ordered by start
+    """
+    merged = []
+    for start, end in heapq.merge(*busy_lists):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _inside(windows, start, end):
+    # True if [start, end] lies within one of the disjoint windows, which are ordered by start
+    position = bisect_right(windows, (start, datetime.max)) - 1
+    return position >= 0 and windows[position][0] <= start and end <= windows[position][1]
+
+
+def rank_slots(free, duration, preferences, limit=MEET_RESULTS, horizon=MEET_HORIZON):
+    """
+    Function: rank_slots
+    Description: Picks the best meeting times out of the common free time. Every MEET_GRANULARITY step of the free
+    slots is a candidate start, up to the earliest horizon of them. A candidate scores one point for every
+    participant whose preferred windows hold it, participants without event types always count. Candidates are
+    ranked by score, then by start, and the best ones that do not overlap are kept.
+
+    Input:
+        free - List of common free (start, end) pairs ordered by start
+        duration - Length of the meeting
+        preferences - For every participant, their merged preferred windows
+        limit - Number of meetings to return
+        horizon - Number of candidate starts looked at
+    Output:
+        List of (start, end, score), best first
+    """
+    candidates = []
+    for free_start, free_end in free:
+        start = round_up(free_start, MEET_GRANULARITY)
+        while start + duration <= free_end and len(candidates) < horizon:
+            end = start + duration
+            score = sum(1 for windows in preferences if not windows or _inside(windows, start, end))
+            candidates.append((start, end, score))
+            start += MEET_GRANULARITY
+        if len(candidates) == horizon:
+            break
+    chosen = []
+    for start, end, score in sorted(candidates, key=lambda candidate: (-candidate[2], candidate[0])):
+        if all(end <= other_start or other_end <= start for other_start, other_end, _ in chosen):
+            chosen.append((start, end, score))
+            if len(chosen) == limit:
+                break
+    return chosen
+
+
+def find_meeting_slots(participants, window_start, window_end, duration, limit=MEET_RESULTS):
+    """
+    Function: find_meeting_slots
+    Description: Finds meeting times in a range for participants that have been loaded with load_participant.
+
+    Input:
+        participants - List of (busy intervals, preferred windows) pairs
+        window_start, window_end - datetime objects of the range
+        duration - Length of the meeting
+        limit - Number of meetings to return
+    Output:
+        List of (start, end, score), best first
+    """
+    busy = merge_participants([busy for busy, _ in participants])
+    free = subtract_busy(window_start, window_end, busy, min_length=duration)
+    return rank_slots(free, duration, [windows for _, windows in participants], limit)
+
+
+async def load_participants(user_ids, window_start, window_end, concurrency=MEET_CONCURRENCY):
+    """
+    Function: load_participants
+    Description: Loads every participant on the storage threads, at most concurrency of them at the same time.
+
+    Input:
+        user_ids - List of Discord IDs, as strings
+        window_start, window_end - datetime objects of the range
+        concurrency - Number of participants loaded at the same time
+    Output:
+        List of (busy intervals, preferred windows) pairs, in the order of user_ids
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(user_id):
+        async with semaphore:
+            return await run_storage(load_participant, user_id, window_start, window_end)
+
+    return await asyncio.gather(*(load(user_id) for user_id in user_ids))
+
+
+def format_meeting_slots(slots, participants):
+    """
+    Function: format_meeting_slots
+    Description: Formats the meeting times found by !meet as a message.
+
+    Input:
+        slots - List of (start, end, score), best first
+        participants - Number of participants
+    Output:
+        The message
+    """
+    if not slots:
+        return "There is no time everyone is free in that range"
+    lines = ["Everyone is free:"]
+    for start, end, score in slots:
+        until = end.strftime("%H:%M") if end.date() == start.date() else end.strftime("%m/%d/%y %H:%M")
+        lines.append(f"{start.strftime('%A %m/%d/%y %H:%M')} until {until} "
+                     f"(preferred time of {score}/{participants})")
+    return "\n".join(lines)
+
+
+async def meet(ctx, *args):
+    """
+    Function:
+        meet
+    Description:
+        Finds the times the author and every mentioned user are free together, preferred times first
+    Input:
+        ctx - Discord context window
+        args - Mentions, an optional meeting length and an optional range, e.g. "@a @b 1h week"
+    Output:
+        - A message listing the meeting times
+    """
+    try:
+        duration, window_start, window_end = parse_meet_args(args)
+    except ValueError as e:
+        await ctx.send(f"{e}. Usage: !meet @user... [length like 30m or 1h] [week | mm/dd/yy [mm/dd/yy]]")
+        return
+
+    user_ids = [str(ctx.author.id)]
+    for member in ctx.message.mentions:
+        if str(member.id) not in user_ids:
+            user_ids.append(str(member.id))
+
+    participants = await load_participants(user_ids, window_start, window_end)
+    slots = find_meeting_slots(participants, max(window_start, datetime.now()), window_end, duration)
+    await send_lines(ctx, format_meeting_slots(slots, len(user_ids)))
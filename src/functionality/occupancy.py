@@ -0,0 +1,182 @@
+# functionality/occupancy.py
+
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTE = timedelta(minutes=1)
+
+
+def _minutes(moment, day_start, rounding):
+    # Minutes from day_start to moment, rounded with np.floor or np.ceil
+    return int(rounding((moment - day_start) / MINUTE))
+
+
+def _mark(bitmap, day_start, start, end):
+    # Marks every minute of the day the event [start, end) touches as busy
+    first = max(0, _minutes(start, day_start, np.floor))
+    last = min(MINUTES_PER_DAY, _minutes(end, day_start, np.ceil))
+    if last > first:
+        bitmap[first:last] = True
+
+
+def _day_start(day):
+    return datetime.combine(day, time())
+
+
+class OccupancyMap:
+    """
+    Class:
+        OccupancyMap
+    Description:
+        A user's busy time as one NumPy bool array of 1440 minutes per day, so free time queries are vectorized
+        run length scans instead of walks over event rows. A minute is busy if any event covers part of it.
+        Days are built from the calendar's IntervalIndex the first time a query touches them. Added events are
+        marked on the days already built, and days touched by an edited or deleted event are dropped and rebuilt
+        by the next query.
+
+        Like the IntervalIndex, bitmaps are never changed once built: updates replace the bitmap of a day, so
+        copy() is cheap and a copy can be updated while other threads keep querying the original.
+    """
+
+    def __init__(self, index, days=None):
+        """
+        Function:
+            __init__
+        Description:
+            Creates an OccupancyMap with no day built yet
+        Input:
+            index - The IntervalIndex of the calendar, days are built from it
+            days - Bitmaps already built, by date
+        Output:
+            - A new OccupancyMap instance
+        """
+        self.index = index
+        self._days = dict(days or {})
+
+    def copy(self, index):
+        """
+        Function:
+            copy
+        Description:
+            Returns an independent map sharing this one's bitmaps, building missing days from another index
+        Input:
+            index - The IntervalIndex the copy builds its days from
+        Output:
+            - A new OccupancyMap instance
+        """
+        return OccupancyMap(index, self._days)
+
+    def built_days(self):
+        """Returns the dates whose bitmap is built."""
+        return sorted(self._days)
+
+    def day(self, day):
+        """
+        Function:
+            day
+        Description:
+            Returns the bitmap of a day, building it if no query touched the day yet
+        Input:
+            day - date object
+        Output:
+            Read only bool array of 1440 minutes, True where the user is busy
+        """
+        bitmap = self._days.get(day)
+        if bitmap is None:
+            start = _day_start(day)
+            bitmap = np.zeros(MINUTES_PER_DAY, dtype=bool)
+            for record in self.index.overlapping_records(start, start + timedelta(days=1)):
+                _mark(bitmap, start, record.start_date, record.end_date)
+            bitmap.flags.writeable = False
+            # Building a day twice in a race is harmless, both describe the same events
+            self._days[day] = bitmap
+        return bitmap
+
+    def add(self, record):
+        """
+        Function:
+            add
+        Description:
+            Marks a new event on the days already built. A recurring event drops the days it may recur on instead
+        Input:
+            record - The EventRecord of the event
+        Output: None
+        """
+        if not record.has_dates():
+            return
+        if record.is_recurring():
+            self.forget([record])
+            return
+        for day in self._touched(record):
+            bitmap = self._days[day].copy()
+            _mark(bitmap, _day_start(day), record.start_date, record.end_date)
+            bitmap.flags.writeable = False
+            self._days[day] = bitmap
+
+    def forget(self, records):
+        """
+        Function:
+            forget
+        Description:
+            Drops the days the given events touch, so they are rebuilt from the index by the next query
+        Input:
+            records - EventRecords of the changed events
+        Output: None
+        """
+        for record in records:
+            if record.has_dates():
+                for day in self._touched(record):
+                    self._days.pop(day, None)
+
+    def busy(self, start, end):
+        """
+        Function:
+            busy
+        Description:
+            Returns the occupancy of every minute of a window
+        Input:
+            start, end - datetime objects of the window, both on whole minutes
+        Output:
+            Bool array with one entry per minute from start to end, True where the user is busy
+        """
+        days = []
+        day = start.date()
+        while _day_start(day) < end:
+            days.append(self.day(day))
+            day += timedelta(days=1)
+        if not days:
+            return np.zeros(0, dtype=bool)
+        offset = _minutes(start, _day_start(start.date()), np.floor)
+        return np.concatenate(days)[offset:offset + _minutes(end, start, np.floor)]
+
+    def free_slots(self, start, end):
+        """
+        Function:
+            free_slots
+        Description:
+            Finds the free time in a window with a run length scan over its minutes. The window is shrunk to
+            whole minutes.
+        Input:
+            start, end - datetime objects of the window
+        Output:
+            List of free (start, end) pairs ordered by start
+        """
+        first = _day_start(start.date()) + MINUTE * _minutes(start, _day_start(start.date()), np.ceil)
+        last = _day_start(end.date()) + MINUTE * _minutes(end, _day_start(end.date()), np.floor)
+        if last <= first:
+            return []
+        free = np.concatenate(([0], ~self.busy(first, last), [0])).astype(np.int8)
+        # Runs of free minutes start where the padded array steps up and end where it steps down
+        edges = np.flatnonzero(np.diff(free))
+        return [(first + MINUTE * int(run_start), first + MINUTE * int(run_end))
+                for run_start, run_end in zip(edges[0::2], edges[1::2])]
+
+    def _touched(self, record):
+        # The built days the event covers part of, every day after its start for a recurring event
+        first = record.start_date.date()
+        last = max(record.start_date, record.end_date - timedelta(microseconds=1)).date()
+        if record.is_recurring():
+            last = date.max
+        return [day for day in list(self._days) if first <= day <= last]
@@ -0,0 +1,165 @@
+# functionality/recurrence.py
+
+import functools
+import re
+from datetime import datetime, timedelta
+
+from dateutil.rrule import rrulestr
+
+from src.functionality.event_schema import make_record
+from src.functionality.storage import RECURRENCE, overlaps
+
+# Number of (event, window) expansions kept, so repeated queries of the same days don't expand rules again
+RECURRENCE_CACHE_SIZE = 512
+
+# Lines of an RFC 5545 recurrence kept in storage
+RECURRENCE_PROPERTIES = ("RRULE", "EXRULE", "RDATE", "EXDATE")
+
+# Dates are stored on the calendar's wall clock, so UTC markers and time zone parameters are dropped
+_UTC_SUFFIX = re.compile(r"(\d{8}(?:T\d{6})?)Z")
+
+# Format of the start date in the IDs of occurrences and in EXDATE lines
+OCCURRENCE_FORMAT = "%Y%m%dT%H%M%S"
+
+# ID of an occurrence: the recurring event's ID and the occurrence's start. Unlike Google's instance IDs, the
+# start is on the calendar's wall clock and has no trailing Z
+_OCCURRENCE_ID = re.compile(r"^(.+)_(\d{8}T\d{6})$")
+
+
+def normalize_recurrence(lines):
+    """
+    Function: normalize_recurrence
+    Description: Turns recurrence lines from an ICS file or Google Calendar into the rule stored for an event.
+    Only RRULE, EXRULE, RDATE and EXDATE lines are kept, a bare "FREQ=..." is read as an RRULE, and dates are
+    moved to the wall clock the calendar is stored in.
+
+    Input:
+        lines - String or list of strings, e.g. ["RRULE:FREQ=WEEKLY;BYDAY=MO", "EXDATE:20211011T100000"]
+    Output:
+        The lines joined by line breaks, or "" if there is no recurrence
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    kept = []
+    for line in lines or []:
+        line = line.strip()
+        if line.upper().startswith("FREQ="):
+            line = "RRULE:" + line
+        name, _, value = line.partition(":")
+        name = name.split(";")[0].upper()
+        if name not in RECURRENCE_PROPERTIES or not value:
+            continue
+        kept.append(name + ":" + _UTC_SUFFIX.sub(r"\1", value))
+    return "\n".join(kept)
+
+
+def occurrence_id(event_id, start):
+    """Returns the ID of the occurrence of a recurring event starting at start."""
+    return f"{event_id}_{start.strftime(OCCURRENCE_FORMAT)}"
+
+
+def split_occurrence_id(event_id):
+    """
+    Function: split_occurrence_id
+    Description: Reads the ID of an occurrence (see occurrence_id).
+
+    Input:
+        event_id - ID of an event or of an occurrence
+    Output:
+        The recurring event's ID and the occurrence's start, or the ID and None if it names no occurrence
+    """
+    match = _OCCURRENCE_ID.match(event_id or "")
+    if match is None:
+        return event_id, None
+    return match.group(1), datetime.strptime(match.group(2), OCCURRENCE_FORMAT)
+
+
+def exclude_occurrence(record, start):
+    """
+    Function: exclude_occurrence
+    Description: Drops one occurrence of a recurring event by adding an EXDATE to its rule.
+
+    Input:
+        record - EventRecord of the recurring event
+        start - datetime the occurrence starts at
+    Output:
+        The recurring event's new row
+    """
+    row = record.to_row()
+    row[RECURRENCE] = record.recurrence + "\nEXDATE:" + start.strftime(OCCURRENCE_FORMAT)
+    return row
+
+
+@functools.lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def _rule_set(rule, first_start):
+    return rrulestr(rule, dtstart=first_start, forceset=True)
+
+
+@functools.lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def occurrence_starts(rule, first_start, duration, start, end):
+    """
+    Function: occurrence_starts
+    Description: Expands a recurrence rule within a window. Results are kept in an LRU, so asking for the same
+    window again costs a dictionary lookup.
+
+    Input:
+        rule - The stored recurrence rule
+        first_start - datetime of the first occurrence
+        duration - timedelta every occurrence lasts
+        start, end - datetime objects of the window [start, end)
+    Output:
+        Tuple of the start datetimes of the occurrences falling into the window, in order
+    Raises:
+        ValueError if the rule cannot be read
+    """
+    # An occurrence starting up to one duration before the window still reaches into it
+    candidates = _rule_set(rule, first_start).between(start - duration, end, inc=True)
+    return tuple(moment for moment in candidates if overlaps(moment, moment + duration, start, end))
+
+
+def occurrences(record, start, end):
+    """
+    Function: occurrences
+    Description: Expands a recurring event into its occurrences within a window. An event whose rule cannot be
+    read counts as a single event.
+
+    Input:
+        record - EventRecord of the recurring event
+        start, end - datetime objects of the window [start, end)
+    Output:
+        List of EventRecords, one per occurrence, ordered by start. They carry no rule, their IDs name the event
+        and their start (see occurrence_id) and recurrence_of holds the event's ID
+    """
+    duration = max(record.end_date - record.start_date, timedelta(0))
+    try:
+        starts = occurrence_starts(record.recurrence, record.start_date, duration, start, end)
+    except (ValueError, TypeError):
+        starts = (record.start_date,) if overlaps(record.start_date, record.end_date, start, end) else ()
+    return [
+        make_record(occurrence_id(record.event_id, moment), record.name, moment, moment + duration, record.priority,
+                    record.event_type, record.description, record.location, recurrence_of=record.event_id)
+        for moment in starts
+    ]
+
+
+def expand_records(records, start, end):
+    """
+    Function: expand_records
+    Description: Replaces the recurring events among records by their occurrences within a window.
+
+    Input:
+        records - EventRecords, recurring or not, of the events that may fall into the window
+        start, end - datetime objects of the window [start, end)
+    Output:
+        List of EventRecords ordered by start date
+    """
+    if not any(record.is_recurring() for record in records):
+        return list(records)
+    expanded = []
+    for record in records:
+        if record.is_recurring():
+            expanded.extend(occurrences(record, start, end))
+        else:
+            expanded.append(record)
+    expanded.sort(key=lambda record: record.start_date)
+    return expanded
@@ -2,45 +2,563 @@
 
 import sys
 import os
-import csv
 from pathlib import Path
 from datetime import datetime
-from cryptography.fernet import Fernet
-import asyncio
-from datetime import datetime
 from dateutil import parser
-from datetime import datetime
 import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".../")))
-from src.Event import Event
 from src.functionality.Google import connect_google
+from src.functionality.google_access import execute
+from src.functionality.event_schema import (
+    EventRecord,
+    apply_record_mutation,
+    current_header,
+    decode_row,
+    decode_rows,
+    merge_records,
+    upgrade_rows,
+)
+from src.functionality.event_table import EventTable
+from src.functionality.interval_index import IntervalIndex
+from src.functionality.keyring import Keyring
+from src.functionality.occupancy import OccupancyMap
+from src.functionality.recurrence import (
+    exclude_occurrence,
+    expand_records,
+    normalize_recurrence,
+    split_occurrence_id,
+)
+from src.functionality.storage import (
+    ADD,
+    DELETE,
+    EDIT,
+    EVENTS,
+    TYPES,
+    create_backend,
+    data_directory,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of decrypted calendar/type files kept in memory at once
+CALENDAR_CACHE_SIZE = 128
 
-def add_event_to_file_main(user_id, event_data):
+# Column headers of newly created files
+EVENT_HEADER = current_header()
+TYPE_HEADER = ["Event Type", "Start time", "End time"]
+
+# Time zone the bot's wall clock dates are sent to Google Calendar in
+GOOGLE_TIME_ZONE = 'America/New_York'
+
+# Event type of the events synced from Google Calendar
+GOOGLE_EVENT_TYPE = 'GoogleCalendar'
+
+
+class CalendarSnapshot:
     """
-    Adds an event to the user's schedule file, encrypting it afterward.
+    Class:
+        CalendarSnapshot
+    Description:
+        One committed version of a cached table: its rows and, for calendars, the EventRecords decoded from them
+        and the IntervalIndex, EventTable and OccupancyMap over them once a query has built them. outdated marks a
+        calendar whose stored header is an older schema than the rows held here. A snapshot is never changed after
+        it is published; mutations publish a new one.
     """
-    key = load_key(user_id)
-    event_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
-    decrypt_file(key, event_file_path)
 
-    # Read existing events
-    rows = []
-    if os.path.exists(event_file_path):
-        with open(event_file_path, "r", newline="", encoding='utf-8') as calendar_file:
-            csvreader = csv.reader(calendar_file)
-            rows = list(csvreader)
+    __slots__ = ("rows", "records", "index", "table", "occupancy", "outdated")
+
+    def __init__(self, rows, records=None, index=None, outdated=False, occupancy=None):
+        self.rows = tuple(rows)
+        self.records = records
+        self.index = index
+        self.table = None
+        self.occupancy = occupancy
+        self.outdated = outdated
+
+    @classmethod
+    def load(cls, kind, rows):
+        """
+        Function:
+            load
+        Description:
+            Builds the snapshot of rows read from the backend. Calendars are decoded (see event_schema.py) so every
+            date is parsed once per load, and calendars stored with an older header are upgraded in memory.
+        Input:
+            kind - EVENTS or TYPES
+            rows - List of rows, header included
+        Output:
+            - A new CalendarSnapshot instance
+        """
+        rows = [list(row) for row in rows if len(row) > 0]
+        if kind != EVENTS:
+            return cls(rows)
+        schema, records = decode_rows(rows)
+        if not rows:
+            return cls(rows, tuple(records))
+        header = rows[0] if schema.is_current() else current_header()
+        return cls([header] + [record.row for record in records], tuple(records), outdated=not schema.is_current())
+
+
+class CalendarRepository:
+    """
+    Class:
+        CalendarRepository
+    Description:
+        Keeps a bounded LRU of decrypted and parsed calendar and event type tables in memory, in front of a
+        storage backend (see storage.py). Reads are served from the cache once a table has been loaded, so
+        read-only commands do no disk I/O and no Fernet work on a warm cache. Every mutation goes through the
+        repository, which writes it to the backend and updates the cached copy.
+
+        Calendars are decoded into EventRecords when they are loaded, so dates are parsed once and never again
+        downstream. A calendar stored with an older header is rewritten in the current schema by its first
+        mutation after loading.
+
+        Cached calendars also get an IntervalIndex, built on the first date query and kept up to date by
+        add_event, update_event and delete_event, so date queries don't scan the calendar. Free time queries use
+        an OccupancyMap of per day minute bitmaps, built lazily from the index and updated by the same mutations.
+
+        Cached tables are immutable CalendarSnapshots. Writers build a new snapshot under the lock and swap it in,
+        and readers only look up the current one, so reads never wait for a writer.
+    """
+
+    def __init__(self, backend, max_entries=CALENDAR_CACHE_SIZE):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new, empty CalendarRepository
+        Input:
+            backend - The StorageBackend the tables are persisted in
+            max_entries - Number of tables kept decrypted in memory before the least recently used is dropped
+        Output:
+            - A new CalendarRepository instance
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self._snapshots = OrderedDict()
+        # Bumped by every mutation, so a slow cache miss can tell whether its rows are still current
+        self._epoch = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def set_backend(self, backend):
+        """
+        Function:
+            set_backend
+        Description:
+            Switches to another storage backend, dropping everything cached from the previous one
+        Input:
+            backend - The new StorageBackend
+        Output: None
+        """
+        self.backend = backend
+        self.invalidate()
+
+    def is_cached(self, user_id, kind):
+        """
+        Function:
+            is_cached
+        Description:
+            Checks whether the given table is currently held in the cache
+        Input:
+            user_id - String representing the Discord ID of the user
+            kind - EVENTS or TYPES
+        Output:
+            True if the table is cached, False otherwise
+        """
+        return (kind, user_id) in self._snapshots
+
+    def exists(self, user_id, kind):
+        """
+        Function:
+            exists
+        Description:
+            Checks whether the given table exists, without touching the backend if it is cached
+        Input:
+            user_id - String representing the Discord ID of the user
+            kind - EVENTS or TYPES
+        Output:
+            True if the table exists, False otherwise
+        """
+        return self.is_cached(user_id, kind) or self.backend.exists(user_id, kind)
+
+    def ensure(self, user_id, kind, header):
+        """
+        Function:
+            ensure
+        Description:
+            Creates the table with only its header row if it doesn't exist yet
+        Input:
+            user_id - String representing the Discord ID of the user
+            kind - EVENTS or TYPES
+            header - The header row of a new table
+        Output: None
+        """
+        if not self.exists(user_id, kind):
+            self.write(user_id, kind, [header])
+
+    def read(self, user_id, kind):
+        """
+        Function:
+            read
+        Description:
+            Returns the rows of a table, loading it from the backend only on a cache miss
+        Input:
+            user_id - String representing the Discord ID of the user
+            kind - EVENTS or TYPES
+        Output:
+            rows - A copy of the list of rows, safe for the caller to modify
+        """
+        return [list(row) for row in self._snapshot(user_id, kind).rows]
+
+    def write(self, user_id, kind, rows):
+        """
+        Function:
+            write
+        Description:
+            Replaces a whole table in the backend and in the cache
+        Input:
+            user_id - String representing the Discord ID of the user
+            kind - EVENTS or TYPES
+            rows - List of rows to write, header included
+        Output: None
+        """
+        if kind == EVENTS:
+            rows = upgrade_rows(rows)
+        # Drop the cached copy first so a failed write can never leave stale rows behind
+        self.invalidate(user_id, kind)
+        self.backend.write(user_id, kind, rows)
+        self._publish(user_id, kind, CalendarSnapshot.load(kind, rows))
+
+    def events_between(self, user_id, start, end):
+        """
+        Function:
+            events_between
+        Description:
+            Returns the event rows (no header) that fall into the window [start, end), ordered by start date.
+            Backends with indexed or sharded dates answer this without loading the whole calendar when it isn't cached.
+            Recurring events are returned as their occurrences in the window.
+        Input:
+            user_id - String representing the Discord ID of the user
+            start, end - datetime objects of the window
+        Output:
+            rows - List of matching event rows
+        """
+        if not self.is_cached(user_id, EVENTS) and self.backend.indexed_ranges:
+            return [record.to_row() for record in self.records_between(user_id, start, end)]
+        return self._index(user_id).overlapping(start, end)
+
+    def events_at(self, user_id, moment):
+        """
+        Function:
+            events_at
+        Description:
+            Returns the event rows (no header) of the events going on at the given moment
+        Input:
+            user_id - String representing the Discord ID of the user
+            moment - datetime object
+        Output:
+            rows - List of matching event rows, ordered by start date
+        """
+        return self._index(user_id).active_at(moment)
+
+    def records(self, user_id):
+        """
+        Function:
+            records
+        Description:
+            Returns the decoded events of the calendar, with dates already parsed
+        Input:
+            user_id - String representing the Discord ID of the user
+        Output:
+            records - List of EventRecords in calendar order, shared with the cache and not to be modified
+        """
+        return list(self._snapshot(user_id, EVENTS).records)
+
+    def records_between(self, user_id, start, end):
+        """
+        Function:
+            records_between
+        Description:
+            Like events_between, but returns decoded events with dates already parsed
+        Input:
+            user_id - String representing the Discord ID of the user
+            start, end - datetime objects of the window
+        Output:
+            records - List of matching EventRecords ordered by start date, not to be modified
+        """
+        if not self.is_cached(user_id, EVENTS) and self.backend.indexed_ranges:
+            # The backend also returns the recurring events that may recur in the window
+            records = [decode_row(row) for row in self.backend.events_between(user_id, start, end)]
+            return expand_records(records, start, end)
+        return self._index(user_id).overlapping_records(start, end)
+
+    def free_slots(self, user_id, start, end):
+        """
+        Function:
+            free_slots
+        Description:
+            Returns the free time of the calendar in the window [start, end), from the day bitmaps of its
+            OccupancyMap. The window is shrunk to whole minutes, and a minute is busy if any event covers part of it.
+        Input:
+            user_id - String representing the Discord ID of the user
+            start, end - datetime objects of the window
+        Output:
+            List of free (start, end) pairs ordered by start
+        """
+        snapshot = self._snapshot(user_id, EVENTS)
+        if snapshot.occupancy is None:
+            snapshot.occupancy = OccupancyMap(self._indexed(snapshot))
+        return snapshot.occupancy.free_slots(start, end)
+
+    def select_events(self, user_id, where):
+        """
+        Function:
+            select_events
+        Description:
+            Returns the event rows (no header) picked by a vectorized filter over the calendar's EventTable
+        Input:
+            user_id - String representing the Discord ID of the user
+            where - Function taking the EventTable and returning a boolean mask over its events
+        Output:
+            rows - List of matching event rows, in calendar order
+        """
+        snapshot = self._snapshot(user_id, EVENTS)
+        if snapshot.table is None:
+            snapshot.table = EventTable.from_records(snapshot.records)
+        return [list(row) for row in snapshot.table.select(snapshot.rows[1:], where(snapshot.table))]
+
+    def add_event(self, user_id, row):
+        """
+        Function:
+            add_event
+        Description:
+            Adds one event row in chronological order
+        Input:
+            user_id - String representing the Discord ID of the user
+            row - The event row
+        Output: None
+        """
+        self._mutate(user_id, lambda: self.backend.add_event(user_id, row), *self._change(ADD, row[0], row))
+
+    def add_events(self, user_id, rows):
+        """
+        Function:
+            add_events
+        Description:
+            Adds a batch of event rows in chronological order. The batch is merged into the calendar in one pass,
+            and the backend decrypts and encrypts the calendar once for the whole batch instead of once per event.
+        Input:
+            user_id - String representing the Discord ID of the user
+            rows - List of event rows or EventRecords, in any order
+        Output: None
+        """
+        if not rows:
+            return
+        batch = [row if isinstance(row, EventRecord) else decode_row(row) for row in rows]
+        rows = [record.row for record in batch]
+
+        def change_index(index):
+            for record in batch:
+                index.add(record)
+
+        def change_occupancy(occupancy, previous):
+            for record in batch:
+                occupancy.add(record)
+
+        self._mutate(user_id, lambda: self.backend.add_events(user_id, rows),
+                     lambda records: merge_records(records, batch), change_index, change_occupancy)
+
+    def update_event(self, user_id, event_id, row):
+        """
+        Function:
+            update_event
+        Description:
+            Replaces the rows of the given event ID without rewriting the rest of the calendar
+        Input:
+            user_id - String representing the Discord ID of the user
+            event_id - ID of the event to replace
+            row - The new event row
+        Output: None
+        """
+        self._mutate(user_id, lambda: self.backend.update_event(user_id, event_id, row),
+                     *self._change(EDIT, event_id, row))
+
+    def delete_event(self, user_id, event_id):
+        """
+        Function:
+            delete_event
+        Description:
+            Deletes the rows of the given event ID without rewriting the rest of the calendar. The ID of an
+            occurrence of a recurring event (see recurrence.occurrence_id) only drops that occurrence
+        Input:
+            user_id - String representing the Discord ID of the user
+            event_id - ID of the event to delete
+        Output: None
+        """
+        master_id, start = split_occurrence_id(event_id)
+        if start is not None:
+            for record in self.records(user_id):
+                if record.event_id == master_id and record.is_recurring():
+                    self.update_event(user_id, master_id, exclude_occurrence(record, start))
+                    return
+        self._mutate(user_id, lambda: self.backend.delete_event(user_id, event_id), *self._change(DELETE, event_id))
+
+    def clear(self, kind):
+        """
+        Function:
+            clear
+        Description:
+            Deletes the given table for every user
+        Input:
+            kind - EVENTS or TYPES
+        Output: None
+        """
+        self.invalidate()
+        self.backend.clear(kind)
+
+    def invalidate(self, user_id=None, kind=None):
+        """
+        Function:
+            invalidate
+        Description:
+            Drops a user's tables from the cache, or every table if no user is given
+        Input:
+            user_id - String representing the Discord ID of the user, or None to clear the whole cache
+            kind - EVENTS or TYPES, or None for both
+        Output: None
+        """
+        with self._lock:
+            if user_id is None:
+                self._snapshots.clear()
+                self._versions.clear()
+                self._epoch += 1
+                return
+            for table_kind in ([kind] if kind else [EVENTS, TYPES]):
+                self._snapshots.pop((table_kind, user_id), None)
+                self._bump(user_id, table_kind)
+
+    def _snapshot(self, user_id, kind):
+        snapshot = self._snapshots.get((kind, user_id))
+        if snapshot is not None:
+            # Refreshing the LRU order is skipped rather than waited for while a writer holds the lock
+            if self._lock.acquire(blocking=False):
+                try:
+                    if (kind, user_id) in self._snapshots:
+                        self._snapshots.move_to_end((kind, user_id))
+                finally:
+                    self._lock.release()
+            return snapshot
+
+        version = self._version(user_id, kind)
+        snapshot = CalendarSnapshot.load(kind, self.backend.read(user_id, kind))
+        self._publish(user_id, kind, snapshot, version)
+        return snapshot
+
+    def _index(self, user_id):
+        return self._indexed(self._snapshot(user_id, EVENTS))
+
+    def _indexed(self, snapshot):
+        if snapshot.index is None:
+            # Building the index twice in a race is harmless, both describe the same rows
+            snapshot.index = IntervalIndex(snapshot.records)
+        return snapshot.index
+
+    def _change(self, action, event_id, row=None):
+        # The functions applying a single event mutation to the cached records, index and occupancy
+        record = decode_row(row) if row is not None else None
+
+        def change_occupancy(occupancy, previous):
+            if action == ADD:
+                occupancy.add(record)
+                return
+            # The days of the replaced or deleted rows, and of the new row, are rebuilt from the updated index
+            changed = [current for current in previous if current.event_id == event_id]
+            occupancy.forget(changed + ([record] if action == EDIT else []))
+
+        return (lambda records: apply_record_mutation(records, action, event_id, record),
+                lambda index: index.apply(action, event_id, record),
+                change_occupancy)
+
+    def _mutate(self, user_id, apply_backend, change_records, change_index, change_occupancy):
+        upgraded = False
+        current = self._snapshots.get((EVENTS, user_id))
+        if current is not None and current.outdated:
+            # The stored calendar still has an older header, so this write stores the whole upgraded calendar
+            records = list(current.records)
+            change_records(records)
+            rows = list(current.rows[:1] or [EVENT_HEADER]) + [changed.row for changed in records]
+            apply_backend = lambda: self.backend.write(user_id, EVENTS, rows)
+            upgraded = True
+        try:
+            apply_backend()
+        except BaseException:
+            self.invalidate(user_id, EVENTS)
+            raise
+        with self._lock:
+            self._bump(user_id, EVENTS)
+            current = self._snapshots.get((EVENTS, user_id))
+            if current is None:
+                return
+            records = list(current.records)
+            change_records(records)
+            index = None
+            occupancy = None
+            if current.index is not None:
+                index = current.index.copy()
+                change_index(index)
+                if current.occupancy is not None:
+                    occupancy = current.occupancy.copy(index)
+                    change_occupancy(occupancy, current.records)
+            self._snapshots[(EVENTS, user_id)] = CalendarSnapshot(
+                list(current.rows[:1] or [EVENT_HEADER]) + [changed.row for changed in records],
+                tuple(records),
+                index,
+                current.outdated and not upgraded,
+                occupancy,
+            )
+
+    def _version(self, user_id, kind):
+        with self._lock:
+            return self._epoch, self._versions.get((kind, user_id), 0)
+
+    def _bump(self, user_id, kind):
+        self._versions[(kind, user_id)] = self._versions.get((kind, user_id), 0) + 1
+
+    def _publish(self, user_id, kind, snapshot, version=None):
+        with self._lock:
+            if version is not None and version != (self._epoch, self._versions.get((kind, user_id), 0)):
+                # A writer changed the table while it was being read, the rows may be stale and aren't cached
+                return
+            self._snapshots[(kind, user_id)] = snapshot
+            self._snapshots.move_to_end((kind, user_id))
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+
 
-    # If the file is empty, add the header
-    if not rows:
-        rows.append(['eventId', 'name', 'startDateTime', 'endDateTime', 'priority', 'type', 'desc', 'location'])
+# Process-wide keyring caching every user's key and Fernet instance. Setting SCHEDULEBOT_MASTER_KEY to a Fernet
+# key stores the user keys wrapped by it.
+keyring = Keyring(os.environ.get("SCHEDULEBOT_MASTER_KEY"))
 
-    # Append the new event
-    rows.append([
+# Process-wide repository shared by every command. The backend is picked with the SCHEDULEBOT_STORAGE
+# environment variable ("csv", "sqlite" or "memory") and defaults to the encrypted csv files.
+repository = CalendarRepository(
+    create_backend(os.environ.get("SCHEDULEBOT_STORAGE", "csv"), lambda user_id: keyring.fernet(user_id))
+)
+
+
+def event_data_to_row(event_data):
+    """
+    Converts an event dictionary (see parse_google_event) into a calendar row. A recurring event's rule is
+    kept in the column after the location.
+    """
+    row = [
         event_data['id'],
         event_data['name'],
         event_data['startDateTime'],
@@ -49,14 +567,25 @@ def add_event_to_file_main(user_id, event_data):
         event_data['type'],
         event_data['desc'],
         event_data['location'],
-    ])
+    ]
+    if event_data.get('recurrence'):
+        row.append(event_data['recurrence'])
+    return row
 
-    # Write the updated events back to the file
-    with open(event_file_path, "w", newline="", encoding='utf-8') as calendar_file:
-        csvwriter = csv.writer(calendar_file)
-        csvwriter.writerows(rows)
 
-    encrypt_file(key, event_file_path)
+def add_event_to_file_main(user_id, event_data):
+    """
+    Adds an event to the user's schedule file, encrypting it afterward.
+    """
+    new_row = event_data_to_row(event_data)
+
+    # If there is no calendar yet, create it with the header
+    if not repository.exists(user_id, EVENTS):
+        rows = [EVENT_HEADER, new_row]
+        repository.write(user_id, EVENTS, rows)
+    else:
+        # Only the new event is appended to the journal, the rest of the calendar is left untouched
+        repository.add_event(user_id, new_row)
 
 async def fetch_google_events(ctx, max_results=10):
     """
@@ -78,13 +607,13 @@ async def fetch_google_events(ctx, max_results=10):
 
     try:
         now = datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time in ISO format
-        events_result = service.events().list(
+        events_result = await execute(str(ctx.author.id), service.events().list(
             calendarId='primary',
             timeMin=now,
             maxResults=max_results,
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
         events = events_result.get('items', [])
         logger.debug(f"Fetched {len(events)} events for user {ctx.author.id}")
         return events, None
@@ -115,21 +644,44 @@ def parse_google_event(event):
     start_dt = parser.isoparse(start)
     end_dt = parser.isoparse(end)
 
-    # Create the local event object
+    # Create the local event object. recurrence is only set on recurring events themselves, not their instances
     local_event = {
         'id': event_id,
         'name': summary,
         'startDateTime': start_dt.strftime("%Y-%m-%d %H:%M:%S"),
         'endDateTime': end_dt.strftime("%Y-%m-%d %H:%M:%S"),
         'priority': 'Medium',  # Default value, adjust as needed
-        'type': 'GoogleCalendar',  # Indicate the source
+        'type': GOOGLE_EVENT_TYPE,  # Indicate the source
         'desc': description,
         'location': location,
+        'recurrence': normalize_recurrence(event.get('recurrence', [])),
     }
 
     return local_event
 
 
+def record_to_google_event(record):
+    """
+    Function: record_to_google_event
+    Description: Turns a local event into the body of a Google Calendar insert, the reverse of parse_google_event.
+
+    Input:
+        record - The EventRecord
+    Output:
+        The event dictionary
+    """
+    event = {
+        'summary': record.name,
+        'location': record.location,
+        'description': record.description,
+        'start': {'dateTime': record.start_date.strftime("%Y-%m-%dT%H:%M:%S"), 'timeZone': GOOGLE_TIME_ZONE},
+        'end': {'dateTime': record.end_date.strftime("%Y-%m-%dT%H:%M:%S"), 'timeZone': GOOGLE_TIME_ZONE},
+    }
+    if record.is_recurring():
+        event['recurrence'] = record.recurrence.split("\n")
+    return event
+
+
 def check_passkey(provided_passkey, CLEAR_DATA_PASSKEY):
     """
     Checks if the provided passkey matches the one in the environment variable.
@@ -146,33 +698,33 @@ def get_event_history(user_id):
     """
     Fetches the event history for the given user ID.
     """
-    events = read_event_file(user_id)
-    past_events = [
-        event for event in events
-        if datetime.strptime(event[3], "%Y-%m-%d %H:%M:%S") < datetime.now()
-    ]
+    now = datetime.now()
+    past_events = repository.select_events(user_id, lambda table: table.ended_before(now))
     return format_event_history(past_events)
 
-def format_event_history(events):
+def format_event_history(events, upcoming=0):
     """
     Formats the list of events into a human-readable string.
 
     Parameters:
         events (list): A list of event data.
+        upcoming (int): Number of events still to come.
 
     Returns:
         str: Formatted string of the user's past events.
     """
     if not events:
-        return "You have no past events."
-
-    history_str = "Your past events:\n"
+        history_str = "You have no past events.\n"
+    else:
+        history_str = "Your past events:\n"
     for event in events:
         # Assuming each event is a list with elements in the order:
         # [event_id, event_name, start_date, end_date, priority, event_type, notes, location]
         history_str += f"- {event[1]} (from {event[2]} to {event[3]})\n"
+    if upcoming:
+        history_str += f"You have {upcoming} upcoming events."
 
-    return history_str
+    return history_str.rstrip("\n")
 
 def write_event_file(user_id, rows):
     """
@@ -183,15 +735,34 @@ def write_event_file(user_id, rows):
         rows - List of event rows to write to the file
     Output: None
     """
-    key = load_key(user_id)
-    event_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
-    decrypt_file(key, event_file_path)
+    repository.write(user_id, EVENTS, rows)
 
-    with open(event_file_path, "w", newline="", encoding='utf-8') as calendar_file:
-        csvwriter = csv.writer(calendar_file)
-        csvwriter.writerows(rows)
 
-    encrypt_file(key, event_file_path)
+def write_type_file(user_id, rows):
+    """
+    Function: write_type_file
+    Description: Writes the event type rows back to the user's event type file, encrypting it afterwards.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        rows - List of event type rows to write to the file, header included
+    Output: None
+    """
+    repository.write(user_id, TYPES, rows)
+
+
+def update_event_in_file(user_id, event_id, row):
+    """
+    Function: update_event_in_file
+    Description: Replaces a single event in the user's calendar, keyed by its event ID.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        event_id - ID of the event to replace
+        row - The new event row
+    Output: None
+    """
+    repository.update_event(user_id, event_id, row)
 
 
 def add_participant_to_event(user_id, event_id):
@@ -215,19 +786,22 @@ def get_user_event_history(user_id):
     Returns:
         list: A list of past events.
     """
-    events = read_event_file(user_id)
-    past_events = []
+    # The end dates of the whole calendar are compared in one vectorized pass over its EventTable
+    now = datetime.now()
+    return repository.select_events(user_id, lambda table: table.ended_before(now))
 
-    # Assuming the structure of each event is as follows:
-    # [event_id, event_name, start_date, end_date, priority, event_type, notes, location]
-    # and the first row of the events file is a header
-    for event in events[1:]:
-        # Check if the event end date is in the past
-        end_date = datetime.strptime(event[3], "%Y-%m-%d %H:%M:%S")
-        if end_date < datetime.now():
-            past_events.append(event)
+def get_user_upcoming_events(user_id):
+    """
+    Retrieves the events of the user that are still to come, recurring events included.
+
+    Parameters:
+        user_id (str): The Discord ID of the user.
 
-    return past_events
+    Returns:
+        list: A list of upcoming events.
+    """
+    now = datetime.now()
+    return repository.select_events(user_id, lambda table: table.starts_after(now))
 
 def get_user_participation_history(user_id):
     # Load events
@@ -247,7 +821,7 @@ def create_type_directory():
     Input: None
     Output: Creates Type folder if it doesn't exist.
     """
-    type_dir = os.path.expanduser("~/Documents/ScheduleBot/Type")
+    type_dir = os.path.join(data_directory(), "Type")
     if not os.path.exists(type_dir):
         Path(type_dir).mkdir(parents=True, exist_ok=True)
 
@@ -261,15 +835,7 @@ def create_type_file(user_id):
 
     Output: Creates the event type file if it doesn't exist.
     """
-    type_file_path = os.path.expanduser(
-        f"~/Documents/ScheduleBot/Type/{user_id}event_types.csv"
-    )
-    if not os.path.exists(type_file_path):
-        with open(type_file_path, "x", newline="") as new_file:
-            csvwriter = csv.writer(new_file, delimiter=",")
-            csvwriter.writerow(["Event Type", "Start time", "End time"])
-        key = check_key(user_id)
-        encrypt_file(key, type_file_path)
+    repository.ensure(user_id, TYPES, TYPE_HEADER)
 
 def create_type_tree(user_id):
     """
@@ -281,7 +847,6 @@ def create_type_tree(user_id):
 
     Output: Creates the event type folder and file if they don't exist.
     """
-    create_type_directory()
     create_type_file(user_id)
 
 def read_type_file(user_id):
@@ -295,19 +860,7 @@ def read_type_file(user_id):
     Output:
         rows - List of rows.
     """
-    key = load_key(user_id)
-    type_file_path = os.path.expanduser(
-        f"~/Documents/ScheduleBot/Type/{user_id}event_types.csv"
-    )
-    decrypt_file(key, type_file_path)
-
-    # Opens the event type file
-    with open(type_file_path, "r") as type_lines:
-        type_reader = csv.reader(type_lines, delimiter=",")
-        rows = [line for line in type_reader]
-
-    encrypt_file(key, type_file_path)
-    return rows
+    return repository.read(user_id, TYPES)
 
 def turn_types_to_string(user_id):
     """
@@ -338,7 +891,7 @@ def create_event_directory():
     Input: None
     Output: Creates Event folder if it doesn't exist.
     """
-    event_dir = os.path.expanduser("~/Documents/ScheduleBot/Event")
+    event_dir = os.path.join(data_directory(), "Event")
     if not os.path.exists(event_dir):
         Path(event_dir).mkdir(parents=True, exist_ok=True)
 
@@ -352,15 +905,7 @@ def create_event_file(user_id):
 
     Output: Creates the calendar file if it doesn't exist.
     """
-    event_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
-    if not os.path.exists(event_file_path):
-        with open(event_file_path, "x", newline="") as new_file:
-            csvwriter = csv.writer(new_file, delimiter=",")
-            csvwriter.writerow(
-                ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
-            )
-        key = check_key(user_id)
-        encrypt_file(key, event_file_path)
+    repository.ensure(user_id, EVENTS, EVENT_HEADER)
 
 def create_event_tree(user_id):
     """
@@ -372,7 +917,6 @@ def create_event_tree(user_id):
 
     Output: Creates the calendar folder and file if they don't exist.
     """
-    create_event_directory()
     create_event_file(user_id)
 
 def read_event_file(user_id):
@@ -386,17 +930,87 @@ def read_event_file(user_id):
     Output:
         rows - List of rows.
     """
-    key = load_key(user_id)
-    event_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
-    decrypt_file(key, event_file_path)
+    return repository.read(user_id, EVENTS)
+
+def read_events_between(user_id, start, end):
+    """
+    Function: read_events_between
+    Description: Reads the events of the calendar that fall into the window [start, end).
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        start, end - datetime objects of the window
+
+    Output:
+        rows - List of event rows, without the header.
+    """
+    return repository.events_between(user_id, start, end)
+
+def read_records_between(user_id, start, end):
+    """
+    Function: read_records_between
+    Description: Reads the events of the calendar that fall into the window [start, end), decoded with their
+    dates already parsed.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        start, end - datetime objects of the window
+
+    Output:
+        records - List of EventRecords ordered by start date.
+    """
+    return repository.records_between(user_id, start, end)
+
+def read_records_by_day(user_id, windows):
+    """
+    Function: read_records_by_day
+    Description: Reads the events of the calendar that fall into any of the windows, grouped by the day they
+    start on. The occurrences of the whole span are masked to the windows and grouped in one vectorized pass.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        windows - List of (start, end) datetime pairs ordered by start
+
+    Output:
+        days - Dictionary from date to the EventRecords starting that day, ordered by start date
+    """
+    if not windows:
+        return {}
+    records = read_records_between(user_id, windows[0][0], windows[-1][1])
+    table = EventTable.from_records(records)
+    mask = np.zeros(len(table), dtype=bool)
+    for start, end in windows:
+        mask |= table.between(start, end)
+    return {day: [records[table.source[position]] for position in positions]
+            for day, positions in table.by_day(mask).items()}
+
+def read_free_slots(user_id, start, end):
+    """
+    Function: read_free_slots
+    Description: Reads the free time of the calendar in the window [start, end), on whole minutes.
 
-    # Opens the current user's csv calendar file
-    with open(event_file_path, "r") as calendar_file:
-        calendar_reader = csv.reader(calendar_file, delimiter=",")
-        rows = [row for row in calendar_reader if len(row) > 0]  # Exclude empty lines
+    Input:
+        user_id - String representing the Discord ID of the user
+        start, end - datetime objects of the window
 
-    encrypt_file(key, event_file_path)
-    return rows
+    Output:
+        slots - List of free (start, end) pairs ordered by start.
+    """
+    return repository.free_slots(user_id, start, end)
+
+def read_events_at(user_id, moment):
+    """
+    Function: read_events_at
+    Description: Reads the events of the calendar going on at the given moment.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        moment - datetime object
+
+    Output:
+        rows - List of event rows, without the header.
+    """
+    return repository.events_at(user_id, moment)
 
 def add_event_to_file(user_id, current, event_id):
     """
@@ -408,80 +1022,39 @@ def add_event_to_file(user_id, current, event_id):
         event_id - String representing the event ID from Google Calendar
     Output: None
     """
-    line_number = 0
-    rows = read_event_file(user_id)
-    # If the file already has events
-    if len(rows) > 1:
-        for i in rows:
-            # Skips check with empty lines
-            if len(i) > 0 and line_number != 0:
-                # Temporarily turn each line into an Event object to compare with the object we are trying to add
-                temp_event = Event(
-                    "",
-                    datetime.strptime(i[2], "%Y-%m-%d %H:%M:%S"),
-                    datetime.strptime(i[3], "%Y-%m-%d %H:%M:%S"),
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-                # If the current Event occurs before the temp Event, insert the current at that position
-                if current < temp_event:
-                    rows.insert(line_number, [event_id] + current.to_list())
-                    break
-                # If we have reached the end of the array and not inserted, append the current Event to the array
-                if line_number == len(rows) - 1:
-                    rows.insert(len(rows), [event_id] + current.to_list())
-                    break
-            line_number += 1
-    else:
-        rows.insert(len(rows), [event_id] + current.to_list())
-    # Open current user's calendar file for writing
-    with open(
-        os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv",
-        "w",
-        newline="",
-    ) as calendar_file:
-        # Write the column headers and array of rows back to the calendar file
-        csvwriter = csv.writer(calendar_file)
-        csvwriter.writerows(rows)
-    key = load_key(user_id)
-    encrypt_file(key, os.path.expanduser("~/Documents") + "/ScheduleBot/Event/" + user_id + ".csv")
-
-
-def delete_event_from_file(user_id, to_remove):
-    rows = read_event_file(user_id)
-    type_rows = read_type_file(user_id)
-    print("Rows: " + rows.__str__())
+    # Only the new event is written, the rest of the calendar is left untouched
+    repository.add_event(user_id, [event_id] + current.to_list())
 
-    for row in rows:
-        if to_remove['name'] == row[1]:
-            rows.remove(row)
 
-    for type_row in type_rows:
-        print("Type Row " + type_row.__str__())
-        if to_remove['desc'] == str(type_row[0]):
-            type_rows.remove(type_row)
+def add_events_to_file(user_id, rows):
+    """
+    Function: add_events_to_file
+    Description: Adds a batch of events to the calendar in chronological order, creating the calendar if needed.
+    The calendar is read and written once for the whole batch.
+    Input:
+        user_id - String representing the Discord ID of the user
+        rows - List of event rows, [ID, Name, Start Date, End Date, Priority, Type, Notes, Location], or
+               EventRecords
+    Output: None
+    """
+    create_event_file(user_id)
+    repository.add_events(user_id, rows)
 
-    # Open current user's calendar file for writing
-    event_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
-    with open(event_file_path, "w", newline="") as calendar_file:
-        # Write to column headers and array of rows back to the calendar file
-        csvwriter = csv.writer(calendar_file)
-        csvwriter.writerows(rows)
 
-    key = load_key(user_id)
-    encrypt_file(key, event_file_path)
+def delete_event_from_file(user_id, to_remove):
+    type_rows = read_type_file(user_id)
 
-    type_file_path = os.path.expanduser(
-        f"~/Documents/ScheduleBot/Type/{user_id}event_types.csv"
-    )
-    with open(type_file_path, "w", newline="") as type_file:
-        csvwriter = csv.writer(type_file, delimiter=",")
-        csvwriter.writerows(type_rows)
+    if to_remove.get('id'):
+        # Events synced with Google Calendar are deleted by their ID, without rewriting the calendar
+        repository.delete_event(user_id, to_remove['id'])
+    else:
+        rows = read_event_file(user_id)
+        rows = rows[:1] + [row for row in rows[1:] if to_remove['name'] != row[1]]
+        write_event_file(user_id, rows)
 
-    key = check_key(user_id)
-    encrypt_file(key, type_file_path)
+    kept_type_rows = [type_row for type_row in type_rows if to_remove['desc'] != str(type_row[0])]
+    if len(kept_type_rows) != len(type_rows):
+        write_type_file(user_id, kept_type_rows)
 
 def create_key_directory():
     """
@@ -491,7 +1064,7 @@ def create_key_directory():
     Input: None
     Output: Creates Key folder if it doesn't exist.
     """
-    key_dir = os.path.expanduser("~/Documents/ScheduleBot/Key")
+    key_dir = os.path.join(data_directory(), "Key")
     if not os.path.exists(key_dir):
         Path(key_dir).mkdir(parents=True, exist_ok=True)
 
@@ -506,13 +1079,7 @@ def check_key(user_id):
     Output:
         key - The key for the given user.
     """
-    create_key_directory()
-    key_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Key/{user_id}.key")
-    if not os.path.exists(key_file_path):
-        key = write_key(user_id)
-    else:
-        key = load_key(user_id)
-    return key
+    return keyring.key(user_id)
 
 def write_key(user_id):
     """
@@ -525,17 +1092,13 @@ def write_key(user_id):
     Output:
         key - The written key.
     """
-    # Generates a key and saves it into a file
-    key = Fernet.generate_key()
-    key_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Key/{user_id}.key")
-    with open(key_file_path, "wb") as key_file:
-        key_file.write(key)
-    return key
+    return keyring.write_key(user_id)
 
 def load_key(user_id):
     """
     Function: load_key
-    Description: Reads the key for the user.
+    Description: Reads the key for the user. The key file is only read the first time, later calls
+    are served from the keyring's cache.
 
     Input:
         user_id - String representing the Discord ID of the user
@@ -543,53 +1106,4 @@ def load_key(user_id):
     Output:
         key - The loaded key.
     """
-    key_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Key/{user_id}.key")
-    with open(key_file_path, "rb") as key_file:
-        key = key_file.read()
-    return key
-
-def encrypt_file(key, filepath):
-    """
-    Function: encrypt_file
-    Description: Encrypts the given file with the given key.
-
-    Input:
-        key - Key to encrypt
-        filepath - Filepath to encrypt
-
-    Output: None
-    """
-    fernet = Fernet(key)
-    # Opening the original file to encrypt
-    with open(filepath, 'rb') as file:
-        original = file.read()
-
-    # Encrypting the file
-    encrypted = fernet.encrypt(original)
-
-    # Writing the encrypted data back to the file
-    with open(filepath, 'wb') as encrypted_file:
-        encrypted_file.write(encrypted)
-
-def decrypt_file(key, filepath):
-    """
-    Function: decrypt_file
-    Description: Decrypts the given file with the given key.
-
-    Input:
-        key - Key to decrypt
-        filepath - Filepath to decrypt
-
-    Output: None
-    """
-    fernet = Fernet(key)
-    # Opening the encrypted file
-    with open(filepath, 'rb') as enc_file:
-        encrypted = enc_file.read()
-
-    # Decrypting the file
-    decrypted = fernet.decrypt(encrypted)
-
-    # Writing the decrypted data back to the file
-    with open(filepath, 'wb') as dec_file:
-        dec_file.write(decrypted)
+    return keyring.key(user_id)
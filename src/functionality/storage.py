@@ -0,0 +1,1073 @@
+# functionality/storage.py
+
+import os
+import contextlib
+import csv
+import io
+import json
+import hashlib
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from cryptography.fernet import Fernet, InvalidToken
+
+# Names of the two kinds of per-user files the bot keeps
+EVENTS = "events"
+TYPES = "types"
+
+# Format every event start and end date is stored in
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Shard of the events whose dates cannot be parsed
+UNDATED = "undated"
+
+# Shard of the recurring events, which may recur in any month after their first occurrence
+RECURRING = "recurring"
+
+# Position of the optional column holding an event's recurrence rule (RFC 5545 RRULE lines)
+RECURRENCE = 8
+
+# End date indexed for recurring events, so range queries always find them
+RECURRING_END = "9999-12-31 23:59:59"
+
+# Single event mutations, as recorded in the event journal
+ADD = "add"
+EDIT = "edit"
+DELETE = "delete"
+
+# Lock-free reads retried this many times when writers keep committing under them
+READ_ATTEMPTS = 3
+
+# The journal is folded into a new snapshot once it holds this many records or bytes
+JOURNAL_MAX_RECORDS = 256
+JOURNAL_MAX_BYTES = 256 * 1024
+
+logger = logging.getLogger("schedulebot")
+
+
+def data_directory():
+    """
+    Function: data_directory
+    Description: Returns the root directory of the bot's data. Defaults to ~/Documents/ScheduleBot and can be
+    moved with the SCHEDULEBOT_HOME environment variable (the test suite uses this to stay out of the home directory).
+
+    Input: None
+    Output:
+        The data directory path
+    """
+    return os.environ.get("SCHEDULEBOT_HOME") or os.path.expanduser("~/Documents/ScheduleBot")
+
+
+def parse_date(value):
+    """
+    Function: parse_date
+    Description: Parses a stored event date, returning None if the value is not a valid date.
+
+    Input:
+        value - Date string in the YYYY-MM-DD HH:MM:SS format
+    Output:
+        The datetime object, or None
+    """
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_recurring(row):
+    """
+    Function: is_recurring
+    Description: Checks whether a calendar row is a recurring event, whose dates are those of its first occurrence.
+
+    Input:
+        row - A calendar row
+    Output:
+        True if the row carries a recurrence rule, False otherwise
+    """
+    return len(row) > RECURRENCE and bool(row[RECURRENCE].strip())
+
+
+def months_between(start, end):
+    """
+    Function: months_between
+    Description: Lists the months from the one holding start to the one holding end, both included.
+
+    Input:
+        start, end - datetime objects
+    Output:
+        List of months in the YYYY-MM format
+    """
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def event_months(row):
+    """
+    Function: event_months
+    Description: Lists the months an event row touches, UNDATED if its dates cannot be parsed, or RECURRING for a
+    recurring event.
+
+    Input:
+        row - An event row
+    Output:
+        List of months in the YYYY-MM format
+    """
+    start = parse_date(row[2]) if len(row) > 3 else None
+    end = parse_date(row[3]) if len(row) > 3 else None
+    if start is None or end is None:
+        return [UNDATED]
+    if is_recurring(row):
+        return [RECURRING]
+    return months_between(start, max(start, end))
+
+
+def overlaps(event_start, event_end, start, end):
+    """
+    Function: overlaps
+    Description: Checks whether an event touches the half-open window [start, end).
+
+    Input:
+        event_start, event_end - datetime objects of the event
+        start, end - datetime objects of the window
+    Output:
+        True if the event falls into the window, False otherwise
+    """
+    return event_start < end and (event_end > start or event_start >= start)
+
+
+def event_in_range(row, start, end):
+    """
+    Function: event_in_range
+    Description: Checks whether a calendar row falls into the half-open window [start, end). A recurring event
+    matches every window after its first occurrence starts, since it may recur there; callers expand it.
+
+    Input:
+        row - A calendar row
+        start, end - datetime objects of the window
+    Output:
+        True if the row is an event inside the window, False otherwise
+    """
+    if len(row) < 4:
+        return False
+    event_start = parse_date(row[2])
+    event_end = parse_date(row[3])
+    if event_start is None or event_end is None:
+        return False
+    if is_recurring(row):
+        return event_start < end
+    return overlaps(event_start, event_end, start, end)
+
+
+def insert_chronological(rows, row):
+    """
+    Function: insert_chronological
+    Description: Inserts an event row before the first event that starts after it. The first row is the header.
+
+    Input:
+        rows - List of calendar rows, header included
+        row - The event row to insert
+    Output: None
+    """
+    start = parse_date(row[2])
+    for position in range(1, len(rows)):
+        current = parse_date(rows[position][2]) if len(rows[position]) > 2 else None
+        if start is not None and current is not None and start < current:
+            rows.insert(position, row)
+            return
+    rows.append(row)
+
+
+def merge_chronological(rows, batch):
+    """
+    Function: merge_chronological
+    Description: Merges a batch of event rows into chronologically ordered calendar rows in one pass. Dated rows
+    end up where insert_chronological would put them one by one, rows without a valid start date go last.
+    The first row is the header.
+
+    Input:
+        rows - List of calendar rows ordered by start date, header included
+        batch - List of event rows to add, in any order
+    Output: None
+    """
+    # Rows without a valid start date go last, after the dated ones, like insert_chronological appends them
+    starts = [parse_date(row[2]) if len(row) > 2 else None for row in batch]
+    dated = sorted((start, position) for position, start in enumerate(starts) if start is not None)
+    pending = [batch[position] for _, position in dated]
+    pending_starts = [start for start, _ in dated]
+    undated = [list(row) for row, start in zip(batch, starts) if start is None]
+
+    merged = rows[:1]
+    next_pending = 0
+    for row in rows[1:]:
+        current = parse_date(row[2]) if len(row) > 2 else None
+        if current is not None:
+            while next_pending < len(pending) and pending_starts[next_pending] < current:
+                merged.append(list(pending[next_pending]))
+                next_pending += 1
+        merged.append(row)
+    merged.extend(list(row) for row in pending[next_pending:])
+    merged.extend(undated)
+    rows[:] = merged
+
+
+def apply_mutation(rows, action, event_id, row=None):
+    """
+    Function: apply_mutation
+    Description: Applies a single event mutation to calendar rows in place. The first row is the header.
+
+    Input:
+        rows - List of calendar rows, header included
+        action - ADD, EDIT or DELETE
+        event_id - ID of the event the mutation targets
+        row - The new event row, unused by DELETE
+    Output:
+        The number of rows added, changed or removed
+    """
+    if action == ADD:
+        insert_chronological(rows, list(row))
+        return 1
+    if action == EDIT:
+        changed = 0
+        for position in range(1, len(rows)):
+            if rows[position][0] == event_id:
+                rows[position] = list(row)
+                changed += 1
+        return changed
+    if action == DELETE:
+        count = len(rows)
+        rows[1:] = [current for current in rows[1:] if current[0] != event_id]
+        return count - len(rows)
+    raise ValueError(f"Unknown event mutation: {action}")
+
+
+def rows_to_csv(rows):
+    """
+    Function: rows_to_csv
+    Description: Serializes rows into csv text in memory.
+
+    Input:
+        rows - List of rows to serialize
+
+    Output:
+        The csv text
+    """
+    buffer = io.StringIO(newline="")
+    csvwriter = csv.writer(buffer)
+    csvwriter.writerows(rows)
+    return buffer.getvalue()
+
+
+def csv_to_rows(text):
+    """
+    Function: csv_to_rows
+    Description: Parses csv text held in memory.
+
+    Input:
+        text - The csv text
+
+    Output:
+        rows - List of rows, empty lines excluded
+    """
+    csvreader = csv.reader(io.StringIO(text, newline=""), delimiter=",")
+    return [row for row in csvreader if len(row) > 0]
+
+
+def write_atomic(filepath, data):
+    """
+    Function: write_atomic
+    Description: Writes bytes to a temporary file next to filepath and renames it into place,
+    so the file on disk is always either the old or the new version and never half written.
+
+    Input:
+        filepath - Filepath to write
+        data - Bytes to write
+
+    Output: None
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(filepath), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def as_fernet(key):
+    """
+    Function: as_fernet
+    Description: Returns a Fernet instance for a key, reusing it if it already is one (see keyring.py).
+
+    Input:
+        key - A Fernet key or Fernet instance
+    Output:
+        The Fernet instance
+    """
+    return key if isinstance(key, Fernet) else Fernet(key)
+
+
+def encrypt_rows(key, filepath, rows):
+    """
+    Function: encrypt_rows
+    Description: Serializes and encrypts rows in memory and writes the ciphertext atomically.
+    Plaintext never touches the disk.
+
+    Input:
+        key - Key to encrypt, or its Fernet instance
+        filepath - Filepath to write
+        rows - List of rows to write
+
+    Output: None
+    """
+    fernet = as_fernet(key)
+    write_atomic(filepath, fernet.encrypt(rows_to_csv(rows).encode("utf-8")))
+
+
+def decrypt_rows(key, filepath):
+    """
+    Function: decrypt_rows
+    Description: Reads the ciphertext once and parses the decrypted csv straight from memory.
+    Plaintext never touches the disk.
+
+    Input:
+        key - Key to decrypt, or its Fernet instance
+        filepath - Filepath to read
+
+    Output:
+        rows - List of rows, empty lines excluded
+    """
+    fernet = as_fernet(key)
+    with open(filepath, "rb") as enc_file:
+        decrypted = fernet.decrypt(enc_file.read()).decode("utf-8")
+    return csv_to_rows(decrypted)
+
+
+class StorageBackend:
+    """
+    Class:
+        StorageBackend
+    Description:
+        Interface every storage backend implements. A user owns two tables of rows, EVENTS and TYPES,
+        each starting with a header row. Event rows are [ID, Name, Start Date, End Date, Priority, Type, Notes, Location].
+        Reading a table that does not exist raises FileNotFoundError.
+    """
+
+    # True when events_between is answered without reading the whole calendar
+    indexed_ranges = False
+
+    def exists(self, user_id, kind):
+        """Returns True if the user's table exists."""
+        raise NotImplementedError
+
+    def read(self, user_id, kind):
+        """Returns every row of the user's table, header included."""
+        raise NotImplementedError
+
+    def write(self, user_id, kind, rows):
+        """Replaces the user's table with the given rows, header included."""
+        raise NotImplementedError
+
+    def events_between(self, user_id, start, end):
+        """Returns the event rows (no header) that fall into the window [start, end), see event_in_range."""
+        return [row for row in self.read(user_id, EVENTS)[1:] if event_in_range(row, start, end)]
+
+    def add_event(self, user_id, row):
+        """Adds one event row in chronological order."""
+        self._mutate(user_id, ADD, row[0], row)
+
+    def add_events(self, user_id, rows):
+        """Adds a batch of event rows in chronological order, reading and writing the calendar once."""
+        calendar = self.read(user_id, EVENTS)
+        merge_chronological(calendar, rows)
+        self.write(user_id, EVENTS, calendar)
+
+    def update_event(self, user_id, event_id, row):
+        """Replaces the rows of the given event ID, returning the number of rows changed."""
+        return self._mutate(user_id, EDIT, event_id, row)
+
+    def delete_event(self, user_id, event_id):
+        """Deletes the rows of the given event ID, returning the number of rows removed."""
+        return self._mutate(user_id, DELETE, event_id)
+
+    def _mutate(self, user_id, action, event_id, row=None):
+        rows = self.read(user_id, EVENTS)
+        count = apply_mutation(rows, action, event_id, row)
+        if count:
+            self.write(user_id, EVENTS, rows)
+        return count
+
+    def clear(self, kind):
+        """Deletes the given table for every user."""
+        raise NotImplementedError
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Class:
+        MemoryBackend
+    Description:
+        Keeps every table in a dictionary. Nothing is written to disk, which makes it suitable for tests.
+        Tables are stored as tuples and replaced whole, so reads take no lock.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def exists(self, user_id, kind):
+        return (kind, user_id) in self._tables
+
+    def read(self, user_id, kind):
+        table = self._tables.get((kind, user_id))
+        if table is None:
+            raise FileNotFoundError(f"No {kind} stored for user {user_id}")
+        return [list(row) for row in table]
+
+    def write(self, user_id, kind, rows):
+        table = tuple(tuple(row) for row in rows if len(row) > 0)
+        with self._lock:
+            self._tables[(kind, user_id)] = table
+
+    def clear(self, kind):
+        with self._lock:
+            for table in [table for table in self._tables if table[0] == kind]:
+                del self._tables[table]
+
+
+class EncryptedCsvBackend(StorageBackend):
+    """
+    Class:
+        EncryptedCsvBackend
+    Description:
+        Stores every user's tables as Fernet encrypted csv files under the data directory. Event types are kept in
+        Type/{user_id}event_types.csv.
+
+        Events are split into one encrypted shard per month, Event/{user_id}/{YYYY-MM}.{generation}.csv, listed in
+        an encrypted manifest, Event/{user_id}/manifest, together with the first start and last end date of each
+        shard. An event spanning several months is stored in the shard of every month it touches, so a date query
+        only decrypts the one or two shards covering its window. Rows without valid dates go to an "undated" shard.
+        Shards are never overwritten: a write creates new shard files, and committing the manifest atomically is
+        what makes them current. Calendars still in the original single file layout, Event/{user_id}.csv, are
+        read as they are and split into shards on their next write.
+
+        Adding, editing or deleting a single event does not rewrite any shard. The mutation is encrypted on
+        its own and appended to Event/{user_id}.journal, and readers replay the journal over the shards.
+        Once a journal grows past max_records records or max_bytes bytes, a background thread folds it into
+        the shards, rewriting only the ones that changed.
+
+        The journal's first line is the SHA-256 of the manifest it applies to, so a journal left behind by an
+        interrupted compaction is recognized as already folded in and ignored.
+
+        Readers never take a lock: they check that the manifest they started from is still the committed one when
+        they finish, and start over otherwise.
+    """
+
+    indexed_ranges = True
+
+    def __init__(self, key_loader, base_dir=None, max_records=JOURNAL_MAX_RECORDS, max_bytes=JOURNAL_MAX_BYTES,
+                 background=True):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new EncryptedCsvBackend
+        Input:
+            key_loader - Function returning the Fernet key (or Fernet instance) of a user, creating it if needed
+            base_dir - Root directory of the files, defaults to data_directory()
+            max_records, max_bytes - Journal size that triggers a compaction
+            background - Compact on a background thread (True) or inline in the writer (False)
+        Output:
+            - A new EncryptedCsvBackend instance
+        """
+        self.key_loader = key_loader
+        self.base_dir = base_dir
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.background = background
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        self._record_counts = {}
+        self._compactions = {}
+
+    def path(self, user_id, kind):
+        """Returns the path of the user's type file, or of the original single file calendar for EVENTS."""
+        base_dir = self.base_dir or data_directory()
+        if kind == EVENTS:
+            return os.path.join(base_dir, "Event", f"{user_id}.csv")
+        return os.path.join(base_dir, "Type", f"{user_id}event_types.csv")
+
+    def shard_directory(self, user_id):
+        """Returns the directory holding the user's event shards and manifest."""
+        return os.path.join(os.path.dirname(self.path(user_id, EVENTS)), str(user_id))
+
+    def manifest_path(self, user_id):
+        """Returns the path of the user's shard manifest."""
+        return os.path.join(self.shard_directory(user_id), "manifest")
+
+    def journal_path(self, user_id):
+        """Returns the path of the user's event journal."""
+        return os.path.join(os.path.dirname(self.path(user_id, EVENTS)), f"{user_id}.journal")
+
+    def exists(self, user_id, kind):
+        if kind == EVENTS and os.path.exists(self.manifest_path(user_id)):
+            return True
+        return os.path.exists(self.path(user_id, kind))
+
+    def read(self, user_id, kind):
+        if kind != EVENTS:
+            # Type files are only ever replaced whole with os.replace, so any open sees a complete version
+            return self._read_file(user_id, self.path(user_id, kind))[0]
+        return self._read_committed(user_id, lambda: self._replay(user_id)[0])
+
+    def events_between(self, user_id, start, end):
+        def load():
+            snapshot = self._read_snapshot(user_id, (start, end))
+            rows = snapshot["rows"]
+            for action, event_id, row in self._journal_records(user_id, snapshot["digest"]):
+                # The journal may move events in or out of the window, only the rows inside it are kept
+                if action != ADD:
+                    apply_mutation(rows, DELETE, event_id)
+                if action != DELETE and event_in_range(row, start, end):
+                    apply_mutation(rows, ADD, event_id, row)
+            return rows
+
+        found = [row for row in self._read_committed(user_id, load)[1:] if event_in_range(row, start, end)]
+        found.sort(key=lambda row: parse_date(row[2]))
+        return found
+
+    def write(self, user_id, kind, rows):
+        if kind != EVENTS:
+            self._write_file(user_id, self.path(user_id, kind), rows)
+            return
+        with self._user_lock(user_id):
+            previous = self._read_manifest(user_id)[0] if os.path.exists(self.manifest_path(user_id)) else None
+            self._write_shards(user_id, rows, previous)
+            self._drop_journal(user_id)
+
+    def add_event(self, user_id, row):
+        self._append(user_id, ADD, row[0], row)
+
+    def add_events(self, user_id, rows):
+        # A batch is merged into the calendar and written as new shards rather than appended to the journal, so
+        # every shard is decrypted and every changed shard encrypted once however large the batch is
+        with self._user_lock(user_id):
+            calendar, _, snapshot = self._replay(user_id, full=True)
+            merge_chronological(calendar, rows)
+            self._write_shards(user_id, calendar, snapshot["manifest"], snapshot["shards"])
+            self._drop_journal(user_id)
+
+    def update_event(self, user_id, event_id, row):
+        self._append(user_id, EDIT, event_id, row)
+
+    def delete_event(self, user_id, event_id):
+        self._append(user_id, DELETE, event_id)
+
+    def compact(self, user_id):
+        """
+        Function:
+            compact
+        Description:
+            Folds the user's event journal into the shards and removes the journal
+        Input:
+            user_id - String representing the Discord ID of the user
+        Output: None
+        """
+        with self._user_lock(user_id):
+            if not os.path.exists(self.journal_path(user_id)):
+                return
+            rows, _, snapshot = self._replay(user_id, full=True)
+            self._write_shards(user_id, rows, snapshot["manifest"], snapshot["shards"])
+            self._drop_journal(user_id)
+
+    def wait_for_compaction(self):
+        """
+        Function:
+            wait_for_compaction
+        Description:
+            Blocks until every background compaction started so far has finished
+        Input: None
+        Output: None
+        """
+        with self._lock:
+            threads = list(self._compactions.values())
+        for thread in threads:
+            thread.join()
+
+    def clear(self, kind):
+        with self._lock:
+            self._record_counts.clear()
+        directory = os.path.dirname(self.path("", kind))
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                filepath = os.path.join(directory, filename)
+                if os.path.isdir(filepath):
+                    shutil.rmtree(filepath)
+                else:
+                    os.remove(filepath)
+
+    def _snapshot_version(self, user_id):
+        # Identifies the committed snapshot: os.replace gives every new manifest (or old layout file) a new inode
+        for filepath in (self.manifest_path(user_id), self.path(user_id, EVENTS)):
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            return filepath, stat.st_ino, stat.st_mtime_ns, stat.st_size
+        return None
+
+    def _read_committed(self, user_id, load):
+        # Reads without locking. Shards and the journal are only replaced or removed after a new manifest is
+        # committed, so a read that saw the same manifest before and after it ran is consistent. A read that
+        # overlapped a commit is retried, and falls back to the writers' lock if commits keep coming.
+        for _ in range(READ_ATTEMPTS):
+            version = self._snapshot_version(user_id)
+            try:
+                result = load()
+            except (FileNotFoundError, InvalidToken):
+                if self._snapshot_version(user_id) == version:
+                    raise
+                continue
+            if self._snapshot_version(user_id) == version:
+                return result
+        with self._user_lock(user_id):
+            return load()
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.RLock())
+
+    def _read_file(self, user_id, filepath):
+        # Returns the decrypted rows of a file and the SHA-256 of its ciphertext
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(filepath)
+        with open(filepath, "rb") as enc_file:
+            ciphertext = enc_file.read()
+        decrypted = as_fernet(self.key_loader(user_id)).decrypt(ciphertext).decode("utf-8")
+        return csv_to_rows(decrypted), hashlib.sha256(ciphertext).hexdigest()
+
+    def _write_file(self, user_id, filepath, rows):
+        Path(os.path.dirname(filepath)).mkdir(parents=True, exist_ok=True)
+        encrypt_rows(self.key_loader(user_id), filepath, rows)
+
+    def _read_manifest(self, user_id):
+        with open(self.manifest_path(user_id), "rb") as enc_file:
+            ciphertext = enc_file.read()
+        manifest = json.loads(as_fernet(self.key_loader(user_id)).decrypt(ciphertext).decode("utf-8"))
+        return manifest, hashlib.sha256(ciphertext).hexdigest()
+
+    def _read_snapshot(self, user_id, window=None):
+        # Returns the header and event rows of the committed shards (only the shards covering the window if one is
+        # given), the rows of each shard read, the manifest and its digest
+        if not os.path.exists(self.manifest_path(user_id)):
+            rows, digest = self._read_file(user_id, self.path(user_id, EVENTS))
+            return {"rows": rows, "shards": None, "manifest": None, "digest": digest}
+
+        manifest, digest = self._read_manifest(user_id)
+        months = sorted(month for month in manifest["shards"] if month not in (UNDATED, RECURRING))
+        if window is not None:
+            start, end = window
+            wanted = set(months_between(start, end))
+            months = [month for month in months if month in wanted
+                      and manifest["shards"][month]["start"] < end.strftime(DATE_FORMAT)
+                      and manifest["shards"][month]["end"] >= start.strftime(DATE_FORMAT)]
+        elif UNDATED in manifest["shards"]:
+            months.append(UNDATED)
+        if RECURRING in manifest["shards"]:
+            # Recurring events may recur in any window. Like undated events, they are read after the dated ones
+            months.append(RECURRING)
+
+        rows = [list(manifest["header"])]
+        shards = {}
+        first_month = months[0] if months else None
+        for month in months:
+            shards[month] = self._read_file(user_id, os.path.join(self.shard_directory(user_id),
+                                                                  manifest["shards"][month]["file"]))[0]
+            for row in shards[month]:
+                # An event spanning several months is taken from the first shard read that holds it
+                touched = event_months(row)
+                if month in (UNDATED, RECURRING) or month == max(touched[0], first_month):
+                    rows.append(row)
+        return {"rows": rows, "shards": shards, "manifest": manifest, "digest": digest}
+
+    def _write_shards(self, user_id, rows, previous=None, previous_shards=None):
+        rows = [row for row in rows if len(row) > 0]
+        partitioned = {}
+        for row in rows[1:]:
+            for month in event_months(row):
+                partitioned.setdefault(month, []).append(row)
+
+        generation = previous["generation"] + 1 if previous else 1
+        directory = self.shard_directory(user_id)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        shards = {}
+        for month, shard_rows in partitioned.items():
+            if previous_shards is not None and previous_shards.get(month) == shard_rows:
+                # Unchanged since the last write, the committed file is kept as it is
+                shards[month] = previous["shards"][month]
+                continue
+            filename = f"{month}.{generation}.csv"
+            self._write_file(user_id, os.path.join(directory, filename), shard_rows)
+            dated = [parse_date(row[2]) for row in shard_rows], [parse_date(row[3]) for row in shard_rows]
+            ranged = month not in (UNDATED, RECURRING)
+            shards[month] = {
+                "file": filename,
+                "count": len(shard_rows),
+                "start": min(dated[0]).strftime(DATE_FORMAT) if ranged else "",
+                "end": max(dated[1]).strftime(DATE_FORMAT) if ranged else "",
+            }
+
+        manifest = {"generation": generation, "header": rows[0] if rows else [], "shards": shards}
+        write_atomic(self.manifest_path(user_id),
+                     as_fernet(self.key_loader(user_id)).encrypt(json.dumps(manifest).encode("utf-8")))
+
+        # The new manifest is committed, shard files it doesn't list are no longer needed
+        current = {shard["file"] for shard in shards.values()} | {"manifest"}
+        for filename in os.listdir(directory):
+            if filename not in current and not filename.startswith("."):
+                os.remove(os.path.join(directory, filename))
+        if os.path.exists(self.path(user_id, EVENTS)):
+            os.remove(self.path(user_id, EVENTS))
+
+    def _journal_records(self, user_id, digest):
+        # Returns the decrypted journal records, or none if the journal was written against another snapshot
+        journal_path = self.journal_path(user_id)
+        if not os.path.exists(journal_path):
+            return []
+        with open(journal_path, "rb") as journal:
+            lines = journal.read().splitlines()
+        if not lines or lines[0].decode("ascii", "replace") != digest:
+            return []
+        fernet = as_fernet(self.key_loader(user_id))
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(fernet.decrypt(line).decode("utf-8")))
+            except Exception:
+                # A record cut short by a crash can only be the last one, and it was never acknowledged
+                break
+        return records
+
+    def _replay(self, user_id, full=False):
+        # Returns every row with the journal applied and the number of journal records replayed,
+        # plus the snapshot read when full is set
+        snapshot = self._read_snapshot(user_id)
+        rows = [list(row) for row in snapshot["rows"]]
+        records = self._journal_records(user_id, snapshot["digest"])
+        for action, event_id, row in records:
+            apply_mutation(rows, action, event_id, row)
+        if full:
+            return rows, len(records), snapshot
+        return rows, len(records)
+
+    def _append(self, user_id, action, event_id, row=None):
+        record = as_fernet(self.key_loader(user_id)).encrypt(json.dumps([action, event_id, row]).encode("utf-8"))
+        journal_path = self.journal_path(user_id)
+        with self._user_lock(user_id):
+            if user_id not in self._record_counts:
+                self._record_counts[user_id] = self._open_journal(user_id)
+            with open(journal_path, "ab") as journal:
+                journal.write(record + b"\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+                size = journal.tell()
+            self._record_counts[user_id] += 1
+            if self._record_counts[user_id] >= self.max_records or size >= self.max_bytes:
+                self._schedule_compaction(user_id)
+
+    def _current_digest(self, user_id):
+        if os.path.exists(self.manifest_path(user_id)):
+            return self._read_manifest(user_id)[1]
+        # The journal must extend an existing calendar, like a calendar file had to exist before
+        return self._read_file(user_id, self.path(user_id, EVENTS))[1]
+
+    def _open_journal(self, user_id):
+        # Makes sure the journal extends the current snapshot, returning the number of records it holds
+        digest = self._current_digest(user_id)
+        journal_path = self.journal_path(user_id)
+        if os.path.exists(journal_path):
+            with open(journal_path, "rb") as journal:
+                header = journal.readline().strip()
+            if header.decode("ascii", "replace") == digest:
+                return len(self._journal_records(user_id, digest))
+        Path(os.path.dirname(journal_path)).mkdir(parents=True, exist_ok=True)
+        with open(journal_path, "wb") as journal:
+            journal.write(digest.encode("ascii") + b"\n")
+        return 0
+
+    def _drop_journal(self, user_id):
+        journal_path = self.journal_path(user_id)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self._record_counts.pop(user_id, None)
+
+    def _schedule_compaction(self, user_id):
+        if not self.background:
+            self.compact(user_id)
+            return
+        with self._lock:
+            running = self._compactions.get(user_id)
+            if running is not None and running.is_alive():
+                return
+            thread = threading.Thread(target=self._compact_quietly, args=(user_id,), daemon=True)
+            self._compactions[user_id] = thread
+        thread.start()
+
+    def _compact_quietly(self, user_id):
+        try:
+            self.compact(user_id)
+        except Exception as e:
+            # The journal is left in place and replayed, so a failed compaction loses nothing
+            logger.error(f"Failed to compact the event journal of {user_id}: {e}")
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Class:
+        SQLiteBackend
+    Description:
+        Stores every row in a single SQLite database. Event start and end dates and IDs are kept in indexed
+        columns so range queries and single event edits only touch the rows involved, while the row itself
+        is stored as a Fernet encrypted payload.
+    """
+
+    indexed_ranges = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS headers (
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (user_id, kind)
+        );
+        CREATE TABLE IF NOT EXISTS rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            event_id TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            payload BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS rows_start ON rows (user_id, kind, start_time);
+        CREATE INDEX IF NOT EXISTS rows_end ON rows (user_id, kind, end_time);
+        CREATE INDEX IF NOT EXISTS rows_event ON rows (user_id, kind, event_id);
+    """
+
+    def __init__(self, key_loader, path=None):
+        """
+        Function:
+            __init__
+        Description:
+            Creates a new SQLiteBackend
+        Input:
+            key_loader - Function returning the Fernet key (or Fernet instance) of a user, creating it if needed
+            path - Path of the database file, defaults to schedulebot.db in data_directory(). ":memory:" is allowed.
+        Output:
+            - A new SQLiteBackend instance
+        """
+        self.key_loader = key_loader
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+
+    def _database(self):
+        return self.path or os.path.join(data_directory(), "schedulebot.db")
+
+    def _connect(self):
+        # The connection every write goes through, always used under the lock
+        if self._conn is None:
+            path = self._database()
+            if path != ":memory:":
+                Path(os.path.dirname(os.path.abspath(path))).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            if path != ":memory:":
+                # Readers see the last committed transaction without waiting for a running write
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    @contextlib.contextmanager
+    def _reading(self):
+        # Yields a connection for a consistent read. File databases give every thread its own connection in a
+        # read transaction, so reads take no lock. An in-memory database only has the one shared connection.
+        if self._database() == ":memory:":
+            with self._lock:
+                yield self._connect()
+            return
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            with self._lock:
+                self._connect()
+            conn = sqlite3.connect(self._database(), check_same_thread=False, isolation_level=None)
+            self._readers.conn = conn
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def _encrypt(self, fernet, row):
+        return fernet.encrypt(rows_to_csv([row]).encode("utf-8"))
+
+    def _decrypt(self, fernet, payload):
+        rows = csv_to_rows(fernet.decrypt(payload).decode("utf-8"))
+        return rows[0] if rows else []
+
+    def _columns(self, kind, row):
+        # Only event rows carry an ID and dates worth indexing
+        if kind != EVENTS or len(row) < 4:
+            return None, None, None
+        if is_recurring(row):
+            return row[0], row[2], RECURRING_END
+        return row[0], row[2], row[3]
+
+    def exists(self, user_id, kind):
+        with self._reading() as conn:
+            found = conn.execute(
+                "SELECT 1 FROM headers WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()
+        return found is not None
+
+    def read(self, user_id, kind):
+        fernet = as_fernet(self.key_loader(user_id))
+        with self._reading() as conn:
+            header = conn.execute(
+                "SELECT payload FROM headers WHERE user_id = ? AND kind = ?", (user_id, kind)
+            ).fetchone()
+            if header is None:
+                raise FileNotFoundError(f"No {kind} stored for user {user_id}")
+            payloads = conn.execute(
+                "SELECT payload FROM rows WHERE user_id = ? AND kind = ? ORDER BY start_time, position, id",
+                (user_id, kind),
+            ).fetchall()
+        return [self._decrypt(fernet, header[0])] + [self._decrypt(fernet, payload) for (payload,) in payloads]
+
+    def write(self, user_id, kind, rows):
+        fernet = as_fernet(self.key_loader(user_id))
+        rows = [row for row in rows if len(row) > 0]
+        header = rows[0] if rows else []
+        values = [
+            (user_id, kind, position) + self._columns(kind, row) + (self._encrypt(fernet, row),)
+            for position, row in enumerate(rows[1:], start=1)
+        ]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM rows WHERE user_id = ? AND kind = ?", (user_id, kind))
+                conn.execute(
+                    "INSERT OR REPLACE INTO headers (user_id, kind, payload) VALUES (?, ?, ?)",
+                    (user_id, kind, self._encrypt(fernet, header)),
+                )
+                conn.executemany(
+                    "INSERT INTO rows (user_id, kind, position, event_id, start_time, end_time, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    values,
+                )
+
+    def events_between(self, user_id, start, end):
+        fernet = as_fernet(self.key_loader(user_id))
+        with self._reading() as conn:
+            # Dates are stored as YYYY-MM-DD HH:MM:SS, so string comparison follows the calendar
+            payloads = conn.execute(
+                "SELECT payload FROM rows WHERE user_id = ? AND kind = ? AND start_time < ? AND end_time >= ? "
+                "ORDER BY start_time, position, id",
+                (user_id, EVENTS, end.strftime(DATE_FORMAT), start.strftime(DATE_FORMAT)),
+            ).fetchall()
+        rows = [self._decrypt(fernet, payload) for (payload,) in payloads]
+        return [row for row in rows if event_in_range(row, start, end)]
+
+    def add_event(self, user_id, row):
+        fernet = as_fernet(self.key_loader(user_id))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                position = conn.execute(
+                    "SELECT COALESCE(MAX(position), 0) + 1 FROM rows WHERE user_id = ? AND kind = ?",
+                    (user_id, EVENTS),
+                ).fetchone()[0]
+                conn.execute(
+                    "INSERT INTO rows (user_id, kind, position, event_id, start_time, end_time, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user_id, EVENTS, position) + self._columns(EVENTS, row) + (self._encrypt(fernet, row),),
+                )
+
+    def add_events(self, user_id, rows):
+        # The whole batch is inserted in one transaction
+        fernet = as_fernet(self.key_loader(user_id))
+        encrypted = [self._columns(EVENTS, row) + (self._encrypt(fernet, row),) for row in rows]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                position = conn.execute(
+                    "SELECT COALESCE(MAX(position), 0) + 1 FROM rows WHERE user_id = ? AND kind = ?",
+                    (user_id, EVENTS),
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO rows (user_id, kind, position, event_id, start_time, end_time, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(user_id, EVENTS, position + offset) + values for offset, values in enumerate(encrypted)],
+                )
+
+    def update_event(self, user_id, event_id, row):
+        fernet = as_fernet(self.key_loader(user_id))
+        _, start_time, end_time = self._columns(EVENTS, row)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE rows SET start_time = ?, end_time = ?, payload = ? "
+                    "WHERE user_id = ? AND kind = ? AND event_id = ?",
+                    (start_time, end_time, self._encrypt(fernet, row), user_id, EVENTS, event_id),
+                )
+        return cursor.rowcount
+
+    def delete_event(self, user_id, event_id):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM rows WHERE user_id = ? AND kind = ? AND event_id = ?", (user_id, EVENTS, event_id)
+                )
+        return cursor.rowcount
+
+    def clear(self, kind):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM rows WHERE kind = ?", (kind,))
+                conn.execute("DELETE FROM headers WHERE kind = ?", (kind,))
+
+
+def create_backend(name, key_loader):
+    """
+    Function: create_backend
+    Description: Builds the storage backend with the given name.
+
+    Input:
+        name - "csv", "sqlite" or "memory"
+        key_loader - Function returning the Fernet key (or Fernet instance) of a user, creating it if needed
+    Output:
+        The storage backend
+    """
+    if name == "sqlite":
+        return SQLiteBackend(key_loader)
+    if name == "memory":
+        return MemoryBackend()
+    if name == "csv":
+        return EncryptedCsvBackend(key_loader)
+    raise ValueError(f"Unknown storage backend: {name}")
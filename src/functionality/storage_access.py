@@ -0,0 +1,64 @@
+# functionality/storage_access.py
+
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of threads running blocking storage work (file I/O, Fernet, csv parsing) for every user together
+STORAGE_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="schedulebot-storage")
+
+# A lock only lives as long as a command holds or waits on it
+_user_locks = weakref.WeakValueDictionary()
+
+
+def user_lock(user_id):
+    """
+    Function: user_lock
+    Description: Returns the asyncio lock serializing the storage mutations of one user.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+    Output:
+        The user's asyncio.Lock
+    """
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _user_locks[user_id] = lock
+    return lock
+
+
+async def run_storage(func, *args, **kwargs):
+    """
+    Function: run_storage
+    Description: Runs blocking storage work on the storage thread pool, so the event loop keeps serving
+    other commands while it waits. Used for reads, which need no lock.
+
+    Input:
+        func - The blocking function
+        args, kwargs - Its arguments
+    Output:
+        What func returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_locked(user_id, func, *args, **kwargs):
+    """
+    Function: run_locked
+    Description: Runs blocking storage work that changes a user's data on the storage thread pool, after
+    every earlier mutation of the same user has finished. Other users are not held up.
+
+    Input:
+        user_id - String representing the Discord ID of the user
+        func - The blocking function
+        args, kwargs - Its arguments
+    Output:
+        What func returns
+    """
+    async with user_lock(user_id):
+        return await run_storage(func, *args, **kwargs)
@@ -1,10 +1,11 @@
 import requests
 import datetime
+import os
 
-BASE_URL = "https://api.openweathermap.org/data/2.5/forecast?"
+# Base URL of the OpenWeather API, overridable to run against fake_services
+WEATHER_API_URL = os.environ.get("SCHEDULEBOT_WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/")
 
 # f = open("src/apifile.txt", "r")
-import os
 file_path = os.path.join(os.path.dirname(__file__), 'apifile.txt')
 f = open(file_path, "r")
 
@@ -14,7 +15,7 @@ def getWeatherData(latlng, date):
     # Convert date to datetime object for comparison
     target_date = datetime.datetime.strptime(date, "%Y-%m-%d").date()
 
-    url = f'{BASE_URL}lat={latlng[0]}&lon={latlng[1]}&appid={API_KEY}'
+    url = f'{WEATHER_API_URL}forecast?lat={latlng[0]}&lon={latlng[1]}&appid={API_KEY}'
 
     response = requests.get(url).json()
 
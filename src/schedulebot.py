@@ -2,7 +2,6 @@ import discord  # type: ignore
 from discord.ext import commands  # type: ignore
 import os
 import sys
-import shutil
 import aiohttp
 import json
 import asyncio
@@ -10,29 +9,38 @@ import traceback
 import logging
 from discord.ui import Button, View
 import requests
+from googleapiclient.errors import HttpError
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "./")))
-from functionality.recommend_event import recommend_event
-from functionality.AddEvent import add_event  # type: ignore
-from functionality.highlights import get_highlight
-from functionality.create_event_type import create_event_type
-from functionality.FindAvailableTime import find_avaialbleTime
-from functionality.delete_event_type import delete_event_type
-from functionality.DisplayFreeTime import get_free_time
-from functionality.export_file import export_file
-from functionality.import_file import import_file
-from functionality.Google import connect_google
-from functionality.GoogleEvent import get_events
-from functionality.Delete_Event import delete_event
-from functionality.Edit_event import edit_event
-from functionality.shared_functions import (
-        add_event_to_file_main,
-        fetch_google_events,
-        parse_google_event,
+# The functionality modules import each other through the src package, so the bot does the same
+# to make sure every command shares one copy of each module (and of the calendar cache)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.recommend_event import recommend_event
+from src.functionality.AddEvent import add_event  # type: ignore
+from src.functionality.highlights import get_highlight
+from src.functionality.create_event_type import create_event_type
+from src.functionality.FindAvailableTime import find_avaialbleTime
+from src.functionality.delete_event_type import delete_event_type
+from src.functionality.DisplayFreeTime import get_free_time, send_lines
+from src.functionality.meet import meet as find_meeting_time
+from src.functionality.export_file import export_file
+from src.functionality.import_file import import_file
+from src.functionality.Google import connect_google
+from src.functionality.google_access import execute
+from src.functionality.google_sync import sync_google_events
+from src.functionality.GoogleEvent import get_events
+from src.functionality.Delete_Event import delete_event
+from src.functionality.Edit_event import edit_event
+from src.functionality.shared_functions import (
         check_passkey,
         create_event_tree,
-        read_event_file,
+        format_event_history,
+        get_user_event_history,
+        get_user_upcoming_events,
+        repository,
     )
+from src.functionality.storage import EVENTS
+from src.functionality.storage_access import run_storage
 from config import GOOGLE_API_KEY, CLEAR_DATA_PASSKEY
 
 # Configure logging
@@ -55,8 +63,10 @@ error_handler.setFormatter(formatter)
 logger.addHandler(debug_handler)
 logger.addHandler(error_handler)
 
+# Base URL of the Gemini API, overridable to run against fake_services
+GEMINI_API_URL = os.environ.get("SCHEDULEBOT_GEMINI_API_URL", "https://generativelanguage.googleapis.com/")
 # API URL with the key appended as a query parameter
-GOOGLE_AI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={GOOGLE_API_KEY}"
+GOOGLE_AI_URL = f"{GEMINI_API_URL}v1beta/models/gemini-1.5-flash-latest:generateContent?key={GOOGLE_API_KEY}"
 
 # Initialize the bot with appropriate intents
 intents = discord.Intents.default()
@@ -112,7 +122,7 @@ async def delete_event_from_server(event_to_delete, ctx, bot_instance):
             return False
 
         # Delete the event from Google Calendar
-        service.events().delete(calendarId='primary', eventId=event_to_delete['id']).execute()
+        await execute(str(ctx.author.id), service.events().delete(calendarId='primary', eventId=event_to_delete['id']))
         logger.info(f"Event '{event_to_delete['name']}' deleted from Google Calendar.")
 
         # Delete the event from local storage
@@ -203,13 +213,13 @@ async def update_event_in_local_storage(user_id, old_event, new_event_details):
         logger.error(f"Error updating event in local storage: {e}", exc_info=True)
         return False
 
-async def update_event_in_google_calendar(service, old_event, new_event_details):
+async def update_event_in_google_calendar(service, old_event, new_event_details, user_id):
     """
     Updates the event in Google Calendar.
     """
     try:
         # Fetch the event from Google Calendar
-        event = service.events().get(calendarId='primary', eventId=old_event['id']).execute()
+        event = await execute(user_id, service.events().get(calendarId='primary', eventId=old_event['id']))
 
         # Update fields
         if 'name' in new_event_details:
@@ -220,7 +230,7 @@ async def update_event_in_google_calendar(service, old_event, new_event_details)
             event['end']['dateTime'] = new_event_details['endDateTime']
 
         # Update the event in Google Calendar
-        updated_event = service.events().update(calendarId='primary', eventId=event['id'], body=event).execute()
+        updated_event = await execute(user_id, service.events().update(calendarId='primary', eventId=event['id'], body=event))
 
         return True
     except Exception as e:
@@ -228,41 +238,6 @@ async def update_event_in_google_calendar(service, old_event, new_event_details)
         logger.error(f"Error updating event in Google Calendar: {e}", exc_info=True)
         return False
 
-def get_user_event_history(user_id):
-    """
-    Retrieves the event history for a user.
-    """
-    try:
-        events_file = f'data/{user_id}_events.json'
-        if not os.path.exists(events_file):
-            return []
-
-        with open(events_file, 'r') as f:
-            events = json.load(f)
-
-        return events
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"Error retrieving event history for user {user_id}: {e}", exc_info=True)
-        return []
-
-def format_event_history(events):
-    """
-    Formats the event history for display.
-    """
-    try:
-        if not events:
-            return "You have no event history."
-
-        formatted = "📜 **Your Event History:**\n"
-        for idx, event in enumerate(events, start=1):
-            formatted += f"{idx}. **{event['name']}** from {event['startDateTime']} to {event['endDateTime']}\n"
-        return formatted
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"Error formatting event history: {e}", exc_info=True)
-        return "An error occurred while formatting your event history."
-
 # ----------------------- Command Definitions -----------------------
 
 @bot.command()
@@ -272,9 +247,11 @@ async def history(ctx):
     """
     try:
         user_id = str(ctx.author.id)
-        events = get_user_event_history(user_id)
-        formatted_history = format_event_history(events)
-        await ctx.send(formatted_history)
+        await run_storage(create_event_tree, user_id)
+        # Past and upcoming events are split by vectorized masks over the calendar's EventTable
+        events = await run_storage(get_user_event_history, user_id)
+        upcoming = await run_storage(get_user_upcoming_events, user_id)
+        await send_lines(ctx, format_event_history(events, len(upcoming)))
     except Exception as e:
         traceback.print_exc()
         logger.error(f"Error in history command: {e}", exc_info=True)
@@ -284,7 +261,8 @@ async def history(ctx):
 # @commands.is_owner()  # Only the bot owner can use this command
 async def syncEvents(ctx, passkey: str):
     """
-    Synchronizes the next 10 Google Calendar events to local storage after verifying the passkey.
+    Synchronizes Google Calendar events to local storage after verifying the passkey. After the first sync only
+    the changes made since the previous one are fetched.
     Usage: !syncEvents <passkey>
     """
     print("check:", passkey, CLEAR_DATA_PASSKEY)
@@ -294,7 +272,7 @@ async def syncEvents(ctx, passkey: str):
         return
 
     # Send a confirmation prompt
-    await ctx.send("⚠️ **WARNING**: This action will synchronize the next 10 Google Calendar events to local storage. Type `CONFIRM` to proceed.")
+    await ctx.send("⚠️ **WARNING**: This action will synchronize your Google Calendar events to local storage. Type `CONFIRM` to proceed.")
 
     def check(m):
         return m.author == ctx.author and m.channel == ctx.channel
@@ -310,49 +288,30 @@ async def syncEvents(ctx, passkey: str):
 
     user_id = str(ctx.author.id)
 
-    # Fetch events from Google Calendar
-    events, error = await fetch_google_events(ctx, max_results=10)
-    if error:
-        await ctx.send(error)
-        return
-
-    if not events:
-        await ctx.send("No upcoming events found in Google Calendar.")
-        logger.info(f"No events found in Google Calendar for {ctx.author} (ID: {ctx.author.id})")
+    service = await connect_google(ctx)
+    if service is None:
+        await ctx.send("Failed to connect to Google Calendar. Please try connecting again using `!ConnectGoogle`.")
         return
 
     # Ensure the event directory exists
-    create_event_tree(user_id)
-
-    # Read existing events from local storage
-    local_events = read_event_file(user_id)
-    local_event_ids = set()
-    if len(local_events) > 1:
-        for row in local_events[1:]:
-            local_event_ids.add(row[0])  # Assuming the first column is event_id
-
-    # Initialize a counter for new events added
-    new_events_count = 0
-
-    for event in events:
-        event_id = event.get('id')
-        if event_id in local_event_ids:
-            # Skip events already in local storage
-            continue
+    await run_storage(create_event_tree, user_id)
 
-        try:
-            # Parse the Google event into local format
-            local_event = parse_google_event(event)
-
-            # Add event to local storage
-            add_event_to_file_main(user_id, local_event)
-            new_events_count += 1
-        except Exception as e:
-            logger.error(f"Error processing event {event_id}: {e}", exc_info=True)
-            continue  # Skip this event
+    # Only the changes since the last sync are fetched and applied with a single write
+    try:
+        added, updated, removed = await sync_google_events(user_id, service)
+    except asyncio.TimeoutError:
+        logger.error(f"Google Calendar did not answer in time while synchronizing for {ctx.author} (ID: {ctx.author.id})")
+        await ctx.send("Google Calendar took too long to respond. Please try synchronizing again.")
+        return
+    except HttpError as e:
+        logger.error(f"Error synchronizing Google Calendar for {ctx.author} (ID: {ctx.author.id}): {e}", exc_info=True)
+        await ctx.send("An error occurred while fetching your Google Calendar events.")
+        return
 
-    await ctx.send(f"✅ Successfully synchronized {new_events_count} new event(s) from Google Calendar to local storage.")
-    logger.info(f"Synchronized {new_events_count} events for {ctx.author} (ID: {ctx.author.id})")
+    await ctx.send(f"✅ Successfully synchronized Google Calendar to local storage: {added} new, {updated} updated "
+                   f"and {removed} removed event(s).")
+    logger.info(f"Synchronized {added} new, {updated} updated and {removed} removed events for {ctx.author} "
+                f"(ID: {ctx.author.id})")
 
 @bot.group(invoke_without_command=True)
 async def help(ctx):
@@ -378,7 +337,12 @@ async def send_help_embed(ctx):
     em.add_field(name="!help", value="Displays all commands and their descriptions", inline=False)
     em.add_field(name="!schedule", value="Creates an event", inline=False)
     em.add_field(name="!ConnectGoogle", value="Connect to Google Calendar", inline=False)
-    em.add_field(name="!freetime", value="Displays when you are available today", inline=False)
+    em.add_field(name="!freetime [week | start [end]]", value=(
+        "Displays when you are available today, this week or from start to end (mm/dd/yy)"
+    ), inline=False)
+    em.add_field(name="!meet @user... [length] [week | start [end]]", value=(
+        "Finds times you and the mentioned users are all free, e.g. !meet @a @b 1h week"
+    ), inline=False)
     em.add_field(name="!day", value=(
         "Shows everything on your schedule for a specific date.\n"
         "Format:\n"
@@ -389,8 +353,12 @@ async def send_help_embed(ctx):
     ), inline=False)
     em.add_field(name="!typecreate", value="Creates a new event type", inline=True)
     em.add_field(name="!typedelete", value="Deletes an event type", inline=True)
-    em.add_field(name="!exportfile", value="Exports a CSV file of your events", inline=False)
-    em.add_field(name="!importfile", value="Import events from a CSV or ICS file", inline=False)
+    em.add_field(name="!exportfile [csv|ics|jsonl] [start] [end]", value=(
+        "Exports a file of your events, optionally only the days from start to end (mm/dd/yy)"
+    ), inline=False)
+    em.add_field(name="!importfile [push]", value=(
+        "Import events from a CSV or ICS file, push also adds them to your Google Calendar"
+    ), inline=False)
     em.add_field(name="!GoogleEvents", value="Import next 10 events from Google Calendar", inline=False)
     em.add_field(name="!deleteEvent", value="Deletes selected event", inline=False)
     em.add_field(name="!editEvent", value="Edits selected event", inline=False)
@@ -577,24 +545,31 @@ async def day(ctx, arg):
         await ctx.send("Sorry, an error occurred while retrieving events for the specified day.")
 
 @bot.command()
-async def exportfile(ctx):
+async def exportfile(ctx, *args):
     """
-    Sends the user a CSV file containing their scheduled events.
+    Sends the user a file containing their scheduled events.
+
+    Parameters:
+        args: Optional format (csv, ics or jsonl) and one or two mm/dd/yy dates limiting the exported days.
     """
     try:
-        await export_file(ctx)
+        await export_file(ctx, *args)
     except Exception as e:
         traceback.print_exc()
         logger.error(f"Error in exportfile command: {e}", exc_info=True)
         await ctx.send("Sorry, an error occurred while exporting your events.")
 
 @bot.command()
-async def importfile(ctx):
+async def importfile(ctx, option=None):
     """
     Reads a CSV or ICS file containing events submitted by the user and adds those events.
+    With "push", the events are also added to the user's Google Calendar.
     """
+    if option is not None and option.lower() != "push":
+        await ctx.send("Usage: !importfile [push]")
+        return
     try:
-        await import_file(ctx, bot)
+        await import_file(ctx, bot, push=option is not None)
     except Exception as e:
         traceback.print_exc()
         logger.error(f"Error in importfile command: {e}", exc_info=True)
@@ -681,27 +656,11 @@ async def clearData(ctx, passkey: str):
         await ctx.send("⏳ Operation timed out. Please try again.")
         return
 
-    # Proceed to delete the Event Data Directory
-    event_data_directory = os.path.expanduser('~/Documents/ScheduleBot/Event/')
-
+    # Proceed to delete every user's events from storage (and from the in-memory cache)
     try:
-        if os.path.exists(event_data_directory):
-            # Delete all files in the directory
-            for filename in os.listdir(event_data_directory):
-                file_path = os.path.join(event_data_directory, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {e}")
-                    await ctx.send(f"❌ Failed to delete {filename}.")
-            await ctx.send("✅ All event data has been deleted successfully.")
-            logger.info(f"Event data cleared by {ctx.author} (ID: {ctx.author.id})")
-        else:
-            await ctx.send("ℹ️ Event data directory does not exist.")
-            logger.info(f"Event data directory does not exist when {ctx.author} attempted to clear data.")
+        await run_storage(repository.clear, EVENTS)
+        await ctx.send("✅ All event data has been deleted successfully.")
+        logger.info(f"Event data cleared by {ctx.author} (ID: {ctx.author.id})")
     except Exception as e:
         logger.error(f"An error occurred while deleting event data: {e}")
         await ctx.send(f"❌ An error occurred while deleting event data: {e}")
@@ -742,7 +701,8 @@ async def ConnectGoogle(ctx):
     Connects the user to Google Calendar.
     """
     try:
-        await connect_google(ctx)
+        if await connect_google(ctx) is not None:
+            await ctx.send("You are connected to Google Calendar.")
     except Exception as e:
         traceback.print_exc()
         logger.error(f"Error in ConnectGoogle command: {e}", exc_info=True)
@@ -778,17 +738,29 @@ async def recommend(ctx, *, mood: str):
         await ctx.send("Sorry, an error occurred while generating recommendations based on your mood.")
 
 @bot.command()
-async def freetime(ctx):
+async def freetime(ctx, *args):
     """
-    Shows the user's free time today according to registered events.
+    Shows the user's free time today, this week ("week") or in a range of mm/dd/yy dates according to registered events.
     """
     try:
-        await get_free_time(ctx, bot)
+        await get_free_time(ctx, bot, *args)
     except Exception as e:
         traceback.print_exc()
         logger.error(f"Error in freetime command: {e}", exc_info=True)
         await ctx.send("Sorry, an error occurred while retrieving your free time.")
 
+@bot.command()
+async def meet(ctx, *args):
+    """
+    Finds the times the author and every mentioned user are free together, preferred times first, e.g. !meet @a @b 1h week
+    """
+    try:
+        await find_meeting_time(ctx, *args)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error in meet command: {e}", exc_info=True)
+        await ctx.send("Sorry, an error occurred while looking for a meeting time.")
+
 # ----------------------- Main Execution -----------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,22 @@
+# Keeps the test suite out of the real ~/Documents/ScheduleBot directory
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+# Set before any test module imports the bot, so every calendar, type and key file lands in a throwaway directory
+TEST_HOME = tempfile.mkdtemp(prefix="schedulebot-test-")
+os.environ["SCHEDULEBOT_HOME"] = TEST_HOME
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schedulebot_home():
+    yield TEST_HOME
+    from src.functionality.shared_functions import repository
+
+    repository.invalidate()
+    shutil.rmtree(TEST_HOME, ignore_errors=True)
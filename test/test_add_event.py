@@ -70,3 +70,32 @@ def test_check():
     assert not check_complete(**check_variables2())
     assert check_complete(**check_variables3())
     assert check_complete(**check_variables4())
+
+
+def test_add_event_saves_locally(monkeypatch):
+    import src.functionality.AddEvent as AddEvent
+    from unittest.mock import AsyncMock, MagicMock
+    from src.functionality import shared_functions
+    from src.functionality.storage import EVENTS, MemoryBackend
+
+    ctx = MagicMock()
+    ctx.author.id = "add-event-user"
+    channel = AsyncMock()
+    ctx.author.create_dm = AsyncMock(return_value=channel)
+    answers = ["Standup", "10/20/26 10:00 am 10/20/26 10:30 am", "3", "Meeting",
+               "9:00 am 5:00 pm", "None", "done"]
+    client = MagicMock()
+    client.wait_for = AsyncMock(side_effect=[MagicMock(content=answer) for answer in answers])
+    monkeypatch.setattr(AddEvent, "google_service", AsyncMock(return_value=MagicMock()))
+    monkeypatch.setattr(AddEvent, "execute", AsyncMock(return_value={"id": "google-id", "htmlLink": "link"}))
+
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        asyncio.run(add_event(ctx, client))
+        rows = shared_functions.repository.read("add-event-user", EVENTS)
+    finally:
+        shared_functions.repository.set_backend(previous)
+    channel.send.assert_any_call("Your event was successfully created!")
+    assert [row[0] for row in rows[1:]] == ["google-id"]
+    assert rows[1][1] == "Standup"
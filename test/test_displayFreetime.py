@@ -1,58 +1,87 @@
-import pytest
+import asyncio
 import os
 import sys
 from datetime import datetime
 from datetime import timedelta
 from datetime import time
-import discord
-import discord.ext.commands as commands
-import discord.ext.test as test
+from unittest.mock import AsyncMock, MagicMock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
-from src.functionality.DisplayFreeTime import compute_free_time, get_free_time
-from src.functionality.shared_functions import create_event_tree, add_event_to_file
-from src.Event import Event
+from src.functionality.DisplayFreeTime import get_free_time
+from src.functionality.free_time import MAX_WINDOW_DAYS
+from src.functionality.shared_functions import EVENT_HEADER, repository
+from src.functionality.storage import EVENTS, MemoryBackend
 
 
 # all of the test cases data is generated using today's date but with fixed schedule hours for the events
 
+def at(hour, minute=0):
+    return datetime.combine(datetime.today().date(), time(hour, minute)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def free_time(events, *args):
+    # Runs !freetime on a calendar holding the given (start, end) events and returns the lines sent back
+    ctx = MagicMock()
+    ctx.author.id = "freetime-user"
+    channel = AsyncMock()
+    ctx.author.create_dm = AsyncMock(return_value=channel)
+    previous = repository.backend
+    repository.set_backend(MemoryBackend())
+    try:
+        repository.write("freetime-user", EVENTS, [EVENT_HEADER] + [
+            [str(i), "", start, end, "1", "", "", "None"] for i, (start, end) in enumerate(events)])
+        asyncio.run(get_free_time(ctx, None, *args))
+    finally:
+        repository.set_backend(previous)
+    return "\n".join(call.args[0] for call in channel.send.call_args_list).splitlines()
+
+
+def tomorrow():
+    return (datetime.today() + timedelta(days=1)).strftime("%m/%d/%y")
+
+
 def test_EventsAfterMidNight():
 
     # Test case if all of the events are not at midnight
-    t = datetime.today()
-    a = []
-    a.append(Event('',datetime(t.year, t.month, t.day, 4, 0), datetime(t.year, t.month, t.day, 5, 0), '', '', ''))
-    a.append(Event('',datetime(t.year, t.month, t.day, 1, 0), datetime(t.year, t.month, t.day, 2, 0), '', '', ''))
-    o = compute_free_time(a)
-    ex = 'Free time from 00:00 until 00:59:00\nFree time from 02:01:00 until 03:59:00\nFree time from 05:01:00 until 23:59'
-    assert o.strip() == ex.strip()
-
-    
+    o = free_time([(at(4), at(5)), (at(1), at(2))])
+    assert o[1:] == ['Free time from 00:00 until 01:00', 'Free time from 02:00 until 04:00',
+                     'Free time from 05:00 until ' + tomorrow() + ' 00:00']
 
 
 def test_EventsStartsAtMidNight():
 
     # Test case if one of the events starts at midnight
-
-    t = datetime.today()
-    a = []
-    a.append(Event('', datetime(t.year, t.month, t.day, 4, 0), datetime(t.year, t.month, t.day, 6, 0), '', '', ''))
-    a.append(Event('', datetime(t.year, t.month, t.day, 7, 0), datetime(t.year, t.month, t.day, 17, 0), '', '', ''))
-    a.append(Event('', datetime(t.year, t.month, t.day, 0, 0), datetime(t.year, t.month, t.day, 2, 0), '', '', ''))
-    o = compute_free_time(a)
-    ex = 'Free time from 02:01:00 until 03:59:00\nFree time from 06:01:00 until 06:59:00\nFree time from 17:01:00 until 23:59'
-    assert o.strip() == ex.strip()
+    o = free_time([(at(4), at(6)), (at(7), at(17)), (at(0), at(2))])
+    assert o[1:] == ['Free time from 02:00 until 04:00', 'Free time from 06:00 until 07:00',
+                     'Free time from 17:00 until ' + tomorrow() + ' 00:00']
 
 
 def test_EventsEndsAtMidNight():
 
-    # Test case if one of the events ends at midnight
+    # Test case if one of the events ends at midnight, a slot shorter than 15 minutes is not reported
+    o = free_time([(at(14), at(16)), (at(17), at(23, 59)), (at(0), at(2))])
+    assert o[1:] == ['Free time from 02:00 until 14:00', 'Free time from 16:00 until 17:00']
+
+
+def test_OverlappingEvents():
+
+    # Test case if two of the events overlap
+    o = free_time([(at(4), at(8)), (at(5), at(6)), (at(10), at(11))])
+    assert o[1:] == ['Free time from 00:00 until 04:00', 'Free time from 08:00 until 10:00',
+                     'Free time from 11:00 until ' + tomorrow() + ' 00:00']
+
+
+def test_NoEvents():
+
+    # Test case if the user has no event today
+    o = free_time([])
+    assert o[0] == datetime.today().strftime("**%A %m/%d/%y**")
+    assert o[1:] == ['Free time from 00:00 until ' + tomorrow() + ' 00:00']
+
+
+def test_RangeTooLong():
 
-    t = datetime.today()
-    a = []
-    a.append(Event('', datetime(t.year, t.month, t.day, 14, 0), datetime(t.year, t.month, t.day, 16, 0), '', '', ''))
-    a.append(Event('', datetime(t.year, t.month, t.day, 17, 0), datetime(t.year, t.month, t.day, 23, 59), '', '', ''))
-    a.append(Event('', datetime(t.year, t.month, t.day, 0, 0), datetime(t.year, t.month, t.day, 2, 0), '', '', ''))
-    o = compute_free_time(a)
-    ex = 'Free time from 02:01:00 until 13:59:00\nFree time from 16:01:00 until 16:59:00'
-    assert o.strip() == ex.strip()
+    # Test case if the range is longer than MAX_WINDOW_DAYS days
+    o = free_time([], "01/01/21", "12/31/21")
+    assert o == [f"A range can span at most {MAX_WINDOW_DAYS} days. "
+                 "Usage: !freetime [week | start mm/dd/yy [end mm/dd/yy]]"]
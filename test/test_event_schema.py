@@ -0,0 +1,95 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.event_schema import (
+    SCHEMA_HEADERS,
+    SCHEMA_VERSION,
+    EventSchema,
+    apply_record_mutation,
+    current_header,
+    decode_row,
+    decode_rows,
+    upgrade_rows,
+)
+from src.functionality.shared_functions import CalendarRepository
+from src.functionality.storage import ADD, DELETE, EDIT, EVENTS, MemoryBackend
+
+LEGACY_HEADER = SCHEMA_HEADERS[1]
+ROW = ["id1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "Meal", "Pizza", "Home"]
+
+
+def test_known_headers():
+    assert EventSchema.from_header(current_header()).version == SCHEMA_VERSION
+    assert EventSchema.from_header(LEGACY_HEADER).version == 1
+    assert EventSchema.from_header(current_header()).is_current()
+    assert not EventSchema.from_header(LEGACY_HEADER).is_current()
+
+
+def test_decode_parses_dates_and_fields():
+    record = decode_row(ROW)
+    assert record.event_id == "id1" and record.name == "Lunch"
+    assert record.start_date == datetime(2021, 9, 29, 12) and record.end_date == datetime(2021, 9, 29, 13)
+    assert record.priority == "1"
+    assert record.event_type == "Meal" and record.description == "Pizza" and record.location == "Home"
+    assert record.to_row() == ROW
+
+
+def test_decode_invalid_and_short_rows():
+    record = decode_row(["id2", "Broken", "someday"])
+    assert record.start_date is None and record.end_date is None
+    assert not record.has_dates()
+    assert record.to_row() == ["id2", "Broken", "someday"]
+
+
+def test_foreign_header_is_mapped_by_column_names():
+    header = ["Location", "Title", "start_datetime", "End-Date", "Event ID", "Description"]
+    row = ["Home", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "id1", "Pizza", "participant"]
+    schema, records = decode_rows([header, row])
+    assert schema.version == 0
+    assert records[0].to_row() == ["id1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "", "", "Pizza",
+                                   "Home", "participant"]
+    assert records[0].start_date == datetime(2021, 9, 29, 12)
+
+
+def test_upgrade_rows():
+    assert upgrade_rows([LEGACY_HEADER, ROW]) == [current_header(), ROW]
+    current = [current_header(), ROW, []]
+    assert upgrade_rows(current) == [current_header(), ROW]
+
+
+def test_apply_record_mutation_keeps_start_order():
+    records = [decode_row(["a", "", "2021-09-29 08:00:00", "2021-09-29 09:00:00"]),
+               decode_row(["b", "", "2021-09-29 18:00:00", "2021-09-29 19:00:00"])]
+    apply_record_mutation(records, ADD, "c", decode_row(["c", "", "2021-09-29 12:00:00", "2021-09-29 13:00:00"]))
+    assert [record.event_id for record in records] == ["a", "c", "b"]
+    apply_record_mutation(records, EDIT, "c", decode_row(["c", "New", "2021-09-29 12:00:00", "2021-09-29 13:00:00"]))
+    assert records[1].name == "New"
+    assert apply_record_mutation(records, DELETE, "a") == 1
+    assert [record.event_id for record in records] == ["c", "b"]
+
+
+def test_repository_upgrades_legacy_calendars_on_first_write():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [LEGACY_HEADER, ROW])
+    repo = CalendarRepository(backend)
+
+    # Reading upgrades the cached calendar only, the stored one is left alone
+    assert repo.read("u1", EVENTS)[0] == current_header()
+    assert backend.read("u1", EVENTS)[0] == LEGACY_HEADER
+    assert repo.records("u1")[0].event_type == "Meal"
+
+    new_row = ["id2", "Gym", "2021-09-29 08:00:00", "2021-09-29 09:00:00", "2", "Sport", "", "Gym"]
+    repo.add_event("u1", new_row)
+    assert backend.read("u1", EVENTS) == [current_header(), new_row, ROW]
+    assert repo.read("u1", EVENTS) == [current_header(), new_row, ROW]
+
+
+def test_repository_records_between():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [current_header(), ROW])
+    repo = CalendarRepository(backend)
+    records = repo.records_between("u1", datetime(2021, 9, 29), datetime(2021, 9, 30))
+    assert [(record.event_id, record.event_type, record.description) for record in records] == [("id1", "Meal", "Pizza")]
+    assert repo.records_between("u1", datetime(2021, 9, 30), datetime(2021, 10, 1)) == []
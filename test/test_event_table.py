@@ -0,0 +1,119 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.event_table import EventTable, from_epoch, to_epoch
+from src.functionality.storage import EVENTS, MemoryBackend, event_in_range
+from src.functionality import shared_functions
+from src.functionality.shared_functions import CalendarRepository, read_records_by_day
+from src.schedulebot import history
+
+import numpy as np
+
+HEADER = ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
+ROWS = [
+    ["id1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "Meal", "", "None"],
+    ["id2", "Gym", "2021-09-30 18:00:00", "2021-09-30 19:00:00", "2", "Sport", "Legs", "Gym"],
+    ["id3", "Trip", "2021-09-28 08:00:00", "2021-10-02 20:00:00", "3", "", "", "None"],
+    ["id4", "Broken", "someday", "2021-09-29 13:00:00", "1", "", "", "None"],
+    ["id5", "Dinner", "2021-09-29 19:00:00", "2021-09-29 20:00:00", "", "Meal", "", "Home"],
+]
+CLASS = ["c1", "Class", "2021-09-27 10:00:00", "2021-09-27 11:00:00", "1", "school", "", "None", "RRULE:FREQ=DAILY"]
+
+
+def test_columns():
+    table = EventTable.from_rows(ROWS)
+    assert len(table) == 4
+    assert list(table.source) == [0, 1, 2, 4]
+    assert table.start.dtype == np.int64 and table.priority.dtype == np.int8
+    assert list(table.priority) == [1, 2, 3, 0]
+    assert list(table.types()) == ["Meal", "Sport", "", "Meal"]
+    assert len(table.type_categories) == 3
+    assert list(table.locations()) == ["None", "Gym", "None", "Home"]
+    assert from_epoch(table.start[0]) == datetime(2021, 9, 29, 12)
+    assert to_epoch(datetime(1970, 1, 2)) == 86400
+
+
+def test_between_matches_event_in_range():
+    table = EventTable.from_rows(ROWS)
+    for start, end in [(datetime(2021, 9, 29), datetime(2021, 9, 30)), (datetime(2021, 10, 1), datetime(2021, 10, 5)),
+                       (datetime(2021, 9, 29, 13), datetime(2021, 9, 29, 19))]:
+        expected = [row for row in ROWS if event_in_range(row, start, end)]
+        assert table.select(ROWS, table.between(start, end)) == expected
+
+
+def test_past_and_future():
+    table = EventTable.from_rows(ROWS)
+    moment = datetime(2021, 9, 29, 15)
+    assert [row[0] for row in table.select(ROWS, table.ended_before(moment))] == ["id1"]
+    assert [row[0] for row in table.select(ROWS, table.starts_after(moment))] == ["id2", "id5"]
+
+
+def test_recurring_events_are_never_past():
+    rows = ROWS + [CLASS]
+    table = EventTable.from_rows(rows)
+    moment = datetime(2021, 9, 29, 15)
+    assert [row[0] for row in table.select(rows, table.ended_before(moment))] == ["id1"]
+    assert [row[0] for row in table.select(rows, table.starts_after(moment))] == ["id2", "id5", "c1"]
+    assert "c1" in [row[0] for row in table.select(rows, table.between(datetime(2022, 1, 1), datetime(2022, 1, 2)))]
+
+
+def test_by_day():
+    table = EventTable.from_rows(ROWS)
+    days = table.by_day()
+    assert list(days) == [date(2021, 9, 28), date(2021, 9, 29), date(2021, 9, 30)]
+    assert [ROWS[table.source[i]][0] for i in days[date(2021, 9, 29)]] == ["id1", "id5"]
+    assert list(table.by_day(table.types() == "Sport")) == [date(2021, 9, 30)]
+
+
+def test_empty_table():
+    table = EventTable.from_rows([])
+    assert len(table) == 0
+    assert table.by_day() == {}
+    assert table.select([], table.ended_before(datetime(2021, 1, 1))) == []
+
+
+def test_repository_select_events():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER] + ROWS)
+    repo = CalendarRepository(backend)
+    assert [row[0] for row in repo.select_events("u1", lambda table: table.ended_before(datetime(2021, 9, 29, 15)))] == ["id1"]
+    repo.delete_event("u1", "id1")
+    assert repo.select_events("u1", lambda table: table.ended_before(datetime(2021, 9, 29, 15))) == []
+
+
+def test_read_records_by_day():
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        shared_functions.repository.write("u1", EVENTS, [HEADER + ["Recurrence"]] + ROWS + [CLASS])
+        windows = [(datetime(2021, 9, 29, 9), datetime(2021, 9, 29, 14)),
+                   (datetime(2021, 9, 30, 9), datetime(2021, 9, 30, 14))]
+        days = read_records_by_day("u1", windows)
+    finally:
+        shared_functions.repository.set_backend(previous)
+    assert list(days) == [date(2021, 9, 28), date(2021, 9, 29), date(2021, 9, 30)]
+    assert [record.event_id for record in days[date(2021, 9, 28)]] == ["id3"]
+    assert [record.event_id for record in days[date(2021, 9, 29)]] == ["c1_20210929T100000", "id1"]
+    assert [record.event_id for record in days[date(2021, 9, 30)]] == ["c1_20210930T100000"]
+    assert read_records_by_day("u1", []) == {}
+
+
+def test_history_command():
+    ctx = MagicMock()
+    ctx.author.id = "history-user"
+    ctx.send = AsyncMock()
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        shared_functions.repository.write("history-user", EVENTS, [HEADER] + ROWS[:2] + [
+            ["id9", "Launch", "2999-01-01 10:00:00", "2999-01-01 11:00:00", "1", "", "", "None"]])
+        asyncio.run(history.callback(ctx))
+    finally:
+        shared_functions.repository.set_backend(previous)
+    sent = "\n".join(call.args[0] for call in ctx.send.call_args_list)
+    assert "Your past events:" in sent and "- Lunch (from 2021-09-29 12:00:00 to 2021-09-29 13:00:00)" in sent
+    assert "Launch" not in sent and "You have 1 upcoming events." in sent
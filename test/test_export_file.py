@@ -6,7 +6,10 @@ from pathlib import Path
 
 # Adjust the import path for your actual module structure
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
-from src.functionality.export_file import export_file
+from src.functionality.export_file import build_export, export_file, parse_export_args
+from datetime import datetime
+import gzip
+import json
 
 @pytest.mark.asyncio
 async def test_export_file():
@@ -16,32 +19,82 @@ async def test_export_file():
     mock_dm_channel = AsyncMock()
     mock_ctx.author.create_dm = AsyncMock(return_value=mock_dm_channel)
 
-    # File path for testing
     user_id = str(mock_ctx.author.id)
-    test_file_path = os.path.expanduser(f"~/Documents/ScheduleBot/Event/{user_id}.csv")
+
+    rows = [["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"],
+            ["1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "", "", "None"]]
 
     # Mock the necessary functions and Discord file behavior
-    with patch("src.functionality.export_file.os.path.exists", return_value=True), \
-         patch("src.functionality.export_file.create_event_directory") as mock_create_dir, \
-         patch("src.functionality.export_file.create_event_file") as mock_create_file, \
-         patch("src.functionality.export_file.load_key", return_value=b"fake_key") as mock_load_key, \
-         patch("src.functionality.export_file.decrypt_file") as mock_decrypt_file, \
-         patch("src.functionality.export_file.encrypt_file") as mock_encrypt_file, \
+    with patch("src.functionality.export_file.create_event_tree") as mock_create_tree, \
+         patch("src.functionality.export_file.read_event_file", return_value=rows) as mock_read_file, \
          patch("src.functionality.export_file.discord.File") as mock_discord_file:
-        
+
         # Mock return value for discord.File to match expected behavior
         mock_discord_file.return_value = MagicMock()
 
         # Run the export_file function
         await export_file(mock_ctx)
-        
+
         # Basic assertions to confirm functions were called
-        mock_create_dir.assert_not_called()  # Since the file is mocked as existing
-        mock_create_file.assert_not_called()  # Same reason as above
-        mock_load_key.assert_called_once_with(user_id)
-        mock_decrypt_file.assert_called_once_with(b"fake_key", test_file_path)
-        mock_encrypt_file.assert_called_once_with(b"fake_key", test_file_path)
-        mock_discord_file.assert_called_once_with(test_file_path)
-        
+        mock_create_tree.assert_called_once_with(user_id)
+        mock_read_file.assert_called_once_with(user_id)
+
+        # The export is streamed from memory instead of the decrypted calendar path
+        stream = mock_discord_file.call_args[0][0]
+        assert mock_discord_file.call_args[1]["filename"] == user_id + ".csv"
+        assert stream.getvalue().decode("utf-8").splitlines()[1].startswith("1,Lunch,2021-09-29 12:00:00")
+
         # Check that send was called with the correct file mock
         mock_dm_channel.send.assert_called_once_with(file=mock_discord_file.return_value)
+
+
+def test_parse_export_args():
+    assert parse_export_args(()) == ("csv", None, None)
+    assert parse_export_args(("ICS", "10/31/21", "10/01/21")) == ("ics", datetime(2021, 10, 1), datetime(2021, 11, 1))
+    assert parse_export_args(("jsonl", "2021-10-01")) == ("jsonl", datetime(2021, 10, 1), datetime(2021, 10, 2))
+    with pytest.raises(ValueError):
+        parse_export_args(("pdf",))
+
+
+ROWS = [["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"],
+        ["1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "Meal", "Pizza", "Home"]]
+
+
+def test_build_export_formats():
+    with patch("src.functionality.export_file.read_event_file", return_value=ROWS):
+        stream, filename = build_export("u1", "jsonl")
+        assert filename == "u1.jsonl"
+        assert json.loads(stream.getvalue().decode("utf-8").splitlines()[0])["Name"] == "Lunch"
+
+        stream, filename = build_export("u1", "ics")
+        ics = stream.getvalue().decode("utf-8")
+        assert filename == "u1.ics"
+        assert "SUMMARY:Lunch" in ics and "DTSTART:20210929T120000" in ics and "LOCATION:Home" in ics
+
+
+def test_build_export_range_and_gzip():
+    with patch("src.functionality.export_file.read_events_between", return_value=ROWS[1:]) as mock_between, \
+         patch("src.functionality.export_file.GZIP_THRESHOLD", 10):
+        stream, filename = build_export("u1", "csv", datetime(2021, 9, 29), datetime(2021, 9, 30))
+        mock_between.assert_called_once_with("u1", datetime(2021, 9, 29), datetime(2021, 9, 30))
+        assert filename == "u1.csv.gz"
+        assert gzip.decompress(stream.read()).decode("utf-8").splitlines()[1].startswith("1,Lunch")
+
+
+def test_ics_uids_are_unique():
+    from icalendar import Calendar
+    from src.functionality.shared_functions import CalendarRepository
+    from src.functionality.storage import EVENTS, MemoryBackend
+
+    repository = CalendarRepository(MemoryBackend())
+    repository.write("u1", EVENTS, ROWS[:1] + [
+        ["c1", "Class", "2021-10-04 10:00:00", "2021-10-04 11:00:00", "1", "", "", "None", "RRULE:FREQ=WEEKLY"],
+        ["local_travel_event_id", "Travel to A", "2021-10-05 09:00:00", "2021-10-05 09:30:00", "1", "Travel", "", "A"],
+        ["local_travel_event_id", "Travel to B", "2021-10-06 09:00:00", "2021-10-06 09:30:00", "1", "Travel", "", "B"],
+    ])
+    with patch("src.functionality.export_file.read_events_between",
+               side_effect=lambda user_id, start, end: repository.events_between(user_id, start, end)):
+        stream, _ = build_export("u1", "ics", datetime(2021, 10, 1), datetime(2021, 10, 31))
+    uids = [str(event["uid"]) for event in Calendar.from_ical(stream.getvalue()).walk("VEVENT")]
+    assert len(uids) == 6 and len(set(uids)) == 6
+    assert "c1_20211011T100000" in uids
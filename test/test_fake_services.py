@@ -0,0 +1,105 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.fake_services import FakeServices
+from src.functionality import distance, shared_functions, weather
+from src.functionality.google_batch import GoogleMutationQueue
+from src.functionality.google_services import GoogleServiceRegistry
+from src.functionality.google_sync import sync_google_events, write_sync_token
+from src.functionality.storage import EVENTS, MemoryBackend
+
+USER = "fakes-user"
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    with FakeServices(seed=1) as services:
+        monkeypatch.setattr(distance, "MAPS_API_URL", services.environ()["SCHEDULEBOT_MAPS_API_URL"])
+        monkeypatch.setattr(weather, "WEATHER_API_URL", services.environ()["SCHEDULEBOT_WEATHER_API_URL"])
+        yield services
+
+
+@pytest.fixture
+def calendar_service(fakes, tmp_path):
+    # An expired token, so the first use refreshes it against the fake token endpoint
+    token = {"token": "old", "refresh_token": "refresh", "client_id": "client", "client_secret": "secret",
+             "expiry": (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    with open(tmp_path / "fakes-user_token.json", "w") as token_file:
+        json.dump(token, token_file)
+    return GoogleServiceRegistry(str(tmp_path), root_url=fakes.url).get(USER)
+
+
+def google_event(day, summary="Meeting"):
+    return {"summary": summary, "start": {"dateTime": f"2021-10-{day:02d}T10:00:00"},
+            "end": {"dateTime": f"2021-10-{day:02d}T11:00:00"}}
+
+
+def test_maps_and_weather(fakes, monkeypatch):
+    monkeypatch.setattr(distance, "get_key", lambda: "key")
+    fakes.geocoding.places["Raleigh"] = (35.7796, -78.6382)
+    fakes.geocoding.places["Durham"] = (35.9940, -78.8986)
+    assert distance.get_lat_log("Raleigh", "key") == [35.7796, -78.6382]
+    fakes.geocoding.missing.add("Atlantis")
+    assert distance.get_lat_log("Atlantis", "key") is None
+
+    travel_time, maps_link = distance.get_distance("Durham", "Raleigh", "walking")
+    assert 3 * 3600 < travel_time < 8 * 3600
+    assert "travelmode=walking" in maps_link
+
+    humidity, celsius, _, _, description = weather.getWeatherData([0, 0], datetime.now().strftime("%Y-%m-%d"))
+    assert (humidity, round(celsius), description) == (60, 20, "clear sky")
+    assert fakes.requests["geocoding"] == 4 and fakes.requests["distance"] == 1
+
+
+def test_gemini(fakes):
+    url = fakes.environ()["SCHEDULEBOT_GEMINI_API_URL"] + "v1beta/models/gemini-1.5-flash-latest:generateContent"
+    response = requests.post(url, json={"contents": [{"parts": [{"text": "Hi"}]}]})
+    assert response.json()["candidates"][0]["content"]["parts"][0]["text"] == "Fake answer to: Hi"
+
+    fakes.configure("gemini", quota=0)
+    assert requests.post(url, json={"contents": [{"parts": [{"text": "Hi"}]}]}).status_code == 429
+
+
+def test_calendar_sync_pages_through_fake(fakes, calendar_service):
+    fakes.configure("calendar", page_size=2)
+    for day in range(1, 6):
+        fakes.calendar.add(google_event(day))
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        assert asyncio.run(sync_google_events(USER, calendar_service)) == (5, 0, 0)
+        assert fakes.oauth.refreshes == 1
+        assert fakes.requests["calendar"] == 3
+
+        changed = fakes.calendar.add({**google_event(7, "Moved"), "id": "fake1"})
+        calendar_service.events().delete(calendarId="primary", eventId="fake2").execute()
+        assert asyncio.run(sync_google_events(USER, calendar_service)) == (0, 1, 1)
+        rows = shared_functions.repository.read(USER, EVENTS)
+        assert [row[0] for row in rows[1:]] == ["fake3", "fake4", "fake5", changed["id"]]
+
+        fakes.calendar.expire_sync_tokens()
+        assert asyncio.run(sync_google_events(USER, calendar_service)) == (0, 4, 0)
+    finally:
+        shared_functions.repository.set_backend(previous)
+        write_sync_token(USER, None)
+
+
+def test_batch_retries_quota_errors(fakes, calendar_service):
+    # The batch itself and 29 of its parts fit in the quota, the other parts are answered with 429
+    fakes.configure("calendar", quota=30, quota_window=0.2)
+    queue = GoogleMutationQueue(USER, calendar_service, retry_delay=0.25)
+    for n in range(50):
+        queue.insert(n, google_event(1 + n % 28, f"Event {n}"))
+    responses, errors = asyncio.run(queue.flush())
+    assert not errors
+    assert len(responses) == 50 and len({response["id"] for response in responses.values()}) == 50
+    assert len(fakes.calendar.events) == 50
+    # Only the parts refused by the quota were sent again
+    assert 51 < fakes.requests["calendar"] <= 1 + 50 + 1 + 21
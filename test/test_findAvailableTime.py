@@ -2,13 +2,15 @@
 TESTING Find available time based on the preferred time and events
 """
 
-from datetime import datetime
+from datetime import date, datetime, time
 import sys
 import os
 from datetime import datetime
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "./")))
-from src.functionality.FindAvailableTime import findInter, findIntersection
+from src.functionality.FindAvailableTime import find_available_time, findInter, findIntersection, parse_days
+from src.functionality.shared_functions import EVENT_HEADER, repository
+from src.functionality.storage import EVENTS, MemoryBackend
 from src.Event import Event
 
 def test_find_one():
@@ -54,4 +56,52 @@ def test_find():
     assert msg == "2021-11-01 14:00:00 - 2021-11-01 18:00:00"
 
 
+def test_find_without_events():
+    range1 = datetime.strptime("11/01/21 10:00 am", "%m/%d/%y %I:%M %p")
+    range2 = datetime.strptime("11/01/21 06:00 pm", "%m/%d/%y %I:%M %p")
+    assert findIntersection("11/01/21", range1, range2, []) == [{'start': range1, 'end': range2}]
+
+
+def test_find_event_crossing_midnight():
+    # The event started the day before, so only its end cuts into the preferred time
+    e1 = Event("Night shift", "2021-10-31 22:00:00", "2021-11-01 11:00:00", 1, "work", "")
+    range1 = datetime.strptime("11/01/21 10:00 am", "%m/%d/%y %I:%M %p")
+    range2 = datetime.strptime("11/01/21 06:00 pm", "%m/%d/%y %I:%M %p")
+    inte = findIntersection("11/01/21", range1, range2, [e1])
+    assert inte == [{'start': datetime(2021, 11, 1, 11), 'end': range2}]
+
+
+def test_find_inter():
+    first = [{'start': datetime(2021, 11, 1, 10), 'end': datetime(2021, 11, 1, 12)}]
+    second = [{'start': datetime(2021, 11, 1, 11), 'end': datetime(2021, 11, 1, 13)}]
+    assert findInter(second, [first, second], 0, 1) == [
+        {'start': datetime(2021, 11, 1, 11), 'end': datetime(2021, 11, 1, 12)}]
+
+
+def test_parse_days():
+    assert parse_days("11/01/21") == (date(2021, 11, 1), date(2021, 11, 1))
+    assert parse_days("11/03/21 11/01/21") == (date(2021, 11, 1), date(2021, 11, 3))
+
 
+def test_find_available_time_over_several_days():
+    previous = repository.backend
+    repository.set_backend(MemoryBackend())
+    try:
+        repository.write("u1", EVENTS, [
+            EVENT_HEADER,
+            ["1", "Late study", "2021-11-01 23:00:00", "2021-11-02 01:00:00", "1", "", "", "None"],
+            ["3", "Class", "2021-11-02 10:00:00", "2021-11-02 11:00:00", "1", "", "", "None"],
+            ["2", "Gym", "2021-11-02 22:00:00", "2021-11-02 22:30:00", "1", "", "", "None"],
+        ])
+        days, inte = find_available_time("u1", date(2021, 11, 1), date(2021, 11, 2), time(22), time(2))
+        assert {day: [record.name for record in records] for day, records in days.items()} == {
+            date(2021, 11, 1): ["Late study"],
+            date(2021, 11, 2): ["Gym"],
+        }
+        assert inte == [
+            (datetime(2021, 11, 1, 22), datetime(2021, 11, 1, 23)),
+            (datetime(2021, 11, 2, 1), datetime(2021, 11, 2, 2)),
+            (datetime(2021, 11, 2, 22, 30), datetime(2021, 11, 3, 2)),
+        ]
+    finally:
+        repository.set_backend(previous)
@@ -0,0 +1,128 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import date, datetime, time, timedelta
+from random import randint, seed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.free_time import (
+    MAX_WINDOW_DAYS,
+    find_free_time,
+    format_free_slots,
+    intersect_slots,
+    merge_busy,
+    parse_window,
+    preferred_windows,
+    subtract_busy,
+    subtract_busy_windows,
+)
+from src.functionality.shared_functions import EVENT_HEADER, repository
+from src.functionality.storage import EVENTS, MemoryBackend
+
+import pytest
+
+DAY = datetime(2021, 9, 29)
+
+
+def at(hour, minute=0, day=0):
+    return DAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_merge_busy():
+    busy = [(at(4), at(6)), (at(1), at(2)), (at(5), at(7)), (at(2), at(3)), (at(8), at(9))]
+    assert merge_busy(busy) == [(at(1), at(3)), (at(4), at(7)), (at(8), at(9))]
+    assert merge_busy([]) == []
+
+
+def test_subtract_busy_handles_overlaps_and_edges():
+    busy = [(at(-2), at(1)), (at(4), at(6)), (at(5), at(5, 30)), (at(23), at(2, day=1))]
+    assert subtract_busy(at(0), at(24), busy) == [(at(1), at(4)), (at(6), at(23))]
+    assert subtract_busy(at(0), at(24), []) == [(at(0), at(24))]
+    assert subtract_busy(at(0), at(24), [(at(-1), at(25))]) == []
+
+
+def test_subtract_busy_min_length_and_granularity():
+    busy = [(at(1, 7), at(2)), (at(2, 10), at(3, 2))]
+    slots = subtract_busy(at(0), at(4), busy, min_length=timedelta(minutes=15), granularity=timedelta(minutes=15))
+    assert slots == [(at(0), at(1)), (at(3, 15), at(4))]
+
+
+def test_subtract_busy_matches_minute_scan():
+    seed(3)
+    for _ in range(50):
+        busy = []
+        for _ in range(randint(0, 10)):
+            start = at(0) + timedelta(minutes=randint(-60, 60 * 48))
+            busy.append((start, start + timedelta(minutes=randint(0, 300))))
+        slots = subtract_busy(at(0), at(0, day=2), busy)
+        free_minutes = {at(0) + timedelta(minutes=m) for m in range(60 * 48)
+                        if not any(start <= at(0) + timedelta(minutes=m) < end for start, end in busy)}
+        covered = set()
+        for start, end in slots:
+            minute = start
+            while minute < end:
+                covered.add(minute)
+                minute += timedelta(minutes=1)
+        assert covered == free_minutes
+
+
+def test_subtract_busy_windows_sweeps_every_window():
+    windows = [(at(9), at(17)), (at(9, day=1), at(17, day=1)), (at(9, day=2), at(17, day=2))]
+    busy = [(at(16), at(10, day=1)), (at(12, day=2), at(13, day=2)), (at(20, day=5), at(21, day=5))]
+    assert subtract_busy_windows(windows, busy) == [
+        (at(9), at(16)), (at(10, day=1), at(17, day=1)), (at(9, day=2), at(12, day=2)), (at(13, day=2), at(17, day=2)),
+    ]
+    assert subtract_busy_windows([], busy) == []
+
+
+def test_preferred_windows_cross_midnight():
+    assert preferred_windows(DAY.date(), DAY.date() + timedelta(days=1), time(9), time(17)) == [
+        (at(9), at(17)), (at(9, day=1), at(17, day=1)),
+    ]
+    assert preferred_windows(DAY.date(), DAY.date(), time(22), time(2)) == [(at(22), at(2, day=1))]
+
+
+def test_intersect_slots():
+    first = [(at(1), at(4)), (at(6), at(9))]
+    second = [(at(0), at(2)), (at(3), at(7)), (at(8), at(10))]
+    assert intersect_slots(first, second) == [(at(1), at(2)), (at(3), at(4)), (at(6), at(7)), (at(8), at(9))]
+    assert intersect_slots(first, []) == []
+
+
+def test_find_free_time_over_several_days():
+    previous = repository.backend
+    repository.set_backend(MemoryBackend())
+    try:
+        repository.write("u1", EVENTS, [
+            EVENT_HEADER,
+            ["1", "Night shift", "2021-09-29 22:00:00", "2021-09-30 06:00:00", "1", "", "", "None"],
+            ["2", "Lunch", "2021-09-30 12:00:00", "2021-09-30 13:00:00", "1", "", "", "None"],
+        ])
+        slots = find_free_time("u1", at(0), at(0, day=2))
+        assert slots == [(at(0), at(22)), (at(6, day=1), at(12, day=1)), (at(13, day=1), at(0, day=2))]
+    finally:
+        repository.set_backend(previous)
+
+
+def test_parse_window():
+    today = date(2021, 9, 29)
+    assert parse_window((), today) == (at(0), at(0, day=1))
+    assert parse_window(("week",), today) == (at(0), at(0, day=7))
+    assert parse_window(("10/01/21", "09/30/21"), today) == (at(0, day=1), at(0, day=3))
+    with pytest.raises(ValueError):
+        parse_window(("someday",), today)
+    start = date(2021, 1, 1)
+    last = start + timedelta(days=MAX_WINDOW_DAYS - 1)
+    assert parse_window((start.strftime("%m/%d/%y"), last.strftime("%m/%d/%y")), today)[1] - \
+        datetime(2021, 1, 1) == timedelta(days=MAX_WINDOW_DAYS)
+    with pytest.raises(ValueError, match="at most"):
+        parse_window(("01/01/21", (last + timedelta(days=1)).strftime("%m/%d/%y")), today)
+
+
+def test_format_free_slots():
+    message = format_free_slots([(at(0), at(22)), (at(23), at(6, day=1))])
+    assert message.splitlines() == [
+        "**Wednesday 09/29/21**",
+        "Free time from 00:00 until 22:00",
+        "Free time from 23:00 until 09/30/21 06:00",
+    ]
+    assert format_free_slots([]) == "You have no free time in that range"
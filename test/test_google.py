@@ -1,6 +1,7 @@
 import os
 import sys
 import pytest
+import pytest_asyncio
 from unittest.mock import patch, AsyncMock, MagicMock
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -12,7 +13,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "./")))
 
 from src.functionality.Google import connect_google
 
-@pytest.fixture
+@pytest_asyncio.fixture
 async def ctx():
     mock_ctx = AsyncMock()
     mock_ctx.author.id = 123456789
@@ -21,33 +22,25 @@ async def ctx():
 
 @pytest.mark.asyncio
 async def test_connect_google_success(ctx):
-    with patch('src.functionality.Google.os.path.exists') as mock_exists, \
-         patch('src.functionality.Google.Credentials') as mock_credentials, \
-         patch('src.functionality.Google.InstalledAppFlow') as mock_flow, \
-         patch('src.functionality.Google.build') as mock_build, \
-         patch('src.functionality.Google.open', new_callable=MagicMock) as mock_open:
-
-        # Mock the os.path.exists to return True for all paths
-        mock_exists.side_effect = lambda path: True
-
-        # Mock the credentials
-        mock_creds = MagicMock()
-        mock_creds.valid = True
-        mock_credentials.from_authorized_user_file.return_value = mock_creds
+    with patch('src.functionality.Google.google_services') as mock_services, \
+         patch('src.functionality.Google.InstalledAppFlow') as mock_flow:
 
-        # Mock the build function
+        # The user is logged in, so the registry has their service
         mock_service = MagicMock()
-        mock_build.return_value = mock_service
+        mock_services.get.return_value = mock_service
 
         service = await connect_google(ctx)
         assert service == mock_service
-        assert ctx.author.create_dm.called
-        assert ctx.author.create_dm.return_value.send.called
+        assert not mock_flow.from_client_secrets_file.called
+        assert not ctx.author.create_dm.called
 
 @pytest.mark.asyncio
 async def test_connect_google_no_key_file(ctx):
     with patch('src.functionality.Google.os.path.exists') as mock_exists, \
-         patch('src.functionality.Google.open', new_callable=MagicMock) as mock_open:
+         patch('src.functionality.Google.google_services') as mock_services:
+
+        # The user is not logged in yet
+        mock_services.get.return_value = None
 
         # Mock the os.path.exists to return False for key file
         mock_exists.side_effect = lambda path: False if 'key.json' in path else True
@@ -60,7 +53,10 @@ async def test_connect_google_no_key_file(ctx):
 @pytest.mark.asyncio
 async def test_connect_google_no_credentials_file(ctx):
     with patch('src.functionality.Google.os.path.exists') as mock_exists, \
-         patch('src.functionality.Google.open', new_callable=MagicMock) as mock_open:
+         patch('src.functionality.Google.google_services') as mock_services:
+
+        # The user is not logged in yet
+        mock_services.get.return_value = None
 
         # Mock the os.path.exists to return False for credentials file
         mock_exists.side_effect = lambda path: False if 'credentials.json' in path else True
@@ -73,52 +69,42 @@ async def test_connect_google_no_credentials_file(ctx):
 @pytest.mark.asyncio
 async def test_connect_google_oauth_flow(ctx):
     with patch('src.functionality.Google.os.path.exists') as mock_exists, \
-         patch('src.functionality.Google.Credentials') as mock_credentials, \
          patch('src.functionality.Google.InstalledAppFlow') as mock_flow, \
-         patch('src.functionality.Google.build') as mock_build, \
-         patch('src.functionality.Google.open', new_callable=MagicMock) as mock_open:
+         patch('src.functionality.Google.google_services') as mock_services:
 
         # Mock the os.path.exists to return True for all paths
         mock_exists.side_effect = lambda path: True
 
-        # Mock the credentials to be invalid and require OAuth flow
+        # The user has no usable credentials, which requires the OAuth flow
+        mock_services.get.return_value = None
         mock_creds = MagicMock()
-        mock_creds.valid = False
-        mock_creds.expired = True
-        mock_creds.refresh_token = 'refresh_token'
-        mock_credentials.from_authorized_user_file.return_value = mock_creds
 
         # Mock the flow
         mock_flow_instance = MagicMock()
         mock_flow_instance.run_local_server.return_value = mock_creds
         mock_flow.from_client_secrets_file.return_value = mock_flow_instance
 
-        # Mock the build function
+        # Mock the registry building the service
         mock_service = MagicMock()
-        mock_build.return_value = mock_service
+        mock_services.register.return_value = mock_service
 
         service = await connect_google(ctx)
         assert service == mock_service
+        mock_services.register.assert_called_once_with("123456789", mock_creds)
         assert ctx.author.create_dm.called
         assert ctx.author.create_dm.return_value.send.called
 
 @pytest.mark.asyncio
 async def test_connect_google_oauth_flow_failure(ctx):
     with patch('src.functionality.Google.os.path.exists') as mock_exists, \
-         patch('src.functionality.Google.Credentials') as mock_credentials, \
          patch('src.functionality.Google.InstalledAppFlow') as mock_flow, \
-         patch('src.functionality.Google.build') as mock_build, \
-         patch('src.functionality.Google.open', new_callable=MagicMock) as mock_open:
+         patch('src.functionality.Google.google_services') as mock_services:
 
         # Mock the os.path.exists to return True for all paths
         mock_exists.side_effect = lambda path: True
 
-        # Mock the credentials to be invalid and require OAuth flow
-        mock_creds = MagicMock()
-        mock_creds.valid = False
-        mock_creds.expired = True
-        mock_creds.refresh_token = 'refresh_token'
-        mock_credentials.from_authorized_user_file.return_value = mock_creds
+        # The user has no usable credentials, which requires the OAuth flow
+        mock_services.get.return_value = None
 
         # Mock the flow to raise an exception
         mock_flow_instance = MagicMock()
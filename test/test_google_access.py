@@ -0,0 +1,94 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.google_access import execute, run_google
+
+
+class Tracker:
+    """Blocking call recording how many calls run at the same time."""
+
+    def __init__(self):
+        self.running = 0
+        self.most = 0
+        self.lock = threading.Lock()
+
+    def call(self, seconds, result=None):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        time.sleep(seconds)
+        with self.lock:
+            self.running -= 1
+        return result
+
+
+def test_event_loop_keeps_running():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        result = await run_google("u1", time.sleep, 0.2)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result is None
+    assert ticks >= 10
+
+
+def test_user_calls_run_one_at_a_time():
+    tracker = Tracker()
+
+    async def scenario():
+        return await asyncio.gather(*(run_google("u1", tracker.call, 0.05, n) for n in range(3)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert tracker.most == 1
+
+
+def test_users_run_concurrently():
+    tracker = Tracker()
+
+    async def scenario():
+        await asyncio.gather(*(run_google(f"u{n}", tracker.call, 0.1) for n in range(4)))
+
+    start = time.monotonic()
+    asyncio.run(scenario())
+    assert tracker.most > 1
+    assert time.monotonic() - start < 0.35
+
+
+def test_timeout_keeps_slot_until_call_finishes():
+    tracker = Tracker()
+
+    async def scenario():
+        try:
+            await run_google("u1", tracker.call, 0.3, timeout=0.05)
+        except asyncio.TimeoutError:
+            timed_out = True
+        else:
+            timed_out = False
+        # The next call of the same user waits for the abandoned one instead of running beside it
+        await run_google("u1", tracker.call, 0)
+        return timed_out
+
+    assert asyncio.run(scenario())
+    assert tracker.most == 1
+
+
+def test_execute_runs_request():
+    class Request:
+        def execute(self):
+            return {"items": []}
+
+    assert asyncio.run(execute("u1", Request())) == {"items": []}
@@ -0,0 +1,141 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.event_schema import make_record
+from src.functionality.google_batch import GoogleMutationQueue, is_retryable
+from src.functionality.import_file import ImportStats, push_to_google
+from googleapiclient.errors import HttpError
+
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "Fake"
+
+
+def http_error(status):
+    return HttpError(FakeResponse(status), b"{}")
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches.append([request for _, request in self.requests])
+        for request_id, (kind, key, body) in self.requests:
+            outcome = self.service.outcomes.get(key, [])
+            error = outcome.pop(0) if outcome else None
+            if error is not None:
+                self.callback(request_id, None, error)
+            else:
+                self.callback(request_id, {"id": f"g-{key}", **(body or {})}, None)
+
+
+class FakeEvents:
+    def insert(self, calendarId, body):
+        return ("insert", body["summary"], body)
+
+    def patch(self, calendarId, eventId, body):
+        return ("patch", eventId, body)
+
+    def delete(self, calendarId, eventId):
+        return ("delete", eventId, None)
+
+
+class FakeService:
+    """Fails a request with the listed errors, one per attempt, keyed by summary or event ID."""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.batches = []
+
+    def events(self):
+        return FakeEvents()
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+def test_batches_of_at_most_fifty():
+    service = FakeService()
+    queue = GoogleMutationQueue("u1", service)
+    for n in range(120):
+        queue.insert(n, {"summary": f"e{n}"})
+    responses, errors = asyncio.run(queue.flush())
+    assert [len(batch) for batch in service.batches] == [50, 50, 20]
+    assert responses[7]["id"] == "g-e7"
+    assert not errors
+    assert len(queue) == 0
+
+
+def test_changes_to_one_event_are_coalesced():
+    service = FakeService()
+    queue = GoogleMutationQueue("u1", service)
+    queue.insert("a", {"summary": "a", "location": "x"})
+    queue.patch("a", None, {"location": "y"})
+    queue.insert("b", {"summary": "b"})
+    queue.delete("b", None)
+    queue.patch("c", "gc", {"summary": "c"})
+    queue.delete("c", None)
+    responses, errors = asyncio.run(queue.flush())
+    assert service.batches == [[("insert", "a", {"summary": "a", "location": "y"}), ("delete", "gc", None)]]
+    assert responses == {"a": {"id": "g-a", "summary": "a", "location": "y"}, "c": None}
+
+
+def test_only_failed_items_are_retried():
+    service = FakeService({"e1": [http_error(429), http_error(503)], "e2": [http_error(400)],
+                           "gone": [http_error(404)]})
+    queue = GoogleMutationQueue("u1", service, retry_delay=0)
+    for n in range(4):
+        queue.insert(n, {"summary": f"e{n}"})
+    queue.delete("old", "gone")
+    responses, errors = asyncio.run(queue.flush())
+    assert [len(batch) for batch in service.batches] == [5, 1, 1]
+    assert sorted(responses, key=str) == [0, 1, 3, "old"]
+    assert list(errors) == [2]
+    assert errors[2].resp.status == 400
+
+
+def test_retries_are_bounded():
+    service = FakeService({"e0": [http_error(500)] * 10})
+    queue = GoogleMutationQueue("u1", service, retries=2, retry_delay=0)
+    queue.insert(0, {"summary": "e0"})
+    responses, errors = asyncio.run(queue.flush())
+    assert len(service.batches) == 3
+    assert not responses and is_retryable(errors[0])
+
+
+def test_import_keeps_google_ids():
+    service = FakeService({"Broken": [http_error(400)]})
+    records = [make_record("", name, datetime(2021, 10, 4, 10), datetime(2021, 10, 4, 11), "3")
+               for name in ("Class", "Broken")]
+    stats = ImportStats()
+    stored = asyncio.run(push_to_google(GoogleMutationQueue("u1", service), records, stats))
+    assert [record.event_id for record in stored] == ["g-Class", ""]
+    assert stored[0].row[1:] == records[0].row[1:]
+    assert (stats.google, stats.google_failed) == (1, 1)
+    assert "1 added to Google Calendar" in stats.summary()
+
+
+def test_import_skips_events_from_google():
+    service = FakeService({})
+    records = [make_record(event_id, "Class", datetime(2021, 10, 4, 10), datetime(2021, 10, 4, 11), "3")
+               for event_id in ("7kq3ab1vd2", "")]
+    stats = ImportStats()
+    stored = asyncio.run(push_to_google(GoogleMutationQueue("u1", service), records, stats))
+    assert [len(batch) for batch in service.batches] == [1]
+    assert [record.event_id for record in stored] == ["7kq3ab1vd2", "g-Class"]
+    assert stats.google == 1
+
+    stored = asyncio.run(push_to_google(GoogleMutationQueue("u1", service), records[:1], stats))
+    assert stored == records[:1] and len(service.batches) == 1
@@ -0,0 +1,73 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import json
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality import google_services as services_module
+from src.functionality.google_services import GoogleServiceRegistry, calendar_discovery
+from google.oauth2.credentials import Credentials
+
+
+def write_token(tokens_dir, user_id, expiry=None):
+    expiry = expiry or datetime.utcnow() + timedelta(hours=1)
+    token = {"token": "access", "refresh_token": "refresh", "client_id": "client", "client_secret": "secret",
+             "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ")}
+    os.makedirs(tokens_dir, exist_ok=True)
+    with open(os.path.join(tokens_dir, f"{user_id}_token.json"), "w") as token_file:
+        json.dump(token, token_file)
+
+
+def test_discovery_is_bundled():
+    document = calendar_discovery()
+    assert document["name"] == "calendar" and document["version"] == "v3"
+    assert calendar_discovery() is document
+
+
+def test_service_built_once_per_user(tmp_path, monkeypatch):
+    built = []
+    real_build = services_module.build_from_document
+    monkeypatch.setattr(services_module, "build_from_document",
+                        lambda *args, **kwargs: built.append(1) or real_build(*args, **kwargs))
+    registry = GoogleServiceRegistry(str(tmp_path))
+    write_token(str(tmp_path), "u1")
+
+    service = registry.get("u1")
+    assert service is not None
+    assert registry.get("u1") is service
+    assert len(built) == 1
+    assert registry.get("u2") is None
+
+    registry.forget("u1")
+    assert registry.get("u1") is not service
+    assert len(built) == 2
+
+
+def test_expired_credentials_refreshed_in_place(tmp_path, monkeypatch):
+    def refresh(creds, request):
+        creds.token = "fresh"
+        creds.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    registry = GoogleServiceRegistry(str(tmp_path))
+    write_token(str(tmp_path), "u1", expiry=datetime.utcnow() - timedelta(hours=1))
+
+    service = registry.get("u1")
+    assert service is not None
+    with open(registry.token_path("u1")) as token_file:
+        assert json.load(token_file)["token"] == "fresh"
+
+    # The cached service keeps its credentials, which are refreshed again when they expire
+    creds = registry._services["u1"][0]
+    creds.expiry = datetime.utcnow() - timedelta(minutes=1)
+    assert registry.get("u1") is service
+    assert creds.valid
+
+
+def test_register_saves_token(tmp_path):
+    registry = GoogleServiceRegistry(str(tmp_path / "tokens"))
+    creds = Credentials("access", refresh_token="refresh", client_id="client", client_secret="secret",
+                        token_uri="https://oauth2.googleapis.com/token")
+    service = registry.register("u1", creds)
+    assert os.path.exists(registry.token_path("u1"))
+    assert registry.get("u1") is service
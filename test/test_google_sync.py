@@ -0,0 +1,145 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality import shared_functions
+from src.functionality.google_sync import (
+    GoogleDelta,
+    apply_delta,
+    read_sync_token,
+    sync_google_events,
+    write_sync_token,
+)
+from src.functionality.storage import EVENTS, MemoryBackend
+from googleapiclient.errors import HttpError
+
+HEADER = ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
+
+
+def google_event(event_id, day, summary="Meeting"):
+    return {"id": event_id, "summary": summary, "status": "confirmed",
+            "start": {"dateTime": f"2021-10-{day:02d}T10:00:00"}, "end": {"dateTime": f"2021-10-{day:02d}T11:00:00"}}
+
+
+class FakeResponse:
+    status = 410
+    reason = "Gone"
+
+
+class FakeEvents:
+    """Answers events().list with pages per sync token, the token "expired" fails with 410."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def list(self, **arguments):
+        self.calls.append(arguments)
+        return self
+
+    def execute(self):
+        arguments = self.calls[-1]
+        token = arguments.get("syncToken")
+        if token == "expired":
+            raise HttpError(FakeResponse(), b"Sync token is no longer valid")
+        return self.pages[token][int(arguments.get("pageToken", 0))]
+
+
+class FakeService:
+    def __init__(self, pages):
+        self._events = FakeEvents(pages)
+
+    def events(self):
+        return self._events
+
+
+def with_memory_backend(test):
+    def run():
+        previous = shared_functions.repository.backend
+        shared_functions.repository.set_backend(MemoryBackend())
+        try:
+            test()
+        finally:
+            shared_functions.repository.set_backend(previous)
+    return run
+
+
+def test_delta_keeps_last_change():
+    delta = GoogleDelta()
+    delta.add_page({"items": [google_event("a", 4), {"id": "b", "status": "cancelled"}]})
+    delta.add_page({"items": [{"id": "a", "status": "cancelled"}, google_event("b", 5), {"id": "c"}],
+                    "nextSyncToken": "t1"})
+    assert delta.deletes == {"a"}
+    assert list(delta.upserts) == ["b"]
+    assert delta.skipped == 1
+    assert delta.sync_token == "t1"
+
+
+@with_memory_backend
+def test_full_sync_pages_and_stores_token():
+    service = FakeService({None: [
+        {"items": [google_event("a", 4)], "nextPageToken": "1"},
+        {"items": [google_event("b", 2)], "nextPageToken": "2"},
+        {"items": [google_event("c", 6)], "nextSyncToken": "t1"},
+    ]})
+    assert asyncio.run(sync_google_events("u1", service)) == (3, 0, 0)
+    rows = shared_functions.repository.read("u1", EVENTS)
+    assert [row[0] for row in rows[1:]] == ["b", "a", "c"]
+    assert read_sync_token("u1") == "t1"
+    assert [call.get("pageToken") for call in service.events().calls] == [None, "1", "2"]
+    assert all(call["showDeleted"] for call in service.events().calls)
+
+
+@with_memory_backend
+def test_incremental_sync_applies_changes():
+    shared_functions.repository.write("u2", EVENTS, [HEADER,
+                                                     ["a", "Old", "2021-10-04 10:00:00", "2021-10-04 11:00:00",
+                                                      "1", "", "", "None"],
+                                                     ["b", "Gone", "2021-10-05 10:00:00", "2021-10-05 11:00:00",
+                                                      "1", "", "", "None"],
+                                                     ["local", "Mine", "2021-10-06 10:00:00",
+                                                      "2021-10-06 11:00:00", "1", "", "", "None"]])
+    write_sync_token("u2", "t1")
+    service = FakeService({"t1": [{"items": [google_event("a", 7, "New"), {"id": "b", "status": "cancelled"},
+                                             google_event("d", 1)], "nextSyncToken": "t2"}]})
+    assert asyncio.run(sync_google_events("u2", service)) == (1, 1, 1)
+    rows = shared_functions.repository.read("u2", EVENTS)
+    assert [(row[0], row[1]) for row in rows[1:]] == [("d", "Meeting"), ("local", "Mine"), ("a", "New")]
+    assert service.events().calls[0]["syncToken"] == "t1"
+    assert read_sync_token("u2") == "t2"
+
+
+@with_memory_backend
+def test_expired_token_runs_full_sync():
+    write_sync_token("u3", "expired")
+    service = FakeService({None: [{"items": [google_event("a", 4)], "nextSyncToken": "t1"}]})
+    assert asyncio.run(sync_google_events("u3", service)) == (1, 0, 0)
+    assert "syncToken" not in service.events().calls[-1]
+    assert read_sync_token("u3") == "t1"
+
+
+@with_memory_backend
+def test_empty_delta_does_not_write():
+    delta = GoogleDelta()
+    delta.add_page({"items": [], "nextSyncToken": "t9"})
+    assert apply_delta("u4", delta) == (0, 0, 0)
+    assert not shared_functions.repository.exists("u4", EVENTS)
+    assert read_sync_token("u4") == "t9"
+
+
+@with_memory_backend
+def test_full_sync_removes_events_missing_from_google():
+    shared_functions.repository.write("u5", EVENTS, [HEADER,
+                                                     ["a", "Kept", "2021-10-04 10:00:00", "2021-10-04 11:00:00",
+                                                      "Medium", "GoogleCalendar", "", "None"],
+                                                     ["b", "Stale", "2021-10-05 10:00:00", "2021-10-05 11:00:00",
+                                                      "Medium", "GoogleCalendar", "", "None"],
+                                                     ["local", "Mine", "2021-10-06 10:00:00",
+                                                      "2021-10-06 11:00:00", "1", "", "", "None"]])
+    write_sync_token("u5", "expired")
+    service = FakeService({None: [{"items": [google_event("a", 4, "Kept")], "nextSyncToken": "t1"}]})
+    assert asyncio.run(sync_google_events("u5", service)) == (0, 1, 1)
+    rows = shared_functions.repository.read("u5", EVENTS)
+    assert [row[0] for row in rows[1:]] == ["a", "local"]
+    write_sync_token("u5", None)
@@ -9,10 +9,14 @@ import discord.ext.test as test
 import threading
 from icalendar import Calendar
 import time
+import csv
+import io
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 from src.schedulebot import importfile
-from src.functionality.import_file import verify_csv, convert_time, import_file, get_ics_data
+from src.functionality.import_file import verify_csv, convert_time, import_file, get_ics_data, iter_ics_events, batched
+from src.functionality.import_file import ImportStats, dedupe, iter_csv_events, verify_header
+from datetime import datetime
 
 ICS_STRING = "BEGIN:VCALENDAR\n" \
              "PRODID:-//Google Inc//Google Calendar 70.9054//EN\n" \
@@ -93,6 +97,43 @@ def test_import_ics_empty():
     assert verify_csv(data)
 
 
+def test_iter_ics_events():
+    records = list(iter_ics_events(Calendar.from_ical(ICS_STRING)))
+
+    assert [record.start_date for record in records] == [datetime(2020, 5, 8), datetime(2021, 5, 8),
+                                                         datetime(2022, 5, 8)]
+    assert records[0].end_date == datetime(2020, 5, 9)
+    # The events came from Google, so they keep their Google ID
+    assert records[0].to_row() == ['2020_BIRTHDAY_self', 'Happy birthday!', '2020-05-08 00:00:00', '2020-05-09 00:00:00', '3', '',
+                                   'Happy birthday!', 'None']
+
+
+def test_iter_ics_events_times_and_durations():
+    gcal = Calendar.from_ical("BEGIN:VCALENDAR\n"
+                              "BEGIN:VEVENT\n"
+                              "DTSTART:20211102T171500Z\n"
+                              "DURATION:PT1H30M\n"
+                              "SUMMARY:Meeting\n"
+                              "LOCATION:Library\n"
+                              "END:VEVENT\n"
+                              "BEGIN:VEVENT\n"
+                              "SUMMARY:No start\n"
+                              "END:VEVENT\n"
+                              "END:VCALENDAR")
+
+    records = list(iter_ics_events(gcal))
+
+    assert len(records) == 1
+    assert records[0].start_date == datetime(2021, 11, 2, 17, 15)
+    assert records[0].end_date == datetime(2021, 11, 2, 18, 45)
+    assert records[0].location == "Library"
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []
+
+
 def test_time():
     old_time = "1998-05-08 10:30:00"
     new_time = convert_time(old_time)
@@ -146,3 +187,68 @@ def test_missing_column_csv():
     table = pd.DataFrame(data=data)
 
     assert not verify_csv(table)
+
+
+def test_iter_csv_events():
+    text = "ID,Name,Start Date,End Date,Priority,Type,Notes,Location\n" \
+           "abc,Lunch,2021-09-29 12:00:00,2021-09-29 13:00,1,Meal,,Home\n" \
+           "7kq3ab1vd2,Synced,2021-09-30 12:00:00,2021-09-30 13:00,Medium,GoogleCalendar,,None\n" \
+           ",Holiday,2021-10-01,2021-10-02,2,,Beach\n" \
+           ",Broken,someday,2021-10-02,2,,\n" \
+           "\n"
+    reader = csv.reader(io.StringIO(text))
+    assert verify_header(next(reader))
+    stats = ImportStats()
+
+    records = list(iter_csv_events(reader, stats))
+
+    assert [record.to_row() for record in records] == [
+        ['', 'Lunch', '2021-09-29 12:00:00', '2021-09-29 13:00:00', '1', 'Meal', '', 'Home'],
+        ['7kq3ab1vd2', 'Synced', '2021-09-30 12:00:00', '2021-09-30 13:00:00', 'Medium', 'GoogleCalendar', '',
+         'None'],
+        ['', 'Holiday', '2021-10-01 00:00:00', '2021-10-02 00:00:00', '2', '', 'Beach', 'None'],
+    ]
+    assert stats.invalid == 1
+
+
+def test_dedupe():
+    records = list(iter_ics_events(Calendar.from_ical(ICS_STRING)))
+    stats = ImportStats()
+    seen = {(records[0].name, records[0].start_date, records[0].end_date)}
+
+    kept = list(dedupe(records + records[1:2], seen, stats))
+
+    assert kept == records[1:]
+    assert stats.duplicates == 2
+    assert "2 already in your calendar" in stats.summary()
+
+
+def test_plain_import_does_not_push(monkeypatch):
+    import src.functionality.import_file as import_module
+    from unittest.mock import AsyncMock, MagicMock
+    from src.functionality import shared_functions
+    from src.functionality.storage import EVENTS, MemoryBackend
+
+    ctx = MagicMock()
+    ctx.author.id = "plain-import-user"
+    channel = AsyncMock()
+    ctx.author.create_dm = AsyncMock(return_value=channel)
+    attachment = MagicMock(filename="events.ics", size=len(ICS_STRING))
+    attachment.read = AsyncMock(return_value=ICS_STRING.encode("utf-8"))
+    client = MagicMock()
+    client.wait_for = AsyncMock(return_value=MagicMock(attachments=[attachment]))
+    google_service = AsyncMock(return_value=MagicMock())
+    queue = MagicMock()
+    monkeypatch.setattr(import_module, "google_service", google_service)
+    monkeypatch.setattr(import_module, "GoogleMutationQueue", queue)
+
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        asyncio.run(import_file(ctx, client))
+        rows = shared_functions.repository.read("plain-import-user", EVENTS)
+    finally:
+        shared_functions.repository.set_backend(previous)
+    assert len(rows) == 4
+    assert not google_service.called and not queue.called
+    assert "Google Calendar" not in channel.send.call_args.args[0]
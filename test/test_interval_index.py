@@ -0,0 +1,70 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import datetime, timedelta
+from random import randint, seed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.interval_index import IntervalIndex
+from src.functionality.storage import ADD, DELETE, EDIT, EVENTS, MemoryBackend, event_in_range
+from src.functionality.shared_functions import CalendarRepository
+
+HEADER = ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
+
+
+def row(event_id, start, end):
+    return [event_id, "Event " + event_id, str(start), str(end), "1", "", "", "None"]
+
+
+def random_rows(count):
+    base = datetime(2021, 9, 1)
+    rows = []
+    for i in range(count):
+        start = base + timedelta(minutes=randint(0, 60 * 24 * 30))
+        rows.append(row(str(i), start, start + timedelta(minutes=randint(0, 60 * 30))))
+    return rows
+
+
+def test_overlapping_matches_linear_scan():
+    seed(5)
+    rows = random_rows(500)
+    index = IntervalIndex(rows)
+    assert len(index) == 500
+    for _ in range(200):
+        start = datetime(2021, 9, 1) + timedelta(minutes=randint(0, 60 * 24 * 30))
+        end = start + timedelta(minutes=randint(0, 60 * 48))
+        expected = sorted(r[0] for r in rows if event_in_range(r, start, end))
+        assert sorted(r[0] for r in index.overlapping(start, end)) == expected
+
+
+def test_active_at():
+    index = IntervalIndex([
+        row("a", datetime(2021, 9, 29, 12), datetime(2021, 9, 29, 13)),
+        row("b", datetime(2021, 9, 28, 8), datetime(2021, 10, 2, 20)),
+        row("c", datetime(2021, 9, 29, 13), datetime(2021, 9, 29, 14)),
+    ])
+    assert [r[0] for r in index.active_at(datetime(2021, 9, 29, 12, 30))] == ["b", "a"]
+    assert [r[0] for r in index.active_at(datetime(2021, 9, 29, 13))] == ["b", "c"]
+    assert index.active_at(datetime(2021, 10, 3)) == []
+
+
+def test_incremental_mutations():
+    index = IntervalIndex()
+    index.apply(ADD, "a", row("a", datetime(2021, 9, 29, 12), datetime(2021, 9, 29, 13)))
+    index.apply(EDIT, "a", row("a", datetime(2021, 9, 30, 12), datetime(2021, 9, 30, 13)))
+    assert index.overlapping(datetime(2021, 9, 29), datetime(2021, 9, 30)) == []
+    assert len(index.overlapping(datetime(2021, 9, 30), datetime(2021, 10, 1))) == 1
+    index.apply(DELETE, "a")
+    assert len(index) == 0
+    assert index.overlapping(datetime(2021, 9, 30), datetime(2021, 10, 1)) == []
+
+
+def test_repository_keeps_index_current():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER])
+    repo = CalendarRepository(backend)
+    day = datetime(2021, 9, 29)
+    assert repo.events_between("u1", day, day + timedelta(days=1)) == []
+    repo.add_event("u1", row("a", datetime(2021, 9, 29, 12), datetime(2021, 9, 29, 13)))
+    assert len(repo.events_between("u1", day, day + timedelta(days=1))) == 1
+    repo.delete_event("u1", "a")
+    assert repo.events_at("u1", datetime(2021, 9, 29, 12, 30)) == []
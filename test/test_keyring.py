@@ -0,0 +1,56 @@
+# Change current working directory so test case can find the source files
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.keyring import Keyring
+from cryptography.fernet import Fernet
+
+import pytest
+from unittest.mock import patch
+
+
+def test_key_is_created_once_and_cached(tmp_path):
+    keyring = Keyring(base_dir=str(tmp_path))
+    key = keyring.key("u1")
+    fernet = keyring.fernet("u1")
+    # Warm lookups neither open the key file nor build a new Fernet instance
+    with patch("builtins.open", side_effect=AssertionError):
+        assert keyring.key("u1") == key
+        assert keyring.fernet("u1") is fernet
+    with open(keyring.path("u1"), "rb") as key_file:
+        assert key_file.read() == key
+
+
+def test_cache_is_bounded(tmp_path):
+    keyring = Keyring(base_dir=str(tmp_path), max_entries=2)
+    first = keyring.fernet("u1")
+    keyring.fernet("u2")
+    keyring.fernet("u3")
+    assert keyring.fernet("u1") is not first
+    # The evicted key is read back from disk unchanged
+    assert keyring.fernet("u1").decrypt(first.encrypt(b"data")) == b"data"
+
+
+def test_envelope_keys(tmp_path):
+    master = Fernet.generate_key()
+    keyring = Keyring(master, base_dir=str(tmp_path))
+    key = keyring.key("u1")
+    with open(keyring.path("u1"), "rb") as key_file:
+        wrapped = key_file.read()
+    assert wrapped != key
+    assert Fernet(master).decrypt(wrapped) == key
+    assert Keyring(master, base_dir=str(tmp_path)).key("u1") == key
+
+
+def test_bare_keys_are_wrapped_on_load(tmp_path):
+    key = Keyring(base_dir=str(tmp_path)).key("u1")
+    master = Fernet.generate_key()
+    assert Keyring(master, base_dir=str(tmp_path)).key("u1") == key
+    with open(Keyring(base_dir=str(tmp_path)).path("u1"), "rb") as key_file:
+        assert Fernet(master).decrypt(key_file.read()) == key
+
+
+def test_wrong_master_key_is_rejected(tmp_path):
+    Keyring(Fernet.generate_key(), base_dir=str(tmp_path)).key("u1")
+    with pytest.raises(ValueError):
+        Keyring(Fernet.generate_key(), base_dir=str(tmp_path)).key("u1")
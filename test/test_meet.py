@@ -0,0 +1,121 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+from datetime import date, datetime, timedelta
+from random import randint, seed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.free_time import merge_busy
+from src.functionality.meet import (
+    find_meeting_slots,
+    load_participant,
+    load_participants,
+    merge_participants,
+    parse_duration,
+    parse_meet_args,
+    rank_slots,
+    type_windows,
+)
+from src.functionality.shared_functions import EVENT_HEADER, TYPE_HEADER, repository
+from src.functionality.storage import EVENTS, TYPES, MemoryBackend
+
+import pytest
+
+DAY = datetime(2021, 9, 29)
+
+
+def at(hour, minute=0, day=0):
+    return DAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_parse_duration():
+    assert parse_duration("45") == timedelta(minutes=45)
+    assert parse_duration("45m") == timedelta(minutes=45)
+    assert parse_duration("1h") == timedelta(hours=1)
+    assert parse_duration("1h30m") == timedelta(minutes=90)
+    for text in ("", "0", "soon", "1x"):
+        with pytest.raises(ValueError):
+            parse_duration(text)
+
+
+def test_parse_meet_args():
+    today = date(2021, 9, 29)
+    assert parse_meet_args(("<@1>", "<@!2>"), today) == (timedelta(minutes=30), at(0), at(0, day=7))
+    assert parse_meet_args(("<@1>", "1h", "09/30/21"), today) == (timedelta(hours=1), at(0, day=1), at(0, day=2))
+    assert parse_meet_args(("week",), today) == (timedelta(minutes=30), at(0), at(0, day=7))
+
+
+def test_merge_participants_matches_merge_busy():
+    seed(5)
+    for _ in range(30):
+        busy_lists = []
+        for _ in range(randint(0, 25)):
+            busy = []
+            for _ in range(randint(0, 8)):
+                start = at(0) + timedelta(minutes=randint(0, 60 * 24 * 3))
+                busy.append((start, start + timedelta(minutes=randint(0, 240))))
+            busy_lists.append(merge_busy(busy))
+        assert merge_participants(busy_lists) == merge_busy(pair for busy in busy_lists for pair in busy)
+
+
+def test_type_windows():
+    rows = [TYPE_HEADER, ["Study", "09:00 AM", "11:00 AM"], ["Reading", "10:00 AM", "12:00 PM"],
+            ["Night", "11:00 PM", "01:00 AM"], ["Broken", "later", "never"]]
+    windows = type_windows(rows, at(0), at(0, day=1))
+    assert (at(9), at(12)) in windows
+    assert (at(23, day=-1), at(1)) in windows
+    assert (at(23), at(1, day=1)) in windows
+    assert type_windows([TYPE_HEADER], at(0), at(0, day=1)) == []
+
+
+def test_rank_slots_by_preference_score():
+    free = [(at(8), at(18))]
+    preferences = [[(at(9), at(11))], [(at(10), at(17))], []]
+    slots = rank_slots(free, timedelta(hours=1), preferences, limit=3)
+    # The best meeting comes first, ties go to the earliest one that does not overlap the chosen ones
+    assert slots == [(at(10), at(11), 3), (at(9), at(10), 2), (at(11), at(12), 2)]
+
+
+def test_rank_slots_later_preferred_slot_beats_earlier_one():
+    free = [(at(8), at(18))]
+    assert rank_slots(free, timedelta(hours=1), [[(at(16, 30), at(17, 30))]], limit=1) == [(at(16, 30), at(17, 30), 1)]
+    # Beyond the horizon the earliest candidates are kept
+    assert rank_slots(free, timedelta(hours=1), [[(at(16, 30), at(17, 30))]], limit=1, horizon=4) == [
+        (at(8), at(9), 0)]
+
+
+def test_rank_slots_earliest_without_preferences():
+    free = [(at(8, 10), at(12)), (at(13), at(13, 20))]
+    assert rank_slots(free, timedelta(hours=1), [[], []], limit=2) == [(at(8, 15), at(9, 15), 2), (at(9, 15), at(10, 15), 2)]
+
+
+def test_find_meeting_slots_with_many_participants():
+    participants = []
+    for number in range(25):
+        # Everyone is busy for an hour at a different time of the morning
+        start = at(8) + timedelta(minutes=15 * number)
+        participants.append(([(start, start + timedelta(hours=1))], []))
+    slots = find_meeting_slots(participants, at(8), at(18), timedelta(hours=2), limit=2)
+    # Together they are busy from 8:00 until 15:00, which leaves room for one two hour meeting
+    assert slots == [(at(15), at(17), 25)]
+
+
+def test_load_participants():
+    previous = repository.backend
+    repository.set_backend(MemoryBackend())
+    try:
+        repository.write("u1", EVENTS, [
+            EVENT_HEADER,
+            ["1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "", "", "None"],
+        ])
+        repository.write("u1", TYPES, [TYPE_HEADER, ["Meeting", "02:00 PM", "04:00 PM"]])
+        assert load_participant("u1", at(0), at(0, day=1)) == (
+            [(at(12), at(13))], [(at(14, day=-1), at(16, day=-1)), (at(14), at(16)), (at(14, day=1), at(16, day=1))])
+        # A user who never used the bot is free and has no preferences
+        assert load_participant("u2", at(0), at(0, day=1)) == ([], [])
+
+        participants = asyncio.run(load_participants(["u1", "u2"], at(0), at(0, day=1), concurrency=1))
+        slots = find_meeting_slots(participants, at(9), at(17), timedelta(hours=1), limit=2)
+        assert slots == [(at(14), at(15), 2), (at(15), at(16), 2)]
+    finally:
+        repository.set_backend(previous)
@@ -0,0 +1,86 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import datetime, timedelta
+from random import choice, randint, seed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.event_schema import decode_row
+from src.functionality.free_time import subtract_busy
+from src.functionality.interval_index import IntervalIndex
+from src.functionality.occupancy import MINUTES_PER_DAY, OccupancyMap
+from src.functionality.shared_functions import EVENT_HEADER, CalendarRepository
+from src.functionality.storage import EVENTS, MemoryBackend
+
+DAY = datetime(2021, 9, 29)
+
+
+def at(hour, minute=0, day=0):
+    return DAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def row(event_id, start, end):
+    return [event_id, "Event " + event_id, str(start), str(end), "1", "", "", "None"]
+
+
+def random_rows(count):
+    rows = []
+    for number in range(count):
+        start = at(0) + timedelta(minutes=randint(-120, 60 * 24 * 4))
+        rows.append(row(str(number), start, start + timedelta(minutes=randint(0, 600))))
+    return rows
+
+
+def test_day_bitmap():
+    occupancy = OccupancyMap(IntervalIndex([row("1", at(9), at(10, 30)), row("2", at(23), at(1, day=1))]))
+    bitmap = occupancy.day(DAY.date())
+    assert bitmap.shape == (MINUTES_PER_DAY,)
+    assert bitmap[9 * 60:10 * 60 + 30].all()
+    assert not bitmap[10 * 60 + 30:23 * 60].any()
+    assert bitmap[23 * 60:].all()
+    assert occupancy.day(DAY.date() + timedelta(days=1))[:60].all()
+    assert not bitmap.flags.writeable
+
+
+def test_free_slots_match_subtract_busy():
+    seed(11)
+    for _ in range(30):
+        rows = random_rows(randint(0, 15))
+        occupancy = OccupancyMap(IntervalIndex(rows))
+        busy = [(record.start_date, record.end_date) for record in map(decode_row, rows)]
+        assert occupancy.free_slots(at(0), at(0, day=3)) == subtract_busy(at(0), at(0, day=3), busy)
+        assert occupancy.free_slots(at(7, 30), at(18, day=1)) == subtract_busy(at(7, 30), at(18, day=1), busy)
+
+
+def test_free_slots_round_to_whole_minutes():
+    occupancy = OccupancyMap(IntervalIndex([row("1", at(9, 0) + timedelta(seconds=20), at(9, 10))]))
+    assert occupancy.free_slots(at(8) + timedelta(seconds=30), at(10)) == [(at(8, 1), at(9)), (at(9, 10), at(10))]
+    assert occupancy.free_slots(at(8), at(8) + timedelta(seconds=30)) == []
+
+
+def test_repository_keeps_bitmaps_current():
+    seed(12)
+    repository = CalendarRepository(MemoryBackend())
+    rows = random_rows(20)
+    repository.write("u1", EVENTS, [EVENT_HEADER] + rows)
+    window = (at(0), at(0, day=4))
+    repository.free_slots("u1", *window)
+    next_id = len(rows)
+    for _ in range(40):
+        action = choice(["add", "edit", "delete", "batch"])
+        start = at(0) + timedelta(minutes=randint(0, 60 * 24 * 4))
+        new_row = row(str(next_id), start, start + timedelta(minutes=randint(1, 300)))
+        if action == "add":
+            repository.add_event("u1", new_row)
+            next_id += 1
+        elif action == "batch":
+            repository.add_events("u1", [new_row, row(str(next_id + 1), start, start + timedelta(hours=2))])
+            next_id += 2
+        elif action == "edit":
+            event_id = choice(repository.read("u1", EVENTS)[1:])[0]
+            repository.update_event("u1", event_id, [event_id] + new_row[1:])
+        else:
+            event_id = choice(repository.read("u1", EVENTS)[1:])[0]
+            repository.delete_event("u1", event_id)
+
+        fresh = OccupancyMap(IntervalIndex(repository.read("u1", EVENTS)[1:]))
+        assert repository.free_slots("u1", *window) == fresh.free_slots(*window)
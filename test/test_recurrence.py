@@ -0,0 +1,195 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.event_schema import decode_row
+from src.functionality.import_file import iter_ics_events
+from src.functionality.interval_index import IntervalIndex
+from src.functionality.occupancy import OccupancyMap
+from src.functionality.recurrence import (
+    expand_records,
+    normalize_recurrence,
+    occurrence_id,
+    occurrence_starts,
+    occurrences,
+    split_occurrence_id,
+)
+from src.functionality.shared_functions import CalendarRepository, event_data_to_row, parse_google_event
+from src.functionality.storage import EVENTS, EncryptedCsvBackend, MemoryBackend, SQLiteBackend
+from cryptography.fernet import Fernet
+from icalendar import Calendar
+
+HEADER = ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
+# Every Monday from 10/04/21 10:00 to 11:30, except 10/11/21
+CLASS = ["c1", "Class", "2021-10-04 10:00:00", "2021-10-04 11:30:00", "1", "school", "", "None",
+         "RRULE:FREQ=WEEKLY;BYDAY=MO\nEXDATE:20211011T100000"]
+LUNCH = ["l1", "Lunch", "2021-10-18 12:00:00", "2021-10-18 13:00:00", "1", "", "", "None"]
+
+KEY = Fernet.generate_key()
+
+
+def starts(records):
+    return [record.start_date for record in records]
+
+
+def test_normalize_recurrence():
+    assert normalize_recurrence(["RRULE:FREQ=WEEKLY;UNTIL=20211231T235959Z", "EXDATE;TZID=Europe/Paris:20211011T100000",
+                                 "DTSTART:20211004T100000"]) == \
+        "RRULE:FREQ=WEEKLY;UNTIL=20211231T235959\nEXDATE:20211011T100000"
+    assert normalize_recurrence("FREQ=DAILY") == "RRULE:FREQ=DAILY"
+    assert normalize_recurrence([]) == ""
+
+
+def test_occurrences_in_window():
+    record = decode_row(CLASS)
+    assert record.is_recurring()
+    found = occurrences(record, datetime(2021, 10, 4), datetime(2021, 10, 26))
+    assert starts(found) == [datetime(2021, 10, 4, 10), datetime(2021, 10, 18, 10), datetime(2021, 10, 25, 10)]
+    assert found[0].end_date == datetime(2021, 10, 4, 11, 30)
+    assert found[0].event_id == "c1_20211004T100000" and found[0].recurrence_of == "c1"
+    assert not found[0].is_recurring()
+    # An occurrence already going on when the window starts is found too
+    assert starts(occurrences(record, datetime(2021, 10, 18, 11), datetime(2021, 10, 18, 12))) == \
+        [datetime(2021, 10, 18, 10)]
+    assert occurrences(record, datetime(2021, 9, 1), datetime(2021, 10, 1)) == []
+
+
+def test_occurrence_ids():
+    assert occurrence_id("c1", datetime(2021, 10, 18, 10)) == "c1_20211018T100000"
+    assert split_occurrence_id("c1_20211018T100000") == ("c1", datetime(2021, 10, 18, 10))
+    # Google's IDs of changed instances end with a UTC marker and are events of their own
+    assert split_occurrence_id("c1_20211018T140000Z") == ("c1_20211018T140000Z", None)
+    assert split_occurrence_id("l1") == ("l1", None)
+
+
+def test_deleting_an_occurrence_keeps_the_series():
+    repository = CalendarRepository(MemoryBackend())
+    repository.write("u1", EVENTS, [HEADER, CLASS, LUNCH])
+    window = (datetime(2021, 10, 4), datetime(2021, 10, 26))
+    occurrence = repository.records_between("u1", *window)[1]
+    assert occurrence.start_date == datetime(2021, 10, 18, 10)
+    repository.delete_event("u1", occurrence.event_id)
+    assert starts(repository.records_between("u1", *window)) == [datetime(2021, 10, 4, 10), datetime(2021, 10, 18, 12),
+                                                                 datetime(2021, 10, 25, 10)]
+    assert repository.read("u1", EVENTS)[1][8].endswith("EXDATE:20211018T100000")
+    repository.delete_event("u1", "c1")
+    assert [row[0] for row in repository.read("u1", EVENTS)[1:]] == ["l1"]
+
+
+def test_expansions_are_cached():
+    record = decode_row(CLASS)
+    window = (datetime(2022, 3, 1), datetime(2022, 3, 2))
+    occurrences(record, *window)
+    hits = occurrence_starts.cache_info().hits
+    occurrences(record, *window)
+    assert occurrence_starts.cache_info().hits == hits + 1
+
+
+def test_broken_rule_is_a_single_event():
+    record = decode_row(CLASS[:8] + ["RRULE:FREQ=SOMETIMES"])
+    assert starts(occurrences(record, datetime(2021, 10, 1), datetime(2021, 12, 1))) == [datetime(2021, 10, 4, 10)]
+
+
+def test_expand_records():
+    records = [decode_row(CLASS), decode_row(LUNCH)]
+    assert starts(expand_records(records, datetime(2021, 10, 18), datetime(2021, 10, 19))) == \
+        [datetime(2021, 10, 18, 10), datetime(2021, 10, 18, 12)]
+
+
+def test_interval_index_expands_recurring_events():
+    index = IntervalIndex([CLASS, LUNCH])
+    assert len(index) == 2
+    rows = index.overlapping(datetime(2021, 10, 11), datetime(2021, 10, 19))
+    assert [(row[0], row[2]) for row in rows] == [("c1_20211018T100000", "2021-10-18 10:00:00"),
+                                                  ("l1", "2021-10-18 12:00:00")]
+    assert [row[2] for row in index.active_at(datetime(2021, 10, 25, 10))] == ["2021-10-25 10:00:00"]
+    assert index.active_at(datetime(2021, 10, 25, 11, 30)) == []
+    copy = index.copy()
+    assert copy.remove("c1") == 1
+    assert copy.overlapping(datetime(2021, 10, 25), datetime(2021, 10, 26)) == []
+    assert len(index.overlapping(datetime(2021, 10, 25), datetime(2021, 10, 26))) == 1
+
+
+def test_occupancy_of_recurring_events():
+    index = IntervalIndex([LUNCH])
+    occupancy = OccupancyMap(index)
+    day = datetime(2021, 10, 25)
+    assert occupancy.free_slots(day, day + timedelta(days=1)) == [(day, day + timedelta(days=1))]
+    index = index.copy()
+    index.add(CLASS)
+    occupancy = occupancy.copy(index)
+    occupancy.add(decode_row(CLASS))
+    assert occupancy.free_slots(day, day + timedelta(days=1)) == [
+        (day, day + timedelta(hours=10)), (day + timedelta(hours=11, minutes=30), day + timedelta(days=1))]
+
+
+def test_backends_return_recurring_events_for_later_windows(tmp_path):
+    window = (datetime(2022, 1, 3), datetime(2022, 1, 4))
+    for backend in [MemoryBackend(), EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path)),
+                    SQLiteBackend(lambda user_id: KEY, ":memory:")]:
+        backend.write("u1", EVENTS, [HEADER, CLASS, LUNCH])
+        assert backend.events_between("u1", *window) == [CLASS]
+        repository = CalendarRepository(backend)
+        # Uncached reads go through the backend, cached ones through the index
+        assert starts(repository.records_between("u1", *window)) == [datetime(2022, 1, 3, 10)]
+        repository.read("u1", EVENTS)
+        assert starts(repository.records_between("u1", *window)) == [datetime(2022, 1, 3, 10)]
+        assert sorted(map(tuple, repository.read("u1", EVENTS)[1:])) == sorted([tuple(CLASS), tuple(LUNCH)])
+
+
+def test_ics_import_keeps_the_rule():
+    gcal = Calendar.from_ical("BEGIN:VCALENDAR\n"
+                              "BEGIN:VEVENT\n"
+                              "DTSTART:20211004T100000\n"
+                              "DTEND:20211004T113000\n"
+                              "RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20211231T235959Z\n"
+                              "EXDATE:20211011T100000\n"
+                              "SUMMARY:Class\n"
+                              "END:VEVENT\n"
+                              "END:VCALENDAR")
+    [record] = iter_ics_events(gcal)
+    assert record.recurrence == "RRULE:FREQ=WEEKLY;UNTIL=20211231T235959;BYDAY=MO\nEXDATE:20211011T100000"
+    assert record.to_row()[8] == record.recurrence
+    assert len(occurrences(record, datetime(2021, 10, 1), datetime(2022, 1, 31))) == 12
+
+
+def test_google_recurrence_is_stored():
+    event = {"id": "g1", "summary": "Standup", "start": {"dateTime": "2021-10-04T09:00:00-04:00"},
+             "end": {"dateTime": "2021-10-04T09:15:00-04:00"}, "recurrence": ["RRULE:FREQ=DAILY;COUNT=5"]}
+    row = event_data_to_row(parse_google_event(event))
+    assert row[8] == "RRULE:FREQ=DAILY;COUNT=5"
+    del event["recurrence"]
+    assert len(event_data_to_row(parse_google_event(event))) == 8
+
+
+def test_editing_a_recurring_event_keeps_the_rule(monkeypatch):
+    import asyncio
+    from datetime import timezone
+    from unittest.mock import AsyncMock, MagicMock
+    import src.functionality.Edit_event as Edit_event
+    from src.functionality import shared_functions
+
+    ctx = MagicMock()
+    ctx.author.id = "edit-recurring-user"
+    ctx.message.created_at = datetime.now(timezone.utc)
+    channel = AsyncMock()
+    ctx.author.create_dm = AsyncMock(return_value=channel)
+    # Picks the event, renames it and keeps everything else
+    answers = ["1", "Lecture", "skip", "skip", "skip", "skip", "skip", "skip"]
+    bot = MagicMock()
+    bot.wait_for = AsyncMock(side_effect=[MagicMock(content=answer) for answer in answers])
+    google_event = {"id": "c1", "summary": "Class", "start": {"dateTime": "2021-10-04T10:00:00"},
+                    "end": {"dateTime": "2021-10-04T11:30:00"}, "recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO"]}
+    monkeypatch.setattr(Edit_event, "connect_google", AsyncMock(return_value=MagicMock()))
+    monkeypatch.setattr(Edit_event, "execute", AsyncMock(return_value=google_event))
+
+    previous = shared_functions.repository.backend
+    shared_functions.repository.set_backend(MemoryBackend())
+    try:
+        shared_functions.repository.write("edit-recurring-user", EVENTS, [HEADER, CLASS])
+        asyncio.run(Edit_event.edit_event(ctx, bot))
+        rows = shared_functions.repository.read("edit-recurring-user", EVENTS)
+    finally:
+        shared_functions.repository.set_backend(previous)
+    assert rows[1] == ["c1", "Lecture"] + CLASS[2:]
@@ -17,9 +17,15 @@ from src.functionality.shared_functions import (
     read_type_file,
     add_event_to_file,
     turn_types_to_string,
+    write_event_file,
+    repository,
+    CalendarRepository,
 )
+from src.functionality.storage import EVENTS, TYPES, decrypt_rows, encrypt_rows
+from cryptography.fernet import Fernet
 
 import pytest
+from unittest.mock import patch
 
 
 def test_create_type_directory():
@@ -60,4 +66,53 @@ def test_read_event_file():
 
 def test_add_event_to_file():
 
-    add_event_to_file("Test", Event("", datetime(2021, 9, 29, 20, 30), datetime(2021, 9, 29, 20, 45), "", "", ""),"")
\ No newline at end of file
+    add_event_to_file("Test", Event("", datetime(2021, 9, 29, 20, 30), datetime(2021, 9, 29, 20, 45), "", "", ""),"")
+
+
+def test_repository_warm_read_skips_disk():
+    create_event_tree("RepoTest")
+    rows = read_event_file("RepoTest")
+    # A warm read must not load the key or open the encrypted file again
+    with patch("src.functionality.shared_functions.load_key", side_effect=AssertionError), \
+         patch("builtins.open", side_effect=AssertionError):
+        assert read_event_file("RepoTest") == rows
+
+
+def test_repository_write_refreshes_cache():
+    create_event_tree("RepoTest")
+    rows = read_event_file("RepoTest")
+    write_event_file("RepoTest", rows + [["id1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "", "", "None"]])
+    assert read_event_file("RepoTest")[-1][1] == "Lunch"
+    # The cached rows must match what was encrypted to disk
+    repository.invalidate("RepoTest", EVENTS)
+    assert read_event_file("RepoTest")[-1][1] == "Lunch"
+    write_event_file("RepoTest", rows)
+
+
+def test_repository_returns_copies():
+    create_event_tree("RepoTest")
+    rows = read_event_file("RepoTest")
+    rows.append(["changed"])
+    assert read_event_file("RepoTest") != rows
+
+
+def test_repository_lru_bound():
+    create_event_tree("RepoTest")
+    create_type_tree("RepoTest")
+    small = CalendarRepository(repository.backend, max_entries=1)
+    small.read("RepoTest", EVENTS)
+    small.read("RepoTest", TYPES)
+    assert not small.is_cached("RepoTest", EVENTS)
+    assert small.is_cached("RepoTest", TYPES)
+
+
+def test_encrypt_rows_never_writes_plaintext(tmp_path):
+    key = Fernet.generate_key()
+    path = str(tmp_path / "calendar.csv")
+    rows = [["ID", "Name"], ["1", "Secret meeting"]]
+    encrypt_rows(key, path, rows)
+    with open(path, "rb") as enc_file:
+        assert b"Secret meeting" not in enc_file.read()
+    assert decrypt_rows(key, path) == rows
+    # Only the committed file is left behind, no temporary or plaintext copies
+    assert os.listdir(str(tmp_path)) == ["calendar.csv"]
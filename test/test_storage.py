@@ -0,0 +1,306 @@
+# Change current working directory so test case can find the source files
+import sys, os
+from datetime import datetime, timedelta
+from random import randint, seed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.storage import (
+    EVENTS,
+    TYPES,
+    EncryptedCsvBackend,
+    MemoryBackend,
+    SQLiteBackend,
+    create_backend,
+    insert_chronological,
+    merge_chronological,
+)
+from src.functionality.shared_functions import CalendarRepository
+from cryptography.fernet import Fernet
+
+import pytest
+
+HEADER = ["ID", "Name", "Start Date", "End Date", "Priority", "Type", "Notes", "Location"]
+LUNCH = ["id1", "Lunch", "2021-09-29 12:00:00", "2021-09-29 13:00:00", "1", "", "", "None"]
+GYM = ["id2", "Gym", "2021-09-30 18:00:00", "2021-09-30 19:00:00", "2", "", "", "None"]
+TRIP = ["id3", "Trip", "2021-09-28 08:00:00", "2021-10-02 20:00:00", "3", "", "", "None"]
+
+KEY = Fernet.generate_key()
+
+
+def backends(tmp_path):
+    return [
+        MemoryBackend(),
+        EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path)),
+        SQLiteBackend(lambda user_id: KEY, ":memory:"),
+    ]
+
+
+def test_create_backend():
+    assert isinstance(create_backend("memory", lambda user_id: KEY), MemoryBackend)
+    assert isinstance(create_backend("csv", lambda user_id: KEY), EncryptedCsvBackend)
+    with pytest.raises(ValueError):
+        create_backend("tape", lambda user_id: KEY)
+
+
+def test_missing_table_raises(tmp_path):
+    for backend in backends(tmp_path):
+        assert not backend.exists("u1", EVENTS)
+        with pytest.raises(FileNotFoundError):
+            backend.read("u1", EVENTS)
+
+
+def test_write_read_round_trip(tmp_path):
+    for backend in backends(tmp_path):
+        backend.write("u1", EVENTS, [HEADER, LUNCH, GYM])
+        backend.write("u1", TYPES, [["Lunch", "11:00 am", "2:00 pm"]])
+        assert backend.exists("u1", EVENTS)
+        assert backend.read("u1", EVENTS) == [HEADER, LUNCH, GYM]
+        assert backend.read("u1", TYPES) == [["Lunch", "11:00 am", "2:00 pm"]]
+        backend.clear(EVENTS)
+        assert not backend.exists("u1", EVENTS)
+        assert backend.exists("u1", TYPES)
+
+
+def test_events_between(tmp_path):
+    for backend in backends(tmp_path):
+        backend.write("u1", EVENTS, [HEADER, TRIP, LUNCH, GYM])
+        found = backend.events_between("u1", datetime(2021, 9, 30), datetime(2021, 10, 1))
+        assert [row[0] for row in found] == ["id3", "id2"]
+
+
+def test_single_event_mutations(tmp_path):
+    for backend in backends(tmp_path):
+        backend.write("u1", EVENTS, [HEADER, GYM])
+        backend.add_event("u1", LUNCH)
+        assert [row[0] for row in backend.read("u1", EVENTS)[1:]] == ["id1", "id2"]
+        backend.update_event("u1", "id1", LUNCH[:1] + ["Brunch"] + LUNCH[2:])
+        assert backend.read("u1", EVENTS)[1][1] == "Brunch"
+        backend.delete_event("u1", "id2")
+        assert [row[0] for row in backend.read("u1", EVENTS)[1:]] == ["id1"]
+
+
+def test_merge_matches_one_by_one_inserts():
+    seed(12)
+    base = datetime(2021, 9, 1)
+
+    def random_row(event_id, undated=True):
+        if undated and randint(0, 9) == 0:
+            return [event_id, "Undated", "someday", "never"]
+        start = base + timedelta(hours=randint(0, 200))
+        return [event_id, "Event", str(start), str(start + timedelta(hours=1))]
+
+    for _ in range(50):
+        calendar = [HEADER]
+        for i in range(randint(0, 20)):
+            insert_chronological(calendar, random_row(f"old{i}"))
+        batch = [random_row(f"new{i}", undated=False) for i in range(randint(0, 20))]
+        expected = [list(row) for row in calendar]
+        for row in batch:
+            insert_chronological(expected, row)
+        merge_chronological(calendar, batch)
+        assert calendar == expected
+
+    # Undated rows of the batch go last
+    calendar = [HEADER, LUNCH]
+    merge_chronological(calendar, [["id9", "Undated", "someday", "never"], GYM])
+    assert [row[0] for row in calendar[1:]] == ["id1", "id2", "id9"]
+
+
+def test_add_events(tmp_path):
+    for backend in backends(tmp_path):
+        backend.write("u1", EVENTS, [HEADER, LUNCH])
+        backend.add_events("u1", [GYM, TRIP])
+        assert backend.read("u1", EVENTS) == [HEADER, TRIP, LUNCH, GYM]
+        found = backend.events_between("u1", datetime(2021, 9, 30), datetime(2021, 10, 1))
+        assert [row[0] for row in found] == ["id3", "id2"]
+
+
+def test_csv_add_events_folds_the_journal(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    backend.write("u1", EVENTS, [HEADER, GYM])
+    backend.add_event("u1", LUNCH)
+    backend.add_events("u1", [TRIP])
+    assert not os.path.exists(backend.journal_path("u1"))
+    assert backend.read("u1", EVENTS) == [HEADER, TRIP, LUNCH, GYM]
+
+
+def test_repository_add_events_updates_the_cache():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER, LUNCH])
+    repo = CalendarRepository(backend)
+    assert repo.events_between("u1", datetime(2021, 9, 30), datetime(2021, 10, 1)) == []
+    repo.add_events("u1", [GYM, TRIP])
+    assert repo.read("u1", EVENTS) == [HEADER, TRIP, LUNCH, GYM]
+    found = repo.events_between("u1", datetime(2021, 9, 30), datetime(2021, 10, 1))
+    assert [row[0] for row in found] == ["id3", "id2"]
+    assert backend.read("u1", EVENTS) == [HEADER, TRIP, LUNCH, GYM]
+
+
+def test_sqlite_rows_are_encrypted(tmp_path):
+    path = str(tmp_path / "calendar.db")
+    backend = SQLiteBackend(lambda user_id: KEY, path)
+    backend.write("u1", EVENTS, [HEADER, LUNCH])
+    with open(path, "rb") as db_file:
+        assert b"Lunch" not in db_file.read()
+
+
+def test_repository_range_uses_cache():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER, LUNCH, GYM])
+    repo = CalendarRepository(backend)
+    repo.read("u1", EVENTS)
+    backend.write("u1", EVENTS, [HEADER])
+    # The warm cache answers the query without going back to the backend
+    assert repo.events_between("u1", datetime(2021, 9, 29), datetime(2021, 9, 30)) == [LUNCH]
+
+
+def test_journal_appends_without_rewriting_snapshot(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    backend.write("u1", EVENTS, [HEADER, GYM])
+    shards = backend.shard_directory("u1")
+    before = {name: os.path.getmtime(os.path.join(shards, name)) for name in os.listdir(shards)}
+    backend.add_event("u1", LUNCH)
+    backend.update_event("u1", "id2", GYM[:1] + ["Swim"] + GYM[2:])
+    backend.add_event("u1", TRIP)
+    backend.delete_event("u1", "id3")
+    assert {name: os.path.getmtime(os.path.join(shards, name)) for name in os.listdir(shards)} == before
+    with open(backend.journal_path("u1"), "rb") as journal:
+        assert b"Lunch" not in journal.read()
+    assert [row[1] for row in backend.read("u1", EVENTS)[1:]] == ["Lunch", "Swim"]
+
+
+def test_journal_compaction(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path), max_records=2)
+    backend.write("u1", EVENTS, [HEADER])
+    backend.add_event("u1", GYM)
+    backend.add_event("u1", LUNCH)
+    backend.wait_for_compaction()
+    assert not os.path.exists(backend.journal_path("u1"))
+    assert backend.read("u1", EVENTS) == [HEADER, LUNCH, GYM]
+    backend.add_event("u1", TRIP)
+    assert os.path.exists(backend.journal_path("u1"))
+    assert backend.read("u1", EVENTS) == [HEADER, TRIP, LUNCH, GYM]
+
+
+def test_stale_journal_is_ignored(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    backend.write("u1", EVENTS, [HEADER])
+    backend.add_event("u1", LUNCH)
+    with open(backend.journal_path("u1"), "rb") as journal:
+        stale = journal.read()
+    backend.compact("u1")
+    # A crash after the new snapshot was written but before the journal was removed
+    with open(backend.journal_path("u1"), "wb") as journal:
+        journal.write(stale)
+    fresh = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    assert fresh.read("u1", EVENTS) == [HEADER, LUNCH]
+    fresh.add_event("u1", GYM)
+    assert fresh.read("u1", EVENTS) == [HEADER, LUNCH, GYM]
+
+
+def test_month_shards(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    old = ["id0", "Old", "2019-01-05 10:00:00", "2019-01-05 11:00:00", "1", "", "", "None"]
+    backend.write("u1", EVENTS, [HEADER, old, TRIP, LUNCH, GYM])
+    shards = sorted(name.split(".")[0] for name in os.listdir(backend.shard_directory("u1")) if name != "manifest")
+    assert shards == ["2019-01", "2021-09", "2021-10"]
+    assert backend.read("u1", EVENTS) == [HEADER, old, TRIP, LUNCH, GYM]
+    # A window in October only decrypts the October shard, which also references the trip started in September
+    os.remove(os.path.join(backend.shard_directory("u1"),
+                           [name for name in os.listdir(backend.shard_directory("u1")) if name.startswith("2019")][0]))
+    assert backend.events_between("u1", datetime(2021, 10, 1), datetime(2021, 10, 2)) == [TRIP]
+
+
+def test_compaction_rewrites_changed_shards_only(tmp_path):
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path), background=False, max_records=1)
+    old = ["id0", "Old", "2019-01-05 10:00:00", "2019-01-05 11:00:00", "1", "", "", "None"]
+    backend.write("u1", EVENTS, [HEADER, old, LUNCH])
+    before = set(os.listdir(backend.shard_directory("u1")))
+    backend.add_event("u1", GYM)
+    after = set(os.listdir(backend.shard_directory("u1")))
+    assert [name for name in before & after if name != "manifest"] == ["2019-01.1.csv"]
+    assert backend.read("u1", EVENTS) == [HEADER, old, LUNCH, GYM]
+
+
+def test_single_file_calendar_is_still_read(tmp_path):
+    from src.functionality.storage import encrypt_rows
+
+    backend = EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path))
+    os.makedirs(os.path.dirname(backend.path("u1", EVENTS)))
+    encrypt_rows(KEY, backend.path("u1", EVENTS), [HEADER, LUNCH])
+    assert backend.exists("u1", EVENTS)
+    backend.add_event("u1", GYM)
+    assert backend.events_between("u1", datetime(2021, 9, 29), datetime(2021, 10, 1)) == [LUNCH, GYM]
+    backend.compact("u1")
+    assert not os.path.exists(backend.path("u1", EVENTS))
+    assert backend.read("u1", EVENTS) == [HEADER, LUNCH, GYM]
+
+
+def check_reads_during_writes(backend, reads):
+    import threading
+
+    backend.write("u1", EVENTS, [HEADER])
+    errors = []
+
+    def writer():
+        for i in range(40):
+            backend.add_event("u1", [str(i), "Event", "2021-09-%02d 10:00:00" % (i % 28 + 1),
+                                     "2021-09-%02d 11:00:00" % (i % 28 + 1), "1", "", "", "None"])
+
+    def reader():
+        try:
+            for _ in range(reads):
+                rows = backend.read("u1", EVENTS)
+                # Any committed version holds exactly the first k events added
+                assert rows[0] == HEADER
+                assert sorted(int(row[0]) for row in rows[1:]) == list(range(len(rows) - 1))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(backend.read("u1", EVENTS)) == 41
+
+
+def test_csv_reads_during_compactions(tmp_path):
+    check_reads_during_writes(EncryptedCsvBackend(lambda user_id: KEY, str(tmp_path), max_records=3, background=False), 30)
+
+
+def test_sqlite_reads_during_writes(tmp_path):
+    check_reads_during_writes(SQLiteBackend(lambda user_id: KEY, str(tmp_path / "calendar.db")), 30)
+
+
+def test_repository_reads_do_not_wait_for_writers():
+    from concurrent.futures import ThreadPoolExecutor
+
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER, LUNCH])
+    repo = CalendarRepository(backend)
+    repo.read("u1", EVENTS)
+    repo.events_between("u1", datetime(2021, 9, 29), datetime(2021, 9, 30))
+    # A writer holding the lock doesn't hold up readers of the published snapshot
+    with repo._lock, ThreadPoolExecutor(1) as pool:
+        assert pool.submit(repo.read, "u1", EVENTS).result(timeout=5) == [HEADER, LUNCH]
+        assert pool.submit(repo.events_between, "u1", datetime(2021, 9, 29), datetime(2021, 9, 30)).result(timeout=5) == [LUNCH]
+
+
+def test_repository_does_not_cache_rows_read_during_a_write():
+    backend = MemoryBackend()
+    backend.write("u1", EVENTS, [HEADER])
+    repo = CalendarRepository(backend)
+    original_read = backend.read
+
+    def read_then_write(user_id, kind):
+        rows = original_read(user_id, kind)
+        # Another command adds an event while this cache miss is still loading
+        backend.read = original_read
+        repo.add_event("u1", LUNCH)
+        return rows
+
+    backend.read = read_then_write
+    assert repo.read("u1", EVENTS) == [HEADER]
+    assert repo.read("u1", EVENTS) == [HEADER, LUNCH]
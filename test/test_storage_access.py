@@ -0,0 +1,42 @@
+# Change current working directory so test case can find the source files
+import sys, os
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+from src.functionality.storage_access import run_locked, run_storage
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_run_storage_leaves_event_loop_free():
+    loop_thread = threading.get_ident()
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    worker_thread, _ = await asyncio.gather(run_storage(lambda: (time.sleep(0.1), threading.get_ident())[1]), ticker())
+    assert worker_thread != loop_thread
+    assert len(ticks) == 5
+
+
+@pytest.mark.asyncio
+async def test_run_locked_serializes_one_user_only():
+    running = []
+    overlaps = []
+
+    def work(user_id):
+        running.append(user_id)
+        overlaps.append(list(running))
+        time.sleep(0.05)
+        running.remove(user_id)
+
+    await asyncio.gather(run_locked("u1", work, "u1"), run_locked("u1", work, "u1"), run_locked("u2", work, "u2"))
+    # The two u1 mutations never ran together, while u2 was free to run alongside them
+    assert all(current.count("u1") <= 1 for current in overlaps)
+    assert any("u1" in current and "u2" in current for current in overlaps)